@@ -0,0 +1,196 @@
+# cars/activity.py
+"""
+Per-car activity time series: views, inquiries and favorites.
+
+Request paths only bump counters in an in-process buffer keyed by car and
+hour. A daemon thread flushes the buffer every ``ACTIVITY_FLUSH_INTERVAL``
+seconds (or once ``ACTIVITY_BUFFER_SIZE`` cars are waiting) in a single
+transaction: one additive ``INSERT ... ON CONFLICT DO UPDATE`` batch into
+the hourly ``CarActivity`` table, plus the ``Car.views``/``Car.inquiries``
+running totals and the dealer stats, once per car and dealer rather than
+once per request.
+
+``compact_activity`` folds the hourly buckets of finished hours into
+``CarDailyStats`` (run it hourly) and ``trim_activity`` drops days older
+than ``ACTIVITY_RETENTION_DAYS`` (run it daily). ``seller_activity``
+answers a dashboard chart for all of a seller's cars from one range scan
+of the ``(seller_id, date)`` index.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import dealer_stats
+from .models import Car, CarActivity, CarDailyStats
+
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('views', 'inquiries', 'favorites')
+
+_lock = threading.Lock()
+_buffer = {}
+_wakeup = threading.Event()
+_flusher = None
+
+
+def _hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record(car, views=0, inquiries=0, favorites=0):
+    """Count activity on ``car`` for the current hour; never touches the database"""
+    global _flusher
+    key = (car.id, car.seller_id, car.dealer_id, _hour(timezone.now()))
+    with _lock:
+        counts = _buffer.setdefault(key, [0, 0, 0])
+        counts[0] += views
+        counts[1] += inquiries
+        counts[2] += favorites
+        full = len(_buffer) >= settings.ACTIVITY_BUFFER_SIZE
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, name='activity-flusher', daemon=True)
+            _flusher.start()
+    if full:
+        _wakeup.set()
+
+
+def _upsert(model, key_fields, conflict_fields, rows):
+    """Insert ``rows`` of key values + counters, adding counters to existing rows"""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in key_fields + COUNTERS]
+    sql = 'INSERT INTO {table} ({columns}) VALUES ({values}) ON CONFLICT ({conflict}) DO UPDATE SET {updates}'.format(
+        table=table,
+        columns=', '.join(quote(field.column) for field in fields),
+        values=', '.join(['%s'] * len(fields)),
+        conflict=', '.join(quote(name) for name in conflict_fields),
+        updates=', '.join(f'{quote(name)} = {table}.{quote(name)} + EXCLUDED.{quote(name)}' for name in COUNTERS),
+    )
+    params = [
+        [field.get_db_prep_value(value, connection) for field, value in zip(fields, row)]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def flush():
+    """Write all buffered activity. Returns the number of hourly buckets written"""
+    with _lock:
+        entries = list(_buffer.items())
+        _buffer.clear()
+    if not entries:
+        return 0
+
+    car_totals = defaultdict(lambda: [0, 0])
+    dealer_totals = defaultdict(lambda: [0, 0])
+    for (car_id, _, dealer_id, _), (views, inquiries, _) in entries:
+        for totals in (car_totals[car_id], dealer_totals[dealer_id]):
+            totals[0] += views
+            totals[1] += inquiries
+    dealer_totals.pop(None, None)
+
+    # Rows are locked in key order, so concurrent flushes from other workers
+    # wait on each other instead of deadlocking
+    entries.sort(key=lambda entry: (entry[0][0], entry[0][3]))
+    with transaction.atomic():
+        _upsert(CarActivity, ('car_id', 'seller_id', 'hour'), ('car_id', 'hour'), [
+            (car_id, seller_id, hour, *counts) for (car_id, seller_id, _, hour), counts in entries
+        ])
+        for car_id, (views, inquiries) in sorted(car_totals.items()):
+            if views or inquiries:
+                Car.objects.filter(id=car_id).update(views=F('views') + views, inquiries=F('inquiries') + inquiries)
+        for dealer_id, (views, inquiries) in sorted(dealer_totals.items()):
+            dealer_stats.add_counters(dealer_id, views=views, inquiries=inquiries)
+    return len(entries)
+
+
+def _flush_forever():
+    while True:
+        _wakeup.wait(settings.ACTIVITY_FLUSH_INTERVAL)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Could not write car activity')
+
+
+atexit.register(flush)
+
+
+def compact_activity(now=None):
+    """Fold hourly buckets of finished hours into daily rows. Returns the buckets folded"""
+    current_hour = _hour(now or timezone.now())
+    with transaction.atomic():
+        buckets = list(
+            CarActivity.objects.select_for_update().filter(hour__lt=current_hour).values_list(
+                'id', 'car_id', 'seller_id', 'hour', *COUNTERS
+            )
+        )
+        daily = defaultdict(lambda: [0, 0, 0])
+        for _, car_id, seller_id, hour, *counts in buckets:
+            totals = daily[(car_id, seller_id, timezone.localdate(hour))]
+            for index, count in enumerate(counts):
+                totals[index] += count
+
+        _upsert(CarDailyStats, ('car_id', 'seller_id', 'date'), ('car_id', 'date'), [
+            (*key, *counts) for key, counts in sorted(daily.items(), key=lambda item: (item[0][0], item[0][2]))
+        ])
+        # Delete by id: buckets written after the read above belong to the next run
+        ids = [bucket[0] for bucket in buckets]
+        for start in range(0, len(ids), 1000):
+            CarActivity.objects.filter(id__in=ids[start:start + 1000]).delete()
+    return len(buckets)
+
+
+def trim_activity(days=None):
+    """Drop daily rows older than the retention window. Returns the rows deleted"""
+    days = days or settings.ACTIVITY_RETENTION_DAYS
+    cutoff = timezone.localdate() - timedelta(days=days)
+    deleted, _ = CarDailyStats.objects.filter(date__lt=cutoff).delete()
+    return deleted
+
+
+def seller_activity(seller_id, days=None, car_ids=None):
+    """
+    Daily series for a seller's cars over the last ``days`` days: a dict with
+    the ``dates``, per-car ``cars`` series and ``totals``, each series a
+    dict of counter name to one value per date. Days without activity are 0.
+    """
+    days = min(days or settings.ACTIVITY_CHART_DAYS, settings.ACTIVITY_RETENTION_DAYS)
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+
+    rows = CarDailyStats.objects.filter(seller_id=seller_id, date__gte=start)
+    if car_ids is not None:
+        rows = rows.filter(car_id__in=car_ids)
+
+    def empty_series():
+        return {name: [0] * days for name in COUNTERS}
+
+    cars = defaultdict(empty_series)
+    totals = empty_series()
+    for car_id, date, *counts in rows.values_list('car_id', 'date', *COUNTERS).iterator(chunk_size=5000):
+        index = (date - start).days
+        series = cars[car_id]
+        for name, count in zip(COUNTERS, counts):
+            series[name][index] += count
+            totals[name][index] += count
+
+    return {
+        'dates': [date.isoformat() for date in dates],
+        'cars': {str(car_id): series for car_id, series in cars.items()},
+        'totals': totals,
+    }
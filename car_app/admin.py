@@ -1,11 +1,64 @@
 # cars/admin.py
-from django.contrib import admin
+import json
+
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from . import bulk_jobs
 from .models import *
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts the PostgreSQL planner's row estimate for large
+    result sets instead of running ``COUNT(*)`` over millions of rows.
+    Results estimated below ``ADMIN_EXACT_COUNT_LIMIT`` are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == 'postgresql':
+            plan = json.loads(queryset.order_by().explain(format='json'))
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if estimate >= settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Change list settings for tables that grow to millions of rows
+
+    Keep search_fields to local columns with a trigram index. ORing in a
+    joined column makes PostgreSQL filter the join row by row instead of
+    combining the index scans.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+def bulk_action(action, description):
+    """Admin action that hands the selected ids to a set-based bulk job"""
+    def run(modeladmin, request, queryset):
+        ids = list(queryset.order_by().values_list('pk', flat=True))
+        job = bulk_jobs.submit(action, ids, user=request.user)
+        if job.status == 'done':
+            modeladmin.message_user(request, f"{job.get_action_display()}: {job.processed} updated.", messages.SUCCESS)
+        elif job.status == 'failed':
+            modeladmin.message_user(request, f"{job.get_action_display()} failed: {job.error}", messages.ERROR)
+        else:
+            modeladmin.message_user(
+                request, f"{job.get_action_display()}: {len(ids)} rows queued as bulk job #{job.pk}.", messages.INFO
+            )
+    run.__name__ = action
+    return admin.action(description=description)(run)
+
+
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdmin, BaseUserAdmin):
     list_display = ['username', 'email', 'phone_number', 'user_type', 'is_verified', 'created_at']
     list_filter = ['user_type', 'is_verified', 'is_staff']
     search_fields = ['username', 'email', 'phone_number']
@@ -20,10 +73,13 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(Dealer)
 class DealerAdmin(admin.ModelAdmin):
-    list_display = ['business_name', 'user', 'city', 'is_verified', 'is_premium', 'rating', 'total_listings']
+    list_display = ['business_name', 'user', 'city', 'is_verified', 'is_premium', 'rating', 'total_listings', 'active_listings', 'sold_listings']
     list_filter = ['is_verified', 'is_premium', 'city']
     search_fields = ['business_name', 'email', 'phone']
     prepopulated_fields = {'slug': ('business_name',)}
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+    readonly_fields = ['total_listings', 'active_listings', 'sold_listings', 'total_views', 'total_inquiries', 'total_days_to_sell']
 
 
 @admin.register(CarMake)
@@ -40,6 +96,8 @@ class CarModelAdmin(admin.ModelAdmin):
     list_filter = ['make', 'is_popular']
     search_fields = ['name', 'make__name']
     prepopulated_fields = {'slug': ('name',)}
+    list_select_related = ['make']
+    autocomplete_fields = ['make']
 
 
 class CarImageInline(admin.TabularInline):
@@ -53,11 +111,21 @@ class CarSpecificationInline(admin.TabularInline):
 
 
 @admin.register(Car)
-class CarAdmin(admin.ModelAdmin):
+class CarAdmin(LargeTableAdmin):
     list_display = ['title', 'make', 'model', 'year', 'condition', 'price', 'status', 'seller', 'views', 'created_at']
     list_filter = ['status', 'condition', 'body_type', 'fuel_type', 'transmission', 'make', 'is_featured']
-    search_fields = ['title', 'vin', 'make__name', 'model__name']
+    # The title already contains make and model; searching the joined
+    # tables too would keep PostgreSQL from using the trigram indexes
+    search_fields = ['title', 'vin']
     prepopulated_fields = {'slug': ('title',)}
+    list_select_related = ['make', 'model__make', 'seller']
+    autocomplete_fields = ['seller', 'dealer', 'make', 'model']
+    actions = [
+        bulk_action('feature_cars', 'Feature selected cars'),
+        bulk_action('unfeature_cars', 'Unfeature selected cars'),
+        bulk_action('mark_cars_sold', 'Mark selected cars sold'),
+        bulk_action('expire_listings', 'Expire selected listings'),
+    ]
     readonly_fields = ['views', 'inquiries', 'created_at', 'updated_at']
     inlines = [CarImageInline, CarSpecificationInline]
     
@@ -91,10 +159,13 @@ class CarAdmin(admin.ModelAdmin):
 
 
 @admin.register(CarImage)
-class CarImageAdmin(admin.ModelAdmin):
+class CarImageAdmin(LargeTableAdmin):
     list_display = ['car', 'is_primary', 'order', 'uploaded_at']
     list_filter = ['is_primary', 'uploaded_at']
+    # The only search field, so the cars_title_trgm scan drives the join
     search_fields = ['car__title']
+    list_select_related = ['car']
+    autocomplete_fields = ['car']
 
 
 @admin.register(InspectionReport)
@@ -102,35 +173,50 @@ class InspectionReportAdmin(admin.ModelAdmin):
     list_display = ['car', 'inspector_name', 'inspection_date', 'overall_condition']
     list_filter = ['overall_condition', 'inspection_date']
     search_fields = ['car__title', 'inspector_name']
+    list_select_related = ['car']
+    autocomplete_fields = ['car']
 
 
 @admin.register(Inquiry)
-class InquiryAdmin(admin.ModelAdmin):
-    list_display = ['car', 'sender', 'recipient', 'name', 'is_read', 'replied', 'created_at']
-    list_filter = ['is_read', 'replied', 'created_at']
-    search_fields = ['car__title', 'name', 'email', 'message']
+class InquiryAdmin(LargeTableAdmin):
+    list_display = ['car', 'sender', 'recipient', 'name', 'is_read', 'replied', 'is_flagged', 'created_at']
+    list_filter = ['is_flagged', 'is_read', 'replied', 'created_at']
+    search_fields = ['name', 'email', 'message']
+    list_select_related = ['car', 'sender', 'recipient']
+    autocomplete_fields = ['car', 'sender', 'recipient']
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
-    list_display = ['review_type', 'car', 'reviewer', 'rating', 'is_approved', 'created_at']
-    list_filter = ['review_type', 'rating', 'is_approved', 'is_verified_purchase']
-    search_fields = ['title', 'comment', 'reviewer__username']
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ['review_type', 'car', 'reviewer', 'rating', 'is_approved', 'is_flagged', 'created_at']
+    list_filter = ['review_type', 'rating', 'is_approved', 'is_rejected', 'is_flagged', 'is_verified_purchase']
+    search_fields = ['title', 'comment']
+    list_select_related = ['car', 'reviewer']
+    autocomplete_fields = ['car', 'seller', 'dealer', 'reviewer']
+    actions = [
+        bulk_action('approve_reviews', 'Approve selected reviews'),
+        bulk_action('reject_reviews', 'Reject selected reviews'),
+    ]
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ['user', 'car', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['user__username', 'car__title']
+    # The only search field, so the cars_title_trgm scan drives the join
+    search_fields = ['car__title']
+    list_select_related = ['user', 'car']
+    autocomplete_fields = ['user', 'car']
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ['order_number', 'buyer', 'seller', 'car', 'total_amount', 'status', 'created_at']
     list_filter = ['status', 'created_at']
-    search_fields = ['order_number', 'buyer__username', 'seller__username', 'car__title']
+    search_fields = ['order_number']
     readonly_fields = ['order_number', 'created_at', 'updated_at', 'completed_at']
+    list_select_related = ['buyer', 'seller', 'car']
+    autocomplete_fields = ['buyer', 'seller', 'car']
     
     fieldsets = (
         ('Order Info', {
@@ -152,11 +238,13 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ['transaction_id', 'order', 'payment_method', 'amount', 'status', 'created_at']
     list_filter = ['payment_method', 'status', 'created_at']
-    search_fields = ['transaction_id', 'order__order_number', 'mpesa_receipt', 'paypal_transaction_id']
+    search_fields = ['transaction_id', 'mpesa_receipt', 'paypal_transaction_id']
     readonly_fields = ['transaction_id', 'created_at', 'completed_at']
+    list_select_related = ['order']
+    autocomplete_fields = ['order']
     
     fieldsets = (
         ('Payment Info', {
@@ -181,17 +269,37 @@ class PaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ['user', 'notification_type', 'title', 'is_read', 'created_at']
     list_filter = ['notification_type', 'is_read', 'created_at']
-    search_fields = ['user__username', 'title', 'message']
+    search_fields = ['title', 'message']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 
 @admin.register(SearchHistory)
-class SearchHistoryAdmin(admin.ModelAdmin):
+class SearchHistoryAdmin(LargeTableAdmin):
     list_display = ['user', 'query', 'results_count', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['query', 'user__username']
+    search_fields = ['query']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+
+
+@admin.register(SearchTrend)
+class SearchTrendAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'rank', 'query', 'search_count', 'computed_at']
+    list_filter = ['kind']
+    search_fields = ['query']
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(LargeTableAdmin):
+    list_display = ['user', 'query', 'is_active', 'created_at']
+    list_filter = ['is_active', 'created_at']
+    search_fields = ['query']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 
 @admin.register(Banner)
@@ -210,6 +318,49 @@ class SiteSettingsAdmin(admin.ModelAdmin):
         return not SiteSettings.objects.exists()
 
 
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'action', 'status', 'progress_display', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['action', 'status']
+    list_select_related = ['created_by']
+    exclude = ['object_ids']
+    readonly_fields = [
+        'action', 'params', 'status', 'total', 'processed', 'last_id', 'error',
+        'created_by', 'created_at', 'started_at', 'finished_at', 'lease_expires_at',
+    ]
+    
+    @admin.display(description='Progress')
+    def progress_display(self, obj):
+        return f"{obj.processed}/{obj.total} ({obj.progress}%)"
+    
+    def has_add_permission(self, request):
+        # Jobs are created by admin actions
+        return False
+
+
+@admin.register(ModerationTask)
+class ModerationTaskAdmin(LargeTableAdmin):
+    list_display = ['kind', 'object_id', 'priority', 'leased_by', 'lease_expires_at', 'resolution', 'resolved_at', 'created_at']
+    list_filter = ['kind', 'resolution']
+    list_select_related = ['leased_by']
+    readonly_fields = ['leased_by', 'lease_expires_at', 'resolution', 'resolved_at', 'created_at']
+
+
+@admin.register(DuplicateListing)
+class DuplicateListingAdmin(admin.ModelAdmin):
+    list_display = ['car', 'duplicate_of', 'reasons', 'score', 'status', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['car', 'duplicate_of']
+    autocomplete_fields = ['car', 'duplicate_of']
+    readonly_fields = ['reasons', 'score', 'created_at']
+
+
+@admin.register(FeedCursor)
+class FeedCursorAdmin(admin.ModelAdmin):
+    list_display = ['name', 'seq', 'updated_at']
+    search_fields = ['name']
+
+
 # Customize admin site
 admin.site.site_header = "TrueCar Admin"
 admin.site.site_title = "TrueCar Admin Portal"
@@ -0,0 +1,249 @@
+# cars/alerts.py
+"""
+Saved-search and price-drop alerts.
+
+Saved searches are compiled into an inverted index. Each search is filed
+under exactly one "anchor" predicate, its most selective equality filter
+(model, then make, city, body type, ...), or under the price buckets its
+price range covers. A car only has one value per attribute, so looking up
+its model, make, city, ... and price bucket returns each candidate search
+at most once. Only those candidates are checked against the full filter
+set. Matching a car costs roughly the number of searches that share one
+of its attributes, not the total number of saved searches.
+
+``run_alerts`` follows the car change feed, matches every changed active
+car in one pass and writes the resulting ``Notification`` rows in bulk.
+Favorites whose price fell below the price the user saved them at get a
+price drop notification in the same pass.
+"""
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.urls import reverse
+
+from . import changefeed
+from .models import Car, Favorite, Notification, SavedSearch, SavedSearchMatch
+
+
+FEED_CONSUMER = 'alerts'
+
+# Equality filters, most selective first
+ANCHOR_ORDER = ('model', 'make', 'city', 'body_type', 'fuel_type', 'transmission', 'condition')
+
+RANGE_FILTERS = (
+    ('year', 'year_min', 'year_max'),
+    ('price', 'price_min', 'price_max'),
+    ('mileage', 'mileage_min', 'mileage_max'),
+)
+
+# Listing filters a saved search keeps (the same query string keys car_listing reads)
+SEARCH_FILTER_KEYS = ANCHOR_ORDER + tuple(
+    key for _, low, high in RANGE_FILTERS for key in (low, high)
+)
+
+
+def _number(value):
+    try:
+        return Decimal(str(value).replace(',', '')) if value not in (None, '') else None
+    except InvalidOperation:
+        return None
+
+
+class CompiledSearch:
+    """A saved search reduced to plain values for fast matching"""
+    __slots__ = ('id', 'user_id', 'query') + ANCHOR_ORDER + tuple(
+        key for _, low, high in RANGE_FILTERS for key in (low, high)
+    )
+
+    def __init__(self, search_id, user_id, query, filters):
+        self.id = search_id
+        self.user_id = user_id
+        self.query = (query or '').strip().lower()
+        for attr in ANCHOR_ORDER:
+            value = str(filters.get(attr) or '').strip()
+            setattr(self, attr, value.lower() if attr == 'city' else value)
+        for _, low, high in RANGE_FILTERS:
+            setattr(self, low, _number(filters.get(low)))
+            setattr(self, high, _number(filters.get(high)))
+
+    def matches(self, car):
+        for attr in ANCHOR_ORDER:
+            expected = getattr(self, attr)
+            if expected and car[attr] != expected:
+                return False
+        for field, low, high in RANGE_FILTERS:
+            minimum, maximum = getattr(self, low), getattr(self, high)
+            if minimum is not None and car[field] < minimum:
+                return False
+            if maximum is not None and car[field] > maximum:
+                return False
+        return not self.query or self.query in car['text']
+
+
+def price_bucket(price):
+    return int(price // settings.ALERT_PRICE_BUCKET)
+
+
+class AlertIndex:
+    """Inverted index of compiled saved searches"""
+
+    def __init__(self, searches=()):
+        self.buckets = defaultdict(list)
+        self.unanchored = []
+        self.size = 0
+        for search in searches:
+            self.add(search)
+
+    def add(self, search):
+        self.size += 1
+        for attr in ANCHOR_ORDER:
+            value = getattr(search, attr)
+            if value:
+                self.buckets[(attr, value)].append(search)
+                return
+
+        low = search.price_min if search.price_min is not None else 0
+        if search.price_max is not None:
+            first, last = price_bucket(low), price_bucket(search.price_max)
+            if last - first < settings.ALERT_MAX_PRICE_BUCKETS:
+                for bucket in range(first, last + 1):
+                    self.buckets[('price', bucket)].append(search)
+                return
+
+        # No usable anchor: checked against every car
+        self.unanchored.append(search)
+
+    def candidates(self, car):
+        for attr in ANCHOR_ORDER:
+            yield from self.buckets.get((attr, car[attr]), ())
+        yield from self.buckets.get(('price', price_bucket(car['price'])), ())
+        yield from self.unanchored
+
+    def match(self, car):
+        return [search for search in self.candidates(car) if search.matches(car)]
+
+
+def index_version():
+    """Changes whenever active saved searches are added, edited or removed"""
+    state = SavedSearch.objects.filter(is_active=True).aggregate(count=Count('id'), updated=Max('updated_at'))
+    return state['count'], state['updated']
+
+
+def build_index():
+    searches = SavedSearch.objects.filter(is_active=True).values_list(
+        'id', 'user_id', 'query', 'filters'
+    ).iterator(chunk_size=5000)
+    return AlertIndex(
+        CompiledSearch(search_id, user_id, query, filters or {})
+        for search_id, user_id, query, filters in searches
+    )
+
+
+def car_attributes(car):
+    """Plain values of a car (with make and model loaded) as the matcher sees them"""
+    return {
+        'make': car.make.slug,
+        'model': car.model.slug,
+        'city': car.city.lower(),
+        'body_type': car.body_type,
+        'fuel_type': car.fuel_type,
+        'transmission': car.transmission,
+        'condition': car.condition,
+        'year': car.year,
+        'price': car.price,
+        'mileage': car.mileage,
+        'text': ' '.join((car.title, car.make.name, car.model.name, car.description)).lower(),
+    }
+
+
+def notify_saved_searches(cars, index):
+    """Notify owners of saved searches matching ``cars``. Returns the notification count"""
+    matched = []
+    for car in cars:
+        attributes = car_attributes(car)
+        for search in index.match(attributes):
+            if search.user_id != car.seller_id:
+                matched.append((search, car))
+    if not matched:
+        return 0
+
+    already_matched = set(
+        SavedSearchMatch.objects.filter(
+            car_id__in={car.id for _, car in matched}
+        ).values_list('saved_search_id', 'car_id')
+    )
+    new_matches = []
+    notifications = {}
+    for search, car in matched:
+        if (search.id, car.id) in already_matched:
+            continue
+        new_matches.append(SavedSearchMatch(saved_search_id=search.id, car=car))
+        # One notification per user and car, however many of their searches match
+        notifications.setdefault((search.user_id, car.id), Notification(
+            user_id=search.user_id,
+            notification_type='saved_search',
+            title='New match for your saved search',
+            message=f"{car.title} - KES {car.price:,.0f} in {car.city}",
+            link=reverse('car_detail', kwargs={'slug': car.slug}),
+        ))
+
+    with transaction.atomic():
+        SavedSearchMatch.objects.bulk_create(new_matches, batch_size=1000, ignore_conflicts=True)
+        Notification.objects.bulk_create(notifications.values(), batch_size=1000)
+    return len(notifications)
+
+
+def notify_price_drops(car_ids):
+    """Notify users whose favorite cars got cheaper. Returns the notification count"""
+    favorites = list(
+        Favorite.objects.filter(
+            car_id__in=car_ids, car__status='active', saved_price__gt=F('car__price')
+        ).select_related('car')
+    )
+    if not favorites:
+        return 0
+
+    notifications = []
+    for favorite in favorites:
+        car = favorite.car
+        notifications.append(Notification(
+            user_id=favorite.user_id,
+            notification_type='price_drop',
+            title=f"Price drop on {car.title}",
+            message=f"Now KES {car.price:,.0f}, down KES {favorite.saved_price - car.price:,.0f}",
+            link=reverse('car_detail', kwargs={'slug': car.slug}),
+        ))
+        # Only alert again if it drops further
+        favorite.saved_price = car.price
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+        Favorite.objects.bulk_update(favorites, ['saved_price'], batch_size=1000)
+    return len(notifications)
+
+
+def run_alerts(index=None):
+    """
+    Match the cars changed since the last run. Returns ``(search
+    notifications, price drop notifications, changes processed)``.
+    """
+    if not changefeed.has_cursor(FEED_CONSUMER):
+        # First run: start from now instead of alerting on the whole history
+        changefeed.advance_cursor(FEED_CONSUMER, changefeed.latest_seq())
+        return 0, 0, 0
+
+    index = index or build_index()
+    search_count = price_drop_count = 0
+
+    def handle(changes):
+        nonlocal search_count, price_drop_count
+        car_ids = changefeed.changed_car_ids(changes)
+        cars = Car.objects.filter(id__in=car_ids, status='active').select_related('make', 'model')
+        search_count += notify_saved_searches(cars, index)
+        price_drop_count += notify_price_drops(car_ids)
+
+    processed = changefeed.consume(FEED_CONSUMER, handle)
+    return search_count, price_drop_count, processed
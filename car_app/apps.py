@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CarAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'car_app'
+
+    def ready(self):
+        # Register signal receivers
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,193 @@
+# cars/async_views.py
+"""
+Async (ASGI) versions of the read-heavy pages.
+
+They build exactly the same template context as ``home``, ``car_listing``
+and ``car_detail`` in views.py, but issue their independent queries
+concurrently with ``asyncio.gather`` so page latency is roughly the slowest
+query instead of the sum. Enabled with ``ASYNC_VIEWS = True`` and served
+with an ASGI server (``uvicorn true_car.asgi:application``).
+
+Django's async ORM methods still run on the single sync thread of the
+request, so list sections are evaluated in worker threads (each with its
+own connection) to get real overlap between queries.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+from django.db.models import Avg, Count, Max, Min, Q
+from django.http import Http404
+from django.shortcuts import render
+
+from . import activity
+from .db_router import read_from_replica
+from .market import market_summary, price_rating
+from .search_log import log_listing_search, trending_searches
+from .conditional import conditional_page, detail_fingerprint, listing_fingerprint
+from .models import Car, CarMake, Favorite
+from .views import (
+    filter_car_listing, group_specifications, home_context, home_sections,
+    parse_features, similar_cars_queryset,
+)
+
+
+def _evaluate(queryset):
+    """Evaluate a queryset (with its prefetches) in a worker thread"""
+    # Worker threads live outside the request cycle, so apply the same
+    # CONN_MAX_AGE / health-check housekeeping the request thread gets.
+    close_old_connections()
+    try:
+        return list(queryset)
+    finally:
+        close_old_connections()
+
+
+async def fetch(queryset):
+    """Evaluate a queryset concurrently with other ``fetch`` calls"""
+    return await sync_to_async(_evaluate, thread_sensitive=False)(queryset)
+
+
+async def _render(request, template_name, context):
+    # Templates may still touch lazy relations, which must run in sync code
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@read_from_replica
+async def home(request):
+    """Home page with all sections fetched concurrently"""
+    sections = home_sections()
+    names = list(sections)
+
+    results = await asyncio.gather(
+        sync_to_async(market_summary)(),
+        sync_to_async(trending_searches)(),
+        *(fetch(sections[name]) for name in names),
+    )
+    price_stats, trending = results[0], results[1]
+    evaluated = dict(zip(names, results[2:]))
+
+    context = home_context(evaluated, price_stats['total_cars'], price_stats, trending)
+    return await _render(request, 'home.html', context)
+
+
+@read_from_replica
+@conditional_page(listing_fingerprint)
+async def car_listing(request):
+    """Car listing with filters; page, sidebar and counts fetched concurrently"""
+    cars, search_query, current_filters = filter_car_listing(request)
+
+    user = await sync_to_async(get_user)(request)
+
+    async def favorite_ids():
+        if not user.is_authenticated:
+            return []
+        return [
+            car_id async for car_id in
+            Favorite.objects.filter(user=user).values_list('car_id', flat=True)
+        ]
+
+    (total_cars, makes, price_range, year_range, cities, favorite_car_ids) = await asyncio.gather(
+        cars.acount(),
+        fetch(
+            CarMake.objects.all().annotate(
+                car_count=Count('car', filter=Q(car__status='active'))
+            ).filter(car_count__gt=0)
+        ),
+        cars.aaggregate(min_price=Min('price'), max_price=Max('price')),
+        cars.aaggregate(min_year=Min('year'), max_year=Max('year')),
+        fetch(cars.values_list('city', flat=True).distinct().order_by('city')),
+        favorite_ids(),
+    )
+
+    # Pagination: reuse the count we already have instead of a second COUNT
+    paginator = Paginator(cars, 12)
+    paginator.count = total_cars
+    page_number = request.GET.get('page', 1)
+    page_obj = paginator.get_page(page_number)
+    page_obj.object_list = await fetch(page_obj.object_list)
+
+    # Buffered, written by a background thread
+    log_listing_search(
+        user, request.session.session_key, search_query, current_filters, total_cars, page_number,
+    )
+
+    context = {
+        'cars': page_obj,
+        'page_obj': page_obj,
+        'total_cars': total_cars,
+        'makes': makes,
+        'body_types': Car.BODY_TYPE_CHOICES,
+        'conditions': Car.CONDITION_CHOICES,
+        'fuel_types': Car.FUEL_TYPE_CHOICES,
+        'transmissions': Car.TRANSMISSION_CHOICES,
+        'cities': cities,
+        'price_range': price_range,
+        'year_range': year_range,
+        'favorite_car_ids': favorite_car_ids,
+        'search_query': search_query,
+        'current_filters': current_filters,
+    }
+    return await _render(request, 'listings.html', context)
+
+
+@read_from_replica
+@conditional_page(detail_fingerprint)
+async def car_detail(request, slug):
+    """Car detail with reviews, favorites, similar cars and seller stats fetched concurrently"""
+    try:
+        car = await (
+            Car.objects.select_related('make', 'model', 'seller', 'dealer')
+            .prefetch_related('images', 'specifications', 'inspections')
+            .aget(slug=slug)
+        )
+    except Car.DoesNotExist:
+        raise Http404('No Car matches the given query.')
+
+    user = await sync_to_async(get_user)(request)
+    approved_reviews = car.reviews.filter(is_approved=True)
+
+    async def is_favorited():
+        if not user.is_authenticated:
+            return False
+        return await Favorite.objects.filter(user=user, car=car).aexists()
+
+    # Count the view (written in batches, see activity.py)
+    activity.record(car, views=1)
+
+    (reviews, rating, total_reviews, favorited, similar_cars, seller_cars_count, market_rating) = await asyncio.gather(
+        fetch(approved_reviews.order_by('-created_at')[:5]),
+        car.reviews.aaggregate(Avg('rating')),
+        approved_reviews.acount(),
+        is_favorited(),
+        fetch(similar_cars_queryset(car)),
+        Car.objects.filter(seller=car.seller, status='active').exclude(id=car.id).acount(),
+        sync_to_async(price_rating)(car),
+    )
+
+    # Images, specifications and inspections come from the prefetch cache
+    images = car.images.all()
+    primary_image = next((image for image in images if image.is_primary), None) or next(iter(images), None)
+    specifications = car.specifications.all()
+    inspections = sorted(car.inspections.all(), key=lambda i: i.inspection_date, reverse=True)
+
+    context = {
+        'car': car,
+        'images': images,
+        'primary_image': primary_image,
+        'specifications': specifications,
+        'specs_by_category': group_specifications(specifications),
+        'reviews': reviews,
+        'average_rating': rating['rating__avg'] or 0,
+        'total_reviews': total_reviews,
+        'is_favorited': favorited,
+        'inspections': inspections,
+        'latest_inspection': inspections[0] if inspections else None,
+        'features_list': parse_features(car),
+        'similar_cars': similar_cars,
+        'market_rating': market_rating,
+        'seller_cars_count': seller_cars_count,
+    }
+    return await _render(request, 'car_detail.html', context)
@@ -0,0 +1,64 @@
+# cars/auth_backend.py
+"""
+Login by username or email.
+
+``EmailOrUsernameBackend`` finds the account with one query that matches
+either column case-insensitively. The query is served by the
+``UPPER(username)``/``UPPER(email)`` indexes. The password hash is then
+verified exactly once. Django's ``check_password`` re-hashes and saves the
+password when the hasher or its work factor has changed since it was
+stored, so accounts move to the current parameters as their owners log in.
+
+When no account matches, the password is still hashed once, so a
+response's timing doesn't reveal whether an identifier is registered.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+
+UserModel = get_user_model()
+
+
+def find_user(identifier):
+    """
+    The account whose username or email is ``identifier``, ignoring case.
+    An exact username wins over an exact email, then over a case-insensitive
+    match, so an account that differs only in case can't shadow another.
+    """
+    identifier = (identifier or '').strip()
+    if not identifier:
+        return None
+    candidates = list(
+        UserModel._default_manager.filter(Q(username__iexact=identifier) | Q(email__iexact=identifier))[:4]
+    )
+    if not candidates:
+        return None
+
+    def rank(user):
+        if user.username == identifier:
+            return 0
+        if user.email == identifier:
+            return 1
+        return 2 if user.username.lower() == identifier.lower() else 3
+
+    return min(candidates, key=lambda user: (rank(user), user.pk))
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """Authenticate with a username or an email address and a password"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        user = find_user(username)
+        if user is None:
+            # Same hashing cost as a real attempt (see module docstring)
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
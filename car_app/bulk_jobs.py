@@ -0,0 +1,248 @@
+# cars/bulk_jobs.py
+"""
+Admin bulk actions as set-based jobs.
+
+An action never loops over ``save()``. It runs one ``UPDATE ... WHERE id IN
+(chunk)`` per ``BULK_JOB_CHUNK_SIZE`` ids and walks the ids in keyset order,
+committing progress (``processed``/``last_id``) with every chunk, so a job
+can be watched from the admin and resumed after a crash. Selections up to
+``BULK_JOB_INLINE_LIMIT`` rows run straight away in the admin request.
+Larger ones are queued for the ``run_bulk_jobs`` worker.
+
+A running job holds a lease of ``BULK_JOB_LEASE_SECONDS`` that every chunk
+renews. When its worker (or admin request) dies, the lease runs out and the
+next worker claims the job again and resumes after ``last_id``.
+
+``update()`` skips model signals, so each chunk records its change feed
+entries itself. Aggregates derived from the rows (seller/dealer ratings,
+dealer inventory stats) are refreshed once, when the job finishes.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Q
+from django.utils import timezone
+
+from . import changefeed, dealer_stats
+from .models import BulkJob, Car, Dealer, Review, User
+
+
+logger = logging.getLogger(__name__)
+
+
+class BulkAction:
+    """How one ``BulkJob.action`` selects, updates and finishes its rows"""
+
+    def __init__(self, model, values, scope=None, only=None, exclude=None, feed_source='car', finish=None):
+        self.model = model
+        self.values = values
+        self.scope = scope
+        self.only = only
+        self.exclude = exclude
+        self.feed_source = feed_source
+        self.finish = finish
+
+    def rows(self, ids):
+        """The rows of ``ids`` this action applies to"""
+        rows = self.model.objects.filter(id__in=ids)
+        if self.only:
+            rows = rows.filter(**self.only)
+        if self.exclude:
+            rows = rows.exclude(**self.exclude)
+        return rows
+
+    def touched(self, rows):
+        """The (car_id, seller_id, dealer_id) of ``rows``"""
+        car_field = 'id' if self.model is Car else 'car_id'
+        return list(rows.values_list(car_field, 'seller_id', 'dealer_id'))
+
+    def apply(self, ids):
+        """
+        Update one chunk. Returns the (car_id, seller_id, dealer_id) rows
+        touched and the number of rows the UPDATE changed.
+        """
+        rows = self.rows(ids)
+        touched = self.touched(rows)
+        values = self.values() if callable(self.values) else self.values
+        updated = rows.update(**values)
+        changefeed.record_changes({car_id for car_id, _, _ in touched}, source=self.feed_source)
+        return touched, updated
+
+
+def refresh_ratings(seller_ids=(), dealer_ids=()):
+    """Recompute the average approved review rating of sellers and dealers"""
+    for model, field, ids in ((User, 'seller_id', seller_ids), (Dealer, 'dealer_id', dealer_ids)):
+        ids = {pk for pk in ids if pk}
+        if not ids:
+            continue
+        averages = dict(
+            Review.objects.filter(is_approved=True, **{f'{field}__in': ids}).values(field).annotate(
+                average=Avg('rating')
+            ).values_list(field, 'average').order_by()
+        )
+        objects = list(model.objects.filter(id__in=ids).only('id', 'rating'))
+        for obj in objects:
+            obj.rating = round(averages.get(obj.id) or 0, 2)
+        model.objects.bulk_update(objects, ['rating'], batch_size=500)
+
+
+def _refresh_review_aggregates(touched):
+    # Review actions always have selected ids, so touched is always known
+    refresh_ratings(
+        seller_ids={seller_id for _, seller_id, _ in touched},
+        dealer_ids={dealer_id for _, _, dealer_id in touched},
+    )
+
+
+def _refresh_dealer_stats(touched):
+    if touched is None:
+        dealer_stats.recompute()
+        return
+    dealer_ids = {dealer_id for _, _, dealer_id in touched if dealer_id}
+    if dealer_ids:
+        dealer_stats.recompute(dealer_ids=dealer_ids)
+
+
+def _stale_listings(job):
+    days = job.params.get('days') or settings.LISTING_EXPIRY_DAYS
+    return Car.objects.filter(status='active', updated_at__lt=timezone.now() - timedelta(days=days))
+
+
+ACTIONS = {
+    'approve_reviews': BulkAction(
+        Review, {'is_approved': True, 'is_rejected': False},
+        feed_source='review', finish=_refresh_review_aggregates,
+    ),
+    'reject_reviews': BulkAction(
+        Review, {'is_approved': False, 'is_rejected': True},
+        feed_source='review', finish=_refresh_review_aggregates,
+    ),
+    # updated_at is set explicitly: update() skips auto_now, and page caches key on it
+    'feature_cars': BulkAction(Car, lambda: {'is_featured': True, 'updated_at': timezone.now()}),
+    'unfeature_cars': BulkAction(Car, lambda: {'is_featured': False, 'updated_at': timezone.now()}),
+    'mark_cars_sold': BulkAction(
+        Car, lambda: {'status': 'sold', 'sold_at': timezone.now(), 'updated_at': timezone.now()},
+        exclude={'status': 'sold'}, finish=_refresh_dealer_stats,
+    ),
+    # Selected sold, draft or rejected cars are left alone, as in the default scope
+    'expire_listings': BulkAction(
+        Car, lambda: {'status': 'expired', 'updated_at': timezone.now()},
+        scope=_stale_listings, only={'status': 'active'}, finish=_refresh_dealer_stats,
+    ),
+}
+
+
+def _chunks(job, action):
+    """Yield id chunks above ``job.last_id``, in id order"""
+    size = settings.BULK_JOB_CHUNK_SIZE
+    if job.object_ids is not None:
+        ids = sorted(pk for pk in job.object_ids if pk > job.last_id)
+        for start in range(0, len(ids), size):
+            yield ids[start:start + size]
+        return
+
+    scope = action.scope(job)
+    last_id = job.last_id
+    while True:
+        ids = list(scope.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def _lease_expiry():
+    return timezone.now() + timedelta(seconds=settings.BULK_JOB_LEASE_SECONDS)
+
+
+def run_job(job):
+    """Apply ``job`` chunk by chunk (resuming after ``last_id``), then refresh derived aggregates"""
+    action = ACTIONS[job.action]
+    job.status = 'running'
+    job.started_at = job.started_at or timezone.now()
+    job.lease_expires_at = _lease_expiry()
+    if not job.total:
+        job.total = len(job.object_ids) if job.object_ids is not None else action.scope(job).count()
+    job.save(update_fields=['status', 'started_at', 'lease_expires_at', 'total'])
+
+    touched = set()
+    if job.last_id:
+        # Resumed: rows updated before the crash need their aggregates refreshed too.
+        # A scoped job's earlier rows have left its scope, so refresh everything.
+        if job.object_ids is None:
+            touched = None
+        else:
+            touched.update(action.touched(action.rows([pk for pk in job.object_ids if pk <= job.last_id])))
+    try:
+        for ids in _chunks(job, action):
+            with transaction.atomic():
+                rows, updated = action.apply(ids)
+                if touched is not None:
+                    touched.update(rows)
+                # Selected ids the action skips (e.g. sold cars) don't count
+                job.processed += updated
+                job.last_id = ids[-1]
+                job.lease_expires_at = _lease_expiry()
+                job.save(update_fields=['processed', 'last_id', 'lease_expires_at'])
+        if action.finish:
+            action.finish(touched)
+    except Exception as exc:
+        logger.exception('Bulk job %s failed', job.pk)
+        job.status = 'failed'
+        job.error = str(exc)
+    else:
+        job.status = 'done'
+    job.finished_at = timezone.now()
+    job.lease_expires_at = None
+    job.save(update_fields=['status', 'error', 'finished_at', 'lease_expires_at'])
+    return job
+
+
+def submit(action, object_ids=None, params=None, user=None, inline=None):
+    """
+    Create a job for ``object_ids`` (or the action's default scope). Small
+    selections run immediately (or whenever ``inline`` is true); anything
+    larger waits for the worker.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown bulk action '{action}'")
+    if inline is None:
+        inline = object_ids is not None and len(object_ids) <= settings.BULK_JOB_INLINE_LIMIT
+    job = BulkJob.objects.create(
+        action=action,
+        object_ids=sorted(object_ids) if object_ids is not None else None,
+        params=params or {},
+        total=len(object_ids) if object_ids is not None else 0,
+        created_by=user if user is not None and user.is_authenticated else None,
+        # Inline jobs are never pending, so a worker can't pick them up too
+        # unless the admin request dies and the lease runs out
+        status='running' if inline else 'pending',
+        lease_expires_at=_lease_expiry() if inline else None,
+    )
+    if inline:
+        run_job(job)
+    return job
+
+
+def claim_next_job():
+    """
+    Take the oldest pending job, or a running job whose lease ran out because
+    its worker died. Concurrent workers skip each other's job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = BulkJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status='pending')
+            | Q(status='running', lease_expires_at__lt=now)
+            # Running jobs from before leases existed
+            | Q(status='running', lease_expires_at__isnull=True)
+        ).order_by('created_at').first()
+        if job is not None:
+            if job.status == 'running':
+                logger.warning('Resuming bulk job %s after row %s', job.pk, job.last_id)
+            job.status = 'running'
+            job.lease_expires_at = _lease_expiry()
+            job.save(update_fields=['status', 'lease_expires_at'])
+    return job
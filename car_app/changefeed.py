@@ -0,0 +1,116 @@
+# cars/changefeed.py
+"""
+Change feed for the car catalogue.
+
+Every committed save/delete of a ``Car``, ``CarImage`` or ``Review`` appends
+a ``CarChange`` row (see signals.py). Sequence numbers only grow, so derived
+structures (search index, recommendation vectors, card projections, market
+stats) keep a ``FeedCursor`` and process ``changes_since(cursor)`` instead of
+rescanning the table.
+
+Bulk writes that bypass model signals (``bulk_create``, ``update()``) must
+call ``record_changes`` themselves.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import CarChange, FeedCursor
+
+
+def record_changes(car_ids, source='car', action='save'):
+    """Append feed entries for ``car_ids`` once the current transaction commits"""
+    car_ids = [car_id for car_id in car_ids if car_id is not None]
+    if not car_ids:
+        return
+
+    def write():
+        CarChange.objects.bulk_create(
+            [CarChange(car_id=car_id, source=source, action=action) for car_id in car_ids]
+        )
+
+    transaction.on_commit(write)
+
+
+def record_change(car_id, source='car', action='save'):
+    record_changes([car_id], source, action)
+
+
+def latest_seq():
+    """Highest sequence number written so far (0 for an empty feed)"""
+    return CarChange.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+
+def changes_since(seq, limit=None):
+    """
+    Changes with a sequence number above ``seq``, oldest first.
+
+    Entries younger than ``CHANGE_FEED_SETTLE_SECONDS`` are held back so a
+    sequence number handed out just before a slower insert committed can't
+    be skipped. Resume from the ``seq`` of the last returned entry.
+    """
+    limit = limit or settings.CHANGE_FEED_BATCH_SIZE
+    settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    return list(
+        CarChange.objects.filter(seq__gt=seq, created_at__lte=settled).order_by('seq')[:limit]
+    )
+
+
+def changed_car_ids(changes):
+    """Distinct car ids touched by a batch of changes, in feed order"""
+    return list(dict.fromkeys(change.car_id for change in changes))
+
+
+def has_cursor(name):
+    return FeedCursor.objects.filter(name=name).exists()
+
+
+def read_cursor(name):
+    cursor, _ = FeedCursor.objects.get_or_create(name=name)
+    return cursor.seq
+
+
+def advance_cursor(name, seq):
+    FeedCursor.objects.update_or_create(name=name, defaults={'seq': seq})
+
+
+def consume(name, handler, limit=None):
+    """
+    Feed every pending batch to ``handler(changes)`` and move the consumer's
+    cursor past it. The cursor only advances after the handler returns, so a
+    failing handler sees the same batch again next time.
+
+    Returns the number of changes processed.
+    """
+    seq = read_cursor(name)
+    processed = 0
+    while True:
+        changes = changes_since(seq, limit)
+        if not changes:
+            return processed
+        handler(changes)
+        seq = changes[-1].seq
+        advance_cursor(name, seq)
+        processed += len(changes)
+
+
+def compact():
+    """
+    Collapse repeated entries for the same car down to the newest one and
+    drop entries every registered consumer has already processed.
+
+    Both are safe for consumers at any position: anyone behind an entry that
+    is collapsed away still reaches the newer entry for that car.
+    Returns ``(collapsed, trimmed)`` row counts.
+    """
+    newest = CarChange.objects.filter(car_id=OuterRef('car_id')).order_by('-seq').values('seq')[:1]
+    collapsed, _ = CarChange.objects.filter(seq__lt=Subquery(newest)).delete()
+
+    trimmed = 0
+    consumed = FeedCursor.objects.aggregate(seq=Min('seq'))['seq']
+    if consumed:
+        trimmed, _ = CarChange.objects.filter(seq__lte=consumed).delete()
+    return collapsed, trimmed
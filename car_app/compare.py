@@ -0,0 +1,115 @@
+# cars/compare.py
+"""
+Side-by-side car comparison.
+
+However many cars are compared, the matrix is built from four queries:
+the cars (with make and model), all their specifications, their approved
+review aggregates and their images. The specifications are pivoted in
+Python into rows aligned across cars. The rendered matrix is cached under
+the sorted car ids plus their ``updated_at``, so it is rebuilt whenever one
+of the cars is edited. Review and image changes don't touch ``updated_at``
+and show up once ``COMPARE_CACHE_TIMEOUT`` expires.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.core.cache import cache
+from django.db.models import Avg, Count
+from django.template.loader import render_to_string
+
+from .models import Car, CarImage, CarSpecification, Review
+
+
+# (label, value function) rows shown for every car before the specifications
+OVERVIEW_ROWS = [
+    ('Price', lambda car: f"KES {intcomma(int(car.price))}"),
+    ('Year', lambda car: car.year),
+    ('Condition', lambda car: car.get_condition_display()),
+    ('Mileage', lambda car: f"{intcomma(car.mileage)} km"),
+    ('Body type', lambda car: car.get_body_type_display()),
+    ('Engine', lambda car: f"{car.engine_size} L"),
+    ('Fuel type', lambda car: car.get_fuel_type_display()),
+    ('Transmission', lambda car: car.get_transmission_display()),
+    ('Drive type', lambda car: car.get_drive_type_display()),
+    ('Exterior color', lambda car: car.exterior_color),
+    ('Interior color', lambda car: car.interior_color),
+    ('Doors', lambda car: car.doors),
+    ('Seats', lambda car: car.seats),
+    ('Location', lambda car: f"{car.location}, {car.city}"),
+]
+
+MISSING = '—'
+
+
+def parse_car_ids(value):
+    """Car ids from a comma-separated query string value, capped at COMPARE_MAX_CARS"""
+    car_ids = []
+    for part in (value or '').split(','):
+        if part.strip().isdigit() and int(part) not in car_ids:
+            car_ids.append(int(part))
+    return car_ids[:settings.COMPARE_MAX_CARS]
+
+
+def _row(label, values):
+    return {'label': label, 'values': values, 'differs': len(set(map(str, values))) > 1}
+
+
+def build_matrix(car_ids):
+    """Context for compare_matrix.html: columns plus aligned row sections (active cars only)"""
+    cars = list(
+        Car.objects.filter(id__in=car_ids, status='active').select_related('make', 'model').order_by('id')
+    )
+    if not cars:
+        return {'columns': [], 'sections': []}
+    ids = [car.id for car in cars]
+
+    ratings = {
+        row['car_id']: row
+        for row in Review.objects.filter(car_id__in=ids, is_approved=True).values('car_id').annotate(
+            average=Avg('rating'), count=Count('id')
+        ).order_by()
+    }
+
+    primary_images = {}
+    for image in CarImage.objects.filter(car_id__in=ids).order_by('car_id', '-is_primary', 'order'):
+        primary_images.setdefault(image.car_id, image)
+
+    # Pivot: (category, name) -> {car_id: value}, keeping the first-seen order
+    pivot = {}
+    for spec in CarSpecification.objects.filter(car_id__in=ids).order_by('category', 'order', 'name'):
+        pivot.setdefault((spec.category or 'General', spec.name), {})[spec.car_id] = spec.value
+
+    overview = [_row(label, [value(car) for car in cars]) for label, value in OVERVIEW_ROWS]
+    overview.append(_row('Rating', [
+        f"{ratings[car.id]['average']:.1f} ({ratings[car.id]['count']})" if car.id in ratings else MISSING
+        for car in cars
+    ]))
+
+    sections = [{'title': 'Overview', 'rows': overview}]
+    for (category, name), values in pivot.items():
+        if sections[-1]['title'] != category:
+            sections.append({'title': category, 'rows': []})
+        sections[-1]['rows'].append(_row(name, [values.get(car.id, MISSING) for car in cars]))
+
+    columns = [{'car': car, 'image': primary_images.get(car.id)} for car in cars]
+    return {'columns': columns, 'sections': sections}
+
+
+def matrix_cache_key(car_ids, editable):
+    versions = Car.objects.filter(id__in=car_ids).order_by('id').values_list('id', 'updated_at')
+    raw = '|'.join(f"{car_id}:{updated_at.isoformat()}" for car_id, updated_at in versions)
+    digest = hashlib.md5(f"{raw}|{editable}".encode()).hexdigest()
+    return f"compare:matrix:{digest}"
+
+
+def render_matrix(car_ids, editable=False):
+    """Rendered comparison table HTML (cached)"""
+    key = matrix_cache_key(car_ids, editable)
+    html = cache.get(key)
+    if html is None:
+        context = build_matrix(car_ids)
+        context['editable'] = editable
+        html = render_to_string('compare_matrix.html', context)
+        cache.set(key, html, settings.COMPARE_CACHE_TIMEOUT)
+    return html
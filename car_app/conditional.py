@@ -0,0 +1,147 @@
+# cars/conditional.py
+"""
+HTTP conditional GET for the public catalogue pages.
+
+Anonymous visitors (no session cookie) get an ETag/Last-Modified pair
+computed with one or two cheap queries, and a ``304 Not Modified`` without
+any template rendering when nothing changed. Listings use the newest
+``Car.updated_at``. A detail page also shows images and reviews, which
+don't touch ``updated_at``, and a price badge from its market segment, so
+its fingerprint includes the car's latest change feed entry and the
+segment's ``computed_at``.
+Those responses are also marked ``public`` so a CDN or reverse proxy in
+front of gunicorn can cache them. Visitors with a session see
+personalised pages (favorites, messages) and are always served fresh.
+"""
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Strong ETag from the page cache version and the given parts"""
+    raw = '|'.join(str(part) for part in (settings.PAGE_CACHE_VERSION,) + parts)
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def listing_fingerprint(request, *args, **kwargs):
+    """ETag/Last-Modified of the filtered listing: newest updated_at plus row count"""
+    # Imported here to avoid a circular import with views.py
+    from .views import filter_car_listing
+
+    cars, _, _ = filter_car_listing(request)
+    state = cars.order_by().aggregate(last_modified=Max('updated_at'), total=Count('id'))
+    if state['last_modified'] is None:
+        return None
+    etag = make_etag(
+        'listing', request.GET.urlencode(), state['total'], state['last_modified'].isoformat()
+    )
+    return etag, state['last_modified']
+
+
+def detail_fingerprint(request, slug, *args, **kwargs):
+    """ETag/Last-Modified of a car detail page: the car, its images and reviews, and its market segment"""
+    from .market import year_band, mileage_band
+    from .models import Car, CarChange, MarketSegment
+
+    changes = CarChange.objects.filter(car_id=OuterRef('pk')).order_by('-seq')
+    car = Car.objects.filter(slug=slug).annotate(
+        change_seq=Subquery(changes.values('seq')[:1]),
+        changed_at=Subquery(changes.values('created_at')[:1]),
+    ).values('updated_at', 'change_seq', 'changed_at', 'model_id', 'year', 'condition', 'mileage').first()
+    if car is None:
+        return None
+    segment_computed_at = MarketSegment.objects.filter(
+        model_id=car['model_id'],
+        year_band=year_band(car['year']),
+        condition=car['condition'],
+        mileage_band=mileage_band(car['mileage']),
+    ).values_list('computed_at', flat=True).first()
+
+    last_modified = max(filter(None, (car['updated_at'], car['changed_at'], segment_computed_at)))
+    etag = make_etag(
+        'detail', slug, car['updated_at'].isoformat(), car['change_seq'],
+        segment_computed_at.isoformat() if segment_computed_at else None,
+    )
+    return etag, last_modified
+
+
+def _is_personalised(request):
+    return settings.SESSION_COOKIE_NAME in request.COOKIES
+
+
+def _conditional_response(request, fingerprint):
+    if fingerprint is None:
+        return None
+    etag, last_modified = fingerprint
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+
+
+def _finalise(request, response, fingerprint):
+    sets_cookies = response.cookies or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    if _is_personalised(request) or sets_cookies:
+        # Never let a shared cache store someone's session or CSRF cookie
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    if fingerprint is not None and response.status_code in (200, 304):
+        etag, last_modified = fingerprint
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.PAGE_CACHE_MAX_AGE,
+            s_maxage=settings.PAGE_CACHE_S_MAXAGE,
+        )
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def conditional_page(fingerprint_func):
+    """
+    Serve a (sync or async) read view with conditional GET support.
+
+    ``fingerprint_func(request, *args, **kwargs)`` returns ``(etag,
+    last_modified)`` or ``None`` when the page can't be fingerprinted.
+    """
+    def decorator(view_func):
+        def applies(request):
+            return request.method in ('GET', 'HEAD') and not _is_personalised(request)
+
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                fingerprint = None
+                if applies(request):
+                    fingerprint = await sync_to_async(fingerprint_func)(request, *args, **kwargs)
+                    not_modified = _conditional_response(request, fingerprint)
+                    if not_modified is not None:
+                        return _finalise(request, not_modified, fingerprint)
+                response = await view_func(request, *args, **kwargs)
+                return _finalise(request, response, fingerprint)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            fingerprint = None
+            if applies(request):
+                fingerprint = fingerprint_func(request, *args, **kwargs)
+                not_modified = _conditional_response(request, fingerprint)
+                if not_modified is not None:
+                    return _finalise(request, not_modified, fingerprint)
+            response = view_func(request, *args, **kwargs)
+            return _finalise(request, response, fingerprint)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,144 @@
+# cars/db_router.py
+"""
+Read-replica routing.
+
+Views decorated with ``read_from_replica`` send their reads to one of the
+aliases in ``settings.DATABASE_REPLICAS``. Everything else (writes, admin,
+payments) stays on ``default``. A client that just did a POST carries a
+short-lived pin cookie and is served from the primary until it expires, so
+users always see their own favorites, orders and reviews.
+"""
+import asyncio
+import contextvars
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+# alias -> (checked_at, lag_in_seconds)
+_lag_cache = {}
+
+
+def replica_lag(alias):
+    """Replication lag of a replica in seconds (cached for a few seconds)"""
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+    checked_at, lag = _lag_cache.get(alias, (0, None))
+    now = time.monotonic()
+    if now - checked_at < interval:
+        return lag
+
+    connection = connections[alias]
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # The last replayed transaction's age only measures lag while
+                # WAL is still arriving; a caught-up replica on a quiet
+                # primary would otherwise look further behind every second
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )
+                lag = float(cursor.fetchone()[0])
+        else:
+            # Local/test databases (e.g. SQLite) have no replication
+            lag = 0.0
+    except Exception:
+        # An unreachable replica is treated as infinitely behind
+        lag = float('inf')
+
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    """Replica aliases whose lag is within REPLICA_MAX_LAG"""
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG', 5)
+    return [
+        alias for alias in getattr(settings, 'DATABASE_REPLICAS', [])
+        if replica_lag(alias) <= max_lag
+    ]
+
+
+def is_pinned_to_primary(request):
+    """True if the client wrote something recently and must read its own writes"""
+    cookie_name = getattr(settings, 'REPLICA_PIN_COOKIE', 'replica_pin')
+    return cookie_name in request.COOKIES
+
+
+def read_from_replica(view_func):
+    """Route the ORM reads made by a read-only view (sync or async) to a replica"""
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if is_pinned_to_primary(request):
+                return await view_func(request, *args, **kwargs)
+
+            token = _use_replica.set(True)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if is_pinned_to_primary(request):
+            return view_func(request, *args, **kwargs)
+
+        token = _use_replica.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Send reads to a healthy replica inside ``read_from_replica`` views"""
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return 'default'
+        replicas = healthy_replicas()
+        if not replicas:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any alias can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaPinMiddleware:
+    """Pin a client to the primary for a few seconds after any write request"""
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if request.method not in self.SAFE_METHODS and response.status_code < 500:
+            response.set_cookie(
+                getattr(settings, 'REPLICA_PIN_COOKIE', 'replica_pin'),
+                '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,112 @@
+# cars/dealer_stats.py
+"""
+Per-dealer inventory stats stored on ``Dealer``.
+
+Storefront and dashboard pages read the counters straight from the dealer
+row instead of running ``COUNT``/``SUM`` over the cars table. Car signals
+apply the difference between a car's stored and new (dealer, status) with
+``F()`` updates. Views and inquiries are added in batches by the
+activity flusher (see activity.py). ``recompute`` rebuilds the numbers from the cars table. It is
+used after bulk writes that skip signals, and by the
+``recompute_dealer_stats`` command to repair drift.
+"""
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Car, Dealer
+
+
+def days_to_sell(car):
+    listed = car.published_at or car.created_at or timezone.now()
+    sold = car.sold_at or timezone.now()
+    return max((sold - listed).days, 0)
+
+
+def _contribution(car, status):
+    """Counter values one car in ``status`` adds to its dealer"""
+    return {
+        'total_listings': 1,
+        'active_listings': 1 if status == 'active' else 0,
+        'sold_listings': 1 if status == 'sold' else 0,
+        'total_views': car.views,
+        'total_inquiries': car.inquiries,
+        'total_days_to_sell': days_to_sell(car) if status == 'sold' else 0,
+    }
+
+
+def _apply(dealer_id, deltas, sign):
+    changes = {field: F(field) + sign * value for field, value in deltas.items() if value}
+    if dealer_id and changes:
+        Dealer.objects.filter(id=dealer_id).update(**changes)
+
+
+def car_saved(car, created):
+    """Move a saved car's contribution from its stored state to its new one"""
+    new_state = (car.dealer_id, car.status)
+    old_state = None if created else getattr(car, '_loaded_state', False)
+
+    if old_state is False:
+        # Loaded without dealer/status (deferred fields): fall back to a rebuild
+        recompute(dealer_ids=[car.dealer_id])
+    elif old_state is None:
+        _apply(car.dealer_id, _contribution(car, car.status), +1)
+    elif old_state != new_state:
+        old_dealer_id, old_status = old_state
+        old = _contribution(car, old_status)
+        new = _contribution(car, car.status)
+        if old_dealer_id == car.dealer_id:
+            _apply(car.dealer_id, {field: new[field] - old[field] for field in new}, +1)
+        else:
+            _apply(old_dealer_id, old, -1)
+            _apply(car.dealer_id, new, +1)
+    car._loaded_state = new_state
+
+
+def car_deleted(car):
+    dealer_id, status = getattr(car, '_loaded_state', (car.dealer_id, car.status))
+    _apply(dealer_id, _contribution(car, status), -1)
+
+
+def add_counters(dealer_id, views=0, inquiries=0):
+    """Add car page views / inquiries to a dealer's totals"""
+    _apply(dealer_id, {'total_views': views, 'total_inquiries': inquiries}, +1)
+
+
+def recompute(dealer_ids=None):
+    """Rebuild the stats of all dealers (or ``dealer_ids``) from the cars table"""
+    dealers = Dealer.objects.all()
+    if dealer_ids is not None:
+        dealers = dealers.filter(id__in=[dealer_id for dealer_id in dealer_ids if dealer_id])
+
+    stats = {
+        row['dealer_id']: row
+        for row in Car.objects.filter(dealer__in=dealers).values('dealer_id').annotate(
+            total_listings=Count('id'),
+            active_listings=Count('id', filter=Q(status='active')),
+            sold_listings=Count('id', filter=Q(status='sold')),
+            total_views=Sum('views'),
+            total_inquiries=Sum('inquiries'),
+        ).order_by()
+    }
+    sold_days = {}
+    sold = Car.objects.filter(dealer__in=dealers, status='sold').only(
+        'id', 'dealer_id', 'status', 'created_at', 'published_at', 'sold_at'
+    )
+    for car in sold.iterator(chunk_size=2000):
+        sold_days[car.dealer_id] = sold_days.get(car.dealer_id, 0) + days_to_sell(car)
+
+    updated = []
+    for dealer in dealers:
+        row = stats.get(dealer.id, {})
+        dealer.total_listings = row.get('total_listings', 0)
+        dealer.active_listings = row.get('active_listings', 0)
+        dealer.sold_listings = row.get('sold_listings', 0)
+        dealer.total_views = row.get('total_views') or 0
+        dealer.total_inquiries = row.get('total_inquiries') or 0
+        dealer.total_days_to_sell = sold_days.get(dealer.id, 0)
+        updated.append(dealer)
+    Dealer.objects.bulk_update(updated, [
+        'total_listings', 'active_listings', 'sold_listings',
+        'total_views', 'total_inquiries', 'total_days_to_sell',
+    ], batch_size=500)
+    return len(updated)
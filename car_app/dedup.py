@@ -0,0 +1,272 @@
+# cars/dedup.py
+"""
+Duplicate listing detection.
+
+The same vehicle is often listed by several sellers, and ``Car.vin`` is
+optional. Every live listing gets a few blocking keys in ``ListingKey``:
+
+* its normalised VIN (case, spacing, and the I/O/Q letters VINs never use);
+* feature keys over make, model, year, colour, city, mileage band and price
+  band. The bands are also taken on grids shifted by half a band, so two
+  listings just either side of a band boundary still share a key;
+* for each photo, the bands of its 64-bit difference hash (dHash). With
+  ``DEDUP_PHOTO_DISTANCE + 1`` bands, two hashes within that many bits of
+  each other always share at least one band. Photo keys are scoped to the
+  car model, which keeps the short bands selective.
+
+A listing is only compared with listings that share one of its keys, found
+through the ``key`` index, so detection stays near-linear in the number of
+listings instead of comparing every pair. Keys shared by more than
+``DEDUP_MAX_BLOCK_SIZE`` listings (stock photos, dealer banners, the most
+common cars in a city) are too generic and are skipped. Pairs from
+different sellers whose evidence scores at least ``DEDUP_MIN_SCORE`` are
+stored as a ``DuplicateListing`` and queued for the moderators.
+
+Photos are hashed with Pillow in a process pool. A photo is hashed once,
+and its hash is reused for as long as the image exists. After a full build,
+``find_duplicates`` follows the car change feed.
+"""
+import hashlib
+import math
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, product
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Count
+from PIL import Image
+
+from . import changefeed, moderation
+from .models import Car, CarImage, DuplicateListing, ListingKey
+
+
+FEED_CONSUMER = 'dedup'
+
+# Listings that are, or are about to be, visible to buyers
+LIVE_STATUSES = ('pending', 'active', 'reserved')
+
+SCORES = {'vin': 1.0, 'photo': 0.6, 'features': 0.4}
+
+# Below this many photos a process pool costs more than it saves
+_POOL_MIN_IMAGES = 16
+
+_HASH_MASK = (1 << 64) - 1
+_VIN_LETTERS = str.maketrans('IOQ', '100')
+_CAR_FIELDS = ('id', 'make_id', 'model_id', 'year', 'exterior_color', 'city', 'mileage', 'price', 'vin')
+
+
+def _hash_key(*parts):
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def normalize_vin(vin):
+    """Comparable form of a 17 character VIN, or None"""
+    vin = ''.join(ch for ch in (vin or '').upper() if ch.isalnum()).translate(_VIN_LETTERS)
+    return vin if len(vin) == 17 else None
+
+
+def feature_keys(car):
+    """Feature keys of a listing, given its ``_CAR_FIELDS`` as a dict"""
+    mileage = car['mileage'] / settings.DEDUP_MILEAGE_BAND
+    price = math.log(max(float(car['price']), 1)) / math.log1p(settings.DEDUP_PRICE_BAND)
+    color = ' '.join(car['exterior_color'].lower().split())
+    city = ' '.join(car['city'].lower().split())
+    return [
+        _hash_key(
+            car['make_id'], car['model_id'], car['year'], color, city,
+            mileage_shift, math.floor(mileage + mileage_shift), price_shift, math.floor(price + price_shift),
+        )
+        for mileage_shift, price_shift in product((0, 0.5), repeat=2)
+    ]
+
+
+def dhash(file):
+    """64-bit difference hash of an image, as a signed int64"""
+    with Image.open(file) as image:
+        pixels = np.asarray(image.convert('L').resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), 'big', signed=True)
+
+
+def photo_keys(model_id, value):
+    """Band keys of a dHash; hashes within ``DEDUP_PHOTO_DISTANCE`` bits share one"""
+    bands = settings.DEDUP_PHOTO_DISTANCE + 1
+    width = 64 // bands
+    value &= _HASH_MASK
+    return [
+        _hash_key('photo', model_id, band, (value >> (band * width)) & ((1 << width) - 1))
+        for band in range(bands)
+    ]
+
+
+def _distance(a, b):
+    return ((a ^ b) & _HASH_MASK).bit_count()
+
+
+def _hash_stored_image(name):
+    try:
+        with default_storage.open(name) as file:
+            return dhash(file)
+    except (OSError, ValueError):
+        return None
+
+
+def hash_images(names):
+    """dHash of each stored image (None when unreadable); large batches use a process pool"""
+    if len(names) < _POOL_MIN_IMAGES:
+        return [_hash_stored_image(name) for name in names]
+    # Worker processes must not share this process's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=settings.DEDUP_IMAGE_WORKERS, initializer=django.setup) as pool:
+        return list(pool.map(_hash_stored_image, names, chunksize=32))
+
+
+def index_cars(car_ids):
+    """Rebuild the keys of ``car_ids``; listings that aren't live lose theirs. Returns the live count"""
+    cars = list(Car.objects.filter(id__in=car_ids, status__in=LIVE_STATUSES).values(*_CAR_FIELDS))
+    images = list(
+        CarImage.objects.filter(car_id__in=[car['id'] for car in cars]).exclude(image='').values_list(
+            'id', 'car_id', 'image'
+        )
+    )
+    hashes = dict(
+        ListingKey.objects.filter(
+            kind='photo', image_id__in=[image_id for image_id, _, _ in images]
+        ).values_list('image_id', 'dhash')
+    )
+    missing = [(image_id, name) for image_id, _, name in images if image_id not in hashes]
+    hashes.update(zip([image_id for image_id, _ in missing], hash_images([name for _, name in missing])))
+
+    keys = []
+    for car in cars:
+        vin = normalize_vin(car['vin'])
+        if vin:
+            keys.append(ListingKey(car_id=car['id'], kind='vin', key=_hash_key('vin', vin)))
+        keys += [ListingKey(car_id=car['id'], kind='features', key=key) for key in feature_keys(car)]
+    model_ids = {car['id']: car['model_id'] for car in cars}
+    for image_id, car_id, _ in images:
+        value = hashes.get(image_id)
+        if value is not None:
+            keys += [
+                ListingKey(car_id=car_id, kind='photo', key=key, image_id=image_id, dhash=value)
+                for key in photo_keys(model_ids[car_id], value)
+            ]
+
+    with transaction.atomic():
+        ListingKey.objects.filter(car_id__in=car_ids).delete()
+        ListingKey.objects.bulk_create(keys, batch_size=5000)
+    return len(cars)
+
+
+def _blocks(car_ids):
+    """(kind, key) -> [(car_id, dhash)] for every usable key of ``car_ids``"""
+    own = list(ListingKey.objects.filter(car_id__in=car_ids).values_list('key', flat=True).distinct())
+    usable = []
+    for start in range(0, len(own), 1000):
+        usable += ListingKey.objects.filter(key__in=own[start:start + 1000]).values('key').annotate(
+            listings=Count('car_id', distinct=True)
+        ).filter(listings__gt=1, listings__lte=settings.DEDUP_MAX_BLOCK_SIZE).values_list('key', flat=True).order_by()
+
+    blocks = defaultdict(list)
+    for start in range(0, len(usable), 1000):
+        rows = ListingKey.objects.filter(key__in=usable[start:start + 1000]).values_list('car_id', 'kind', 'key', 'dhash')
+        for car_id, kind, key, value in rows:
+            blocks[(kind, key)].append((car_id, value))
+    return blocks
+
+
+def match_cars(car_ids):
+    """Record duplicates of ``car_ids`` among all indexed listings. Returns the pairs found"""
+    car_ids = set(car_ids)
+    evidence = defaultdict(set)
+    for (kind, _), members in _blocks(car_ids).items():
+        for (car_a, hash_a), (car_b, hash_b) in combinations(members, 2):
+            if car_a == car_b or (car_a not in car_ids and car_b not in car_ids):
+                continue
+            if kind == 'photo' and _distance(hash_a, hash_b) > settings.DEDUP_PHOTO_DISTANCE:
+                continue
+            evidence[frozenset((car_a, car_b))].add(kind)
+
+    scores = {pair: sum(SCORES[kind] for kind in kinds) for pair, kinds in evidence.items()}
+    suspects = [pair for pair, score in scores.items() if score >= settings.DEDUP_MIN_SCORE]
+    if not suspects:
+        return 0
+    cars = {
+        car_id: (seller_id, created_at)
+        for car_id, seller_id, created_at in Car.objects.filter(
+            id__in={car_id for pair in suspects for car_id in pair}
+        ).values_list('id', 'seller_id', 'created_at')
+    }
+
+    matches = {}
+    for pair in suspects:
+        if not pair <= cars.keys():
+            continue
+        older, newer = sorted(pair, key=lambda car_id: (cars[car_id][1], car_id))
+        # A seller relisting their own car is not someone else's duplicate
+        if cars[older][0] == cars[newer][0]:
+            continue
+        matches[(newer, older)] = DuplicateListing(
+            car_id=newer, duplicate_of_id=older,
+            reasons=','.join(sorted(evidence[pair])), score=min(scores[pair], 1.0),
+        )
+    if not matches:
+        return 0
+
+    with transaction.atomic():
+        # Pairs seen before keep their row (and a moderator's earlier decision)
+        DuplicateListing.objects.bulk_create(matches.values(), batch_size=1000, ignore_conflicts=True)
+        pending = DuplicateListing.objects.filter(
+            status='pending',
+            car_id__in={newer for newer, _ in matches},
+            duplicate_of_id__in={older for _, older in matches},
+        ).values_list('id', 'car_id', 'duplicate_of_id')
+        moderation.enqueue('duplicate', [
+            match_id for match_id, newer, older in pending if (newer, older) in matches
+        ])
+    return len(matches)
+
+
+def _live_chunks():
+    last_id = 0
+    live = Car.objects.filter(status__in=LIVE_STATUSES).order_by('id')
+    while True:
+        ids = list(live.filter(id__gt=last_id).values_list('id', flat=True)[:settings.DEDUP_CHUNK_SIZE])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def find_duplicates(full=False):
+    """
+    Index listings changed since the last run and look for their duplicates
+    (every live listing on the first run or with ``full``).
+
+    Returns ``(listings_indexed, pairs_found)``.
+    """
+    if full or not changefeed.has_cursor(FEED_CONSUMER):
+        # Everything up to here is covered by the rebuild
+        head = changefeed.latest_seq()
+        ListingKey.objects.exclude(car__status__in=LIVE_STATUSES).delete()
+        indexed = sum(index_cars(ids) for ids in _live_chunks())
+        # Only match once everything is indexed, so no pair depends on chunk order
+        found = sum(match_cars(ids) for ids in _live_chunks())
+        changefeed.advance_cursor(FEED_CONSUMER, head)
+        return indexed, found
+
+    indexed = found = 0
+
+    def handle(changes):
+        nonlocal indexed, found
+        car_ids = changefeed.changed_car_ids(changes)
+        indexed += index_cars(car_ids)
+        found += match_cars(car_ids)
+
+    changefeed.consume(FEED_CONSUMER, handle)
+    return indexed, found
@@ -0,0 +1,146 @@
+# cars/exports.py
+"""
+Streaming inventory export.
+
+Cars are read through ``.iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL) with images, specifications and inspections prefetched one
+chunk at a time, and every row is encoded as soon as it is read. Memory use
+stays flat no matter how many cars are exported and the first bytes go out
+immediately.
+"""
+import csv
+import json
+
+from django.conf import settings
+
+from .models import Car
+
+
+CSV_COLUMNS = [
+    'id', 'slug', 'vin', 'title', 'make', 'model', 'year', 'condition', 'body_type',
+    'mileage', 'engine_size', 'fuel_type', 'transmission', 'drive_type',
+    'exterior_color', 'interior_color', 'doors', 'seats', 'price', 'negotiable',
+    'location', 'city', 'country', 'status', 'is_featured', 'views', 'inquiries',
+    'seller', 'dealer', 'features', 'created_at', 'updated_at',
+    'images', 'specifications', 'inspections',
+]
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+
+class Echo:
+    """File-like object whose ``write`` just returns the value (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def inventory_queryset(user=None, dealer=None):
+    """Cars visible to an exporting user (all cars for staff / when user is None)"""
+    cars = Car.objects.select_related(
+        'make', 'model', 'seller', 'dealer'
+    ).prefetch_related(
+        'images', 'specifications', 'inspections'
+    ).order_by('id')
+
+    if dealer is not None:
+        cars = cars.filter(dealer=dealer)
+    if user is not None and not user.is_staff:
+        if user.user_type == 'dealer' and hasattr(user, 'dealer'):
+            cars = cars.filter(dealer=user.dealer)
+        else:
+            cars = cars.filter(seller=user)
+    return cars
+
+
+def _iterate(queryset):
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def car_record(car):
+    """Plain dict for one car, including its related rows"""
+    return {
+        'id': car.id,
+        'slug': car.slug,
+        'vin': car.vin or '',
+        'title': car.title,
+        'make': car.make.name,
+        'model': car.model.name,
+        'year': car.year,
+        'condition': car.condition,
+        'body_type': car.body_type,
+        'mileage': car.mileage,
+        'engine_size': str(car.engine_size),
+        'fuel_type': car.fuel_type,
+        'transmission': car.transmission,
+        'drive_type': car.drive_type,
+        'exterior_color': car.exterior_color,
+        'interior_color': car.interior_color,
+        'doors': car.doors,
+        'seats': car.seats,
+        'price': str(car.price),
+        'negotiable': car.negotiable,
+        'location': car.location,
+        'city': car.city,
+        'country': car.country,
+        'status': car.status,
+        'is_featured': car.is_featured,
+        'views': car.views,
+        'inquiries': car.inquiries,
+        'seller': car.seller.username,
+        'dealer': car.dealer.slug if car.dealer else '',
+        'features': car.features,
+        'created_at': car.created_at.isoformat(),
+        'updated_at': car.updated_at.isoformat(),
+        'images': [
+            {'url': image.image.name, 'caption': image.caption, 'is_primary': image.is_primary}
+            for image in car.images.all()
+        ],
+        'specifications': [
+            {'category': spec.category, 'name': spec.name, 'value': spec.value}
+            for spec in car.specifications.all()
+        ],
+        'inspections': [
+            {
+                'inspector_name': inspection.inspector_name,
+                'inspection_date': inspection.inspection_date.isoformat(),
+                'overall_condition': inspection.overall_condition,
+            }
+            for inspection in car.inspections.all()
+        ],
+    }
+
+
+def _flatten(record):
+    """Collapse the related lists into single CSV cells"""
+    row = dict(record)
+    row['images'] = '|'.join(image['url'] for image in record['images'])
+    row['specifications'] = '; '.join(
+        f"{spec['name']}={spec['value']}" for spec in record['specifications']
+    )
+    row['inspections'] = '; '.join(
+        f"{inspection['inspection_date']}:{inspection['overall_condition']}"
+        for inspection in record['inspections']
+    )
+    return [row[column] for column in CSV_COLUMNS]
+
+
+def iter_csv(queryset):
+    """Yield the export as CSV lines"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for car in _iterate(queryset):
+        yield writer.writerow(_flatten(car_record(car)))
+
+
+def iter_jsonl(queryset):
+    """Yield the export as JSON Lines"""
+    for car in _iterate(queryset):
+        yield json.dumps(car_record(car)) + '\n'
+
+
+def iter_export(queryset, export_format):
+    if export_format == 'jsonl':
+        return iter_jsonl(queryset)
+    return iter_csv(queryset)
@@ -1,7 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from .models import User
+from .normalize import normalize_email, normalize_phone
 import re
 
 
@@ -177,16 +179,10 @@ class RegisterForm(UserCreationForm):
         if len(username) < 3:
             raise ValidationError('Username must be at least 3 characters long.')
         
-        if User.objects.filter(username=username).exists():
-            raise ValidationError('This username is already taken.')
-        
         return username
     
     def clean_email(self):
-        email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
-            raise ValidationError('A user with this email already exists.')
-        return email.lower()
+        return self.cleaned_data.get('email').lower()
     
     def clean_phone_number(self):
         phone_number = self.cleaned_data.get('phone_number')
@@ -198,10 +194,7 @@ class RegisterForm(UserCreationForm):
         if not re.match(r'^\+?[\d]{10,15}$', phone_clean):
             raise ValidationError('Please enter a valid phone number (10-15 digits).')
         
-        if User.objects.filter(phone_number=phone_number).exists():
-            raise ValidationError('A user with this phone number already exists.')
-        
-        return phone_number
+        return phone_clean
     
     def clean_password1(self):
         password = self.cleaned_data.get('password1')
@@ -232,7 +225,52 @@ class RegisterForm(UserCreationForm):
             if not cleaned_data.get('city'):
                 self.add_error('city', 'City is required for dealers.')
         
+        self.check_unique()
         return cleaned_data
+    
+    UNIQUE_ERRORS = {
+        'username': 'This username is already taken.',
+        'email': 'A user with this email already exists.',
+        'phone_number': 'A user with this phone number already exists.',
+    }
+    
+    def check_unique(self):
+        """
+        Check username, email and phone number against existing accounts in
+        one query, on the canonical columns. Also used after an
+        IntegrityError, when another registration won a race.
+        """
+        username = self.cleaned_data.get('username')
+        email = normalize_email(self.cleaned_data.get('email'))
+        phone = normalize_phone(self.cleaned_data.get('phone_number'))
+        conditions = Q()
+        if username:
+            conditions |= Q(username__iexact=username)
+        if email:
+            conditions |= Q(email_canonical=email)
+        if phone:
+            conditions |= Q(phone_canonical=phone)
+        if not conditions:
+            return
+        
+        taken = set()
+        for other_username, other_email, other_phone in User.objects.filter(conditions).values_list(
+            'username', 'email_canonical', 'phone_canonical'
+        )[:3]:
+            if username and other_username.lower() == username.lower():
+                taken.add('username')
+            if email and other_email == email:
+                taken.add('email')
+            if phone and other_phone == phone:
+                taken.add('phone_number')
+        for field in taken:
+            if field not in self.errors:
+                self.add_error(field, self.UNIQUE_ERRORS[field])
+    
+    def validate_unique(self):
+        # Already covered by check_unique(); the model's own check would
+        # cost one more query per unique field
+        pass
 
 
 class UserUpdateForm(forms.ModelForm):
@@ -253,8 +291,24 @@ class UserUpdateForm(forms.ModelForm):
             'postal_code': forms.TextInput(attrs={'class': 'form-control'}),
         }
     
+    def clean_email(self):
+        email = self.cleaned_data.get('email')
+        canonical = normalize_email(email)
+        # Unchanged details aren't rechecked: accounts that already shared
+        # them before canonical columns existed must still be able to save
+        if (
+            canonical and 'email' in self.changed_data
+            and User.objects.filter(email_canonical=canonical).exclude(pk=self.instance.pk).exists()
+        ):
+            raise ValidationError('A user with this email already exists.')
+        return email
+    
     def clean_phone_number(self):
         phone_number = self.cleaned_data.get('phone_number')
-        if User.objects.filter(phone_number=phone_number).exclude(pk=self.instance.pk).exists():
+        phone = normalize_phone(phone_number)
+        if (
+            phone and 'phone_number' in self.changed_data
+            and User.objects.filter(phone_canonical=phone).exclude(pk=self.instance.pk).exists()
+        ):
             raise ValidationError('A user with this phone number already exists.')
         return phone_number
\ No newline at end of file
@@ -0,0 +1,147 @@
+# cars/http_client.py
+"""
+Outbound HTTP to payment providers.
+
+Every provider in ``OUTBOUND_HTTP`` gets one ``requests.Session`` per
+process, so TCP/TLS connections are pooled and reused instead of set up on
+every call. Requests always carry a (connect, read) timeout, so a hanging
+provider can't hold a worker indefinitely.
+
+Connection failures are retried with exponential backoff plus jitter, and
+idempotent requests are also retried on 502/503/504. A POST that reached
+the provider is never re-sent, because it could charge a customer twice.
+
+A per-provider circuit breaker opens after ``failure_threshold``
+consecutive failures (connection errors, timeouts, 5xx). While it is open,
+calls fail immediately with ``ProviderUnavailable`` instead of waiting for
+timeouts. After ``reset_seconds`` one trial request is let through, and
+its outcome closes the breaker or opens it again.
+
+Latency, status classes, errors and breaker trips are recorded in
+``metrics`` under ``http.<provider>``.
+"""
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+
+class ProviderUnavailable(requests.ConnectionError):
+    """The provider's circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial"""
+
+    def __init__(self, name, failure_threshold, reset_seconds):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                metrics.incr(f'http.{self.name}.rejected')
+                raise ProviderUnavailable(f'{self.name} is unavailable, try again shortly')
+            # Half-open: this call is the trial; everyone else keeps failing fast
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    metrics.incr(f'http.{self.name}.circuit_opened')
+                self.opened_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_sessions = {}
+_breakers = {}
+
+
+def _config(provider):
+    return {**settings.OUTBOUND_HTTP_DEFAULTS, **settings.OUTBOUND_HTTP.get(provider, {})}
+
+
+def session(provider):
+    """The process-wide pooled session for ``provider``"""
+    with _lock:
+        if provider not in _sessions:
+            config = _config(provider)
+            retry = Retry(
+                total=config['retries'],
+                connect=config['retries'],
+                read=config['retries'],
+                status=config['retries'],
+                backoff_factor=config['backoff'],
+                backoff_jitter=config['backoff'],
+                status_forcelist=(502, 503, 504),
+                # Only idempotent methods are retried after the request was sent
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['pool_size'], max_retries=retry)
+            provider_session = requests.Session()
+            provider_session.mount('https://', adapter)
+            provider_session.mount('http://', adapter)
+            _sessions[provider] = provider_session
+            _breakers[provider] = CircuitBreaker(provider, config['failure_threshold'], config['reset_seconds'])
+        return _sessions[provider]
+
+
+def breaker(provider):
+    session(provider)
+    return _breakers[provider]
+
+
+def request(provider, method, url, **kwargs):
+    """
+    Send a request to ``provider``. Raises ``ProviderUnavailable`` while its
+    breaker is open, and ``requests`` exceptions for transport failures.
+    """
+    provider_session = session(provider)
+    provider_breaker = _breakers[provider]
+    provider_breaker.before_call()
+
+    config = _config(provider)
+    kwargs.setdefault('timeout', (config['connect_timeout'], config['read_timeout']))
+    started = time.perf_counter()
+    try:
+        response = provider_session.request(method, url, **kwargs)
+    except requests.RequestException:
+        provider_breaker.record_failure()
+        metrics.incr(f'http.{provider}.errors')
+        raise
+    finally:
+        metrics.observe(f'http.{provider}', time.perf_counter() - started)
+
+    if response.status_code >= 500:
+        provider_breaker.record_failure()
+    else:
+        provider_breaker.record_success()
+    metrics.incr(f'http.{provider}.{response.status_code // 100}xx')
+    return response
+
+
+def get(provider, url, **kwargs):
+    return request(provider, 'GET', url, **kwargs)
+
+
+def post(provider, url, **kwargs):
+    return request(provider, 'POST', url, **kwargs)
@@ -0,0 +1,347 @@
+# cars/imports.py
+"""
+Bulk inventory import for dealers.
+
+Rows are parsed from CSV or JSONL in chunks. Validation is pure Python with
+no database access; the management command validates large files in a
+process pool, while web uploads and small files validate in-process. Makes and models are
+resolved through in-memory lookup maps loaded once per import, and rows are
+written with ``bulk_create``. A row whose VIN matches one of the
+importer's own cars updates that car, so re-importing a stock file updates
+prices and mileage instead of failing. A VIN listed by another seller is
+rejected, never overwritten. New cars always start as ``pending`` and go
+through the moderation queue like any other new listing; a file can't set
+the status. Rows that fail validation are reported with their line number
+and never block the rest of the file.
+"""
+import csv
+import io
+import json
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import dealer_stats, moderation
+from .changefeed import record_changes
+from .models import Car, CarMake, CarModel
+
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+REQUIRED_FIELDS = [
+    'make', 'model', 'year', 'condition', 'body_type', 'mileage', 'engine_size',
+    'fuel_type', 'transmission', 'drive_type', 'exterior_color', 'interior_color',
+    'doors', 'seats', 'price', 'location', 'city',
+]
+
+# Fields rewritten when a row's VIN matches one of the importer's cars.
+# Status is not among them: it only changes through moderation and sales.
+UPDATE_FIELDS = [
+    'make', 'model', 'year', 'title', 'condition', 'body_type', 'mileage', 'engine_size',
+    'fuel_type', 'transmission', 'drive_type', 'exterior_color', 'interior_color',
+    'doors', 'seats', 'price', 'negotiable', 'location', 'city', 'country',
+    'description', 'features', 'updated_at',
+]
+
+CHOICES = {
+    'condition': {value for value, _ in Car.CONDITION_CHOICES},
+    'body_type': {value for value, _ in Car.BODY_TYPE_CHOICES},
+    'fuel_type': {value for value, _ in Car.FUEL_TYPE_CHOICES},
+    'transmission': {value for value, _ in Car.TRANSMISSION_CHOICES},
+    'drive_type': {value for value, _ in Car.DRIVE_TYPE_CHOICES},
+}
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+# Below this many rows a process pool costs more than it saves
+_POOL_MIN_ROWS = 2000
+
+
+class ImportResult:
+    """Counters and per-row errors of one import run"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (line number, [messages])
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def as_dict(self, max_errors=None):
+        errors = self.errors if max_errors is None else self.errors[:max_errors]
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': [{'line': line, 'errors': messages} for line, messages in errors],
+        }
+
+    def write_error_report(self, fileobj):
+        writer = csv.writer(fileobj)
+        writer.writerow(['line', 'errors'])
+        for line, messages in self.errors:
+            writer.writerow([line, '; '.join(messages)])
+
+
+def iter_rows(fileobj, import_format):
+    """Yield ``(line_number, row_dict)`` from a text file object"""
+    if import_format == 'jsonl':
+        for line_number, line in enumerate(fileobj, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else {'__invalid__': True}
+    else:
+        reader = csv.DictReader(fileobj)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def _clean_int(row, field, errors, minimum=None, maximum=None):
+    try:
+        value = int(str(row.get(field, '')).strip().replace(',', ''))
+    except ValueError:
+        errors.append(f'{field}: not a whole number')
+        return None
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        errors.append(f'{field}: must be between {minimum} and {maximum}')
+    return value
+
+
+def _clean_decimal(row, field, errors):
+    try:
+        value = Decimal(str(row.get(field, '')).strip().replace(',', ''))
+    except InvalidOperation:
+        errors.append(f'{field}: not a number')
+        return None
+    if value < 0:
+        errors.append(f'{field}: must not be negative')
+    return value
+
+
+def validate_row(item):
+    """
+    Validate and normalise one raw row. Runs in a worker process, so it only
+    uses plain Python (no ORM access).
+
+    Returns ``(line_number, cleaned_row_or_None, errors)``.
+    """
+    line_number, row = item
+    if row.get('__invalid__'):
+        return line_number, None, ['line is not a JSON object']
+
+    row = {key.strip().lower(): ('' if value is None else value) for key, value in row.items() if key}
+    errors = [f'{field}: required' for field in REQUIRED_FIELDS if not str(row.get(field, '')).strip()]
+    if errors:
+        return line_number, None, errors
+
+    cleaned = {
+        'make': str(row['make']).strip(),
+        'model': str(row['model']).strip(),
+        'year': _clean_int(row, 'year', errors, 1900, 2025),
+        'mileage': _clean_int(row, 'mileage', errors, 0),
+        'doors': _clean_int(row, 'doors', errors, 2, 5),
+        'seats': _clean_int(row, 'seats', errors, 2, 9),
+        'engine_size': _clean_decimal(row, 'engine_size', errors),
+        'price': _clean_decimal(row, 'price', errors),
+    }
+
+    for field, allowed in CHOICES.items():
+        value = str(row[field]).strip().lower()
+        if value not in allowed:
+            errors.append(f'{field}: must be one of {", ".join(sorted(allowed))}')
+        cleaned[field] = value
+
+    vin = str(row.get('vin', '')).strip().upper()
+    if vin and len(vin) > 17:
+        errors.append('vin: at most 17 characters')
+    cleaned['vin'] = vin or None
+
+    for field in ('exterior_color', 'interior_color', 'location', 'city'):
+        cleaned[field] = str(row[field]).strip()
+    cleaned['country'] = str(row.get('country', '')).strip() or 'Kenya'
+    cleaned['title'] = str(row.get('title', '')).strip()
+    cleaned['description'] = str(row.get('description', '')).strip()
+    cleaned['features'] = str(row.get('features', '')).strip()
+    negotiable = str(row.get('negotiable', '')).strip().lower()
+    cleaned['negotiable'] = negotiable in TRUE_VALUES if negotiable else True
+
+    return line_number, (None if errors else cleaned), errors
+
+
+def validate_chunk(chunk):
+    return [validate_row(item) for item in chunk]
+
+
+class LookupMaps:
+    """Makes and models keyed by lower-cased name, loaded once per import"""
+
+    def __init__(self):
+        self.makes = {}
+        for make in CarMake.objects.all():
+            self.makes[make.name.lower()] = make
+            self.makes[make.slug] = make
+        self.models = {}
+        for car_model in CarModel.objects.all():
+            self.models[(car_model.make_id, car_model.name.lower())] = car_model
+            self.models[(car_model.make_id, car_model.slug)] = car_model
+
+    def resolve(self, make_name, model_name):
+        make = self.makes.get(make_name.lower())
+        if make is None:
+            return None, None, [f'make: unknown make "{make_name}"']
+        car_model = self.models.get((make.id, model_name.lower()))
+        if car_model is None:
+            return make, None, [f'model: unknown {make.name} model "{model_name}"']
+        return make, car_model, []
+
+
+def _build_car(cleaned, make, car_model, seller, dealer):
+    # Same defaults Car.save() would fill in, without the per-row queries
+    title = cleaned.pop('title') or f"{cleaned['year']} {make.name} {car_model.name}"
+    base_slug = slugify(f"{make.name} {car_model.name} {cleaned['year']}")
+    cleaned.pop('make')
+    cleaned.pop('model')
+    return Car(
+        seller=seller,
+        dealer=dealer,
+        make=make,
+        model=car_model,
+        title=title,
+        slug=f"{base_slug}-{uuid.uuid4().hex[:8]}",
+        # New listings wait for moderation, whatever the file says
+        status='pending',
+        **cleaned,
+    )
+
+
+def _write_chunk(rows, seller, result):
+    """Write one chunk of ``(line_number, car)`` rows for ``seller``"""
+    with_vin = {car.vin: (line_number, car) for line_number, car in rows if car.vin}
+    without_vin = [car for _, car in rows if not car.vin]
+    updated, created = [], []
+
+    with transaction.atomic():
+        if with_vin:
+            # Locked, so a car can't change hands between this check and the update
+            owners = {
+                vin: (car_id, seller_id)
+                for car_id, vin, seller_id in Car.objects.select_for_update().filter(
+                    vin__in=list(with_vin)
+                ).values_list('id', 'vin', 'seller_id')
+            }
+            inserts = []
+            for vin, (line_number, car) in with_vin.items():
+                owner = owners.get(vin)
+                if owner is None:
+                    inserts.append((line_number, car))
+                elif owner[1] != seller.id:
+                    result.errors.append((line_number, ['vin: already listed by another seller']))
+                else:
+                    car.pk = owner[0]
+                    car.updated_at = timezone.now()
+                    updated.append(car)
+            if updated:
+                Car.objects.bulk_update(updated, UPDATE_FIELDS, batch_size=500)
+
+            if inserts:
+                # A VIN someone else listed since the check is skipped, not overwritten
+                Car.objects.bulk_create([car for _, car in inserts], ignore_conflicts=True)
+                inserted = dict(
+                    Car.objects.filter(
+                        vin__in=[car.vin for _, car in inserts], seller=seller
+                    ).values_list('vin', 'id')
+                )
+                for line_number, car in inserts:
+                    if car.vin in inserted:
+                        car.pk = inserted[car.vin]
+                        created.append(car)
+                    else:
+                        result.errors.append((line_number, ['vin: already listed by another seller']))
+
+        if without_vin:
+            Car.objects.bulk_create(without_vin)
+            created += without_vin
+
+        result.updated += len(updated)
+        result.created += len(created)
+        # bulk_create/bulk_update skip the post_save receivers that feed the
+        # change feed and the moderation queue
+        record_changes([car.pk for car in updated + created])
+        moderation.enqueue('car', [car.pk for car in created])
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_validated(validated_chunks, seller, dealer, result):
+    lookups = LookupMaps()
+    for validated in validated_chunks:
+        rows = []
+        seen_vins = set()
+        for line_number, cleaned, errors in validated:
+            if cleaned is not None:
+                make, car_model, errors = lookups.resolve(cleaned['make'], cleaned['model'])
+            if cleaned is not None and not errors and cleaned['vin'] in seen_vins:
+                errors = ['vin: duplicated earlier in the same chunk']
+            if errors:
+                result.errors.append((line_number, errors))
+                continue
+            if cleaned['vin']:
+                seen_vins.add(cleaned['vin'])
+            rows.append((line_number, _build_car(cleaned, make, car_model, seller, dealer)))
+        if rows:
+            _write_chunk(rows, seller, result)
+
+
+def import_inventory(fileobj, import_format, seller, dealer=None, pool=False, workers=None):
+    """
+    Import cars from a text file object for ``seller`` (and ``dealer``).
+
+    With ``pool`` (management command only, never inside a web worker) files
+    of ``_POOL_MIN_ROWS`` rows or more are validated in a process pool of
+    ``workers`` processes. Returns an ``ImportResult`` with created/updated
+    counts and row errors.
+    """
+    chunk_size = getattr(settings, 'IMPORT_CHUNK_SIZE', 1000)
+    workers = workers or getattr(settings, 'IMPORT_WORKERS', None)
+    result = ImportResult()
+
+    rows = iter_rows(fileobj, import_format)
+    head = list(islice(rows, _POOL_MIN_ROWS)) if pool else []
+    chunks = _chunks(chain(head, rows), chunk_size)
+    if len(head) < _POOL_MIN_ROWS:
+        _write_validated(map(validate_chunk, chunks), seller, dealer, result)
+    else:
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+            _write_validated(executor.map(validate_chunk, chunks), seller, dealer, result)
+
+    # bulk_create skips the signals that maintain dealer stats
+    dealer_stats.recompute(dealer_ids=[dealer.id] if dealer else [])
+    result.errors.sort(key=lambda error: error[0])
+    return result
+
+
+def open_upload(uploaded_file):
+    """Text wrapper around an uploaded file (decoded as UTF-8, BOM tolerant)"""
+    return io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from car_app.spam import SOURCES, backscan, trim
+
+
+class Command(BaseCommand):
+    help = 'Fingerprint recent inquiries and reviews and flag near-duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            choices=sorted(SOURCES),
+            help='Only scan inquiries or reviews (default: both)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='How far back to scan (default: SPAM_WINDOW_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = trim()
+        if deleted:
+            self.stdout.write(f'Dropped {deleted} expired fingerprints')
+
+        for source in [options['source']] if options['source'] else sorted(SOURCES):
+            started = time.perf_counter()
+            scanned, flagged = backscan(source, days=options['days'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{source}: scanned {scanned}, flagged {flagged} in {time.perf_counter() - started:.2f}s'
+            ))
@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.backends import ModelBackend
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from car_app.models import User
+
+
+BENCH_USERNAME = 'login-benchmark'
+BENCH_EMAIL = 'login-benchmark@example.com'
+BENCH_PASSWORD = 'correct horse battery staple'
+
+
+def username_then_email(username, password):
+    """The previous login path: try the username, then look up the email and try again"""
+    backend = ModelBackend()
+    user = backend.authenticate(None, username=username, password=password)
+    if user is None:
+        try:
+            user_obj = User.objects.get(email=username)
+            user = backend.authenticate(None, username=user_obj.username, password=password)
+        except User.DoesNotExist:
+            pass
+    return user
+
+
+def single_lookup(username, password):
+    return authenticate(None, username=username, password=password)
+
+
+class Command(BaseCommand):
+    help = 'Measure login throughput per worker for the old two-step and the single-query login paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=20,
+            help='Attempts per scenario and login path (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['logins']
+        scenarios = [
+            ('username', BENCH_USERNAME, BENCH_PASSWORD),
+            ('email', BENCH_EMAIL, BENCH_PASSWORD),
+            ('EMAIL (case)', BENCH_EMAIL.upper(), BENCH_PASSWORD),
+            ('wrong password', BENCH_EMAIL, 'wrong'),
+            ('unknown user', 'nobody@example.com', 'wrong'),
+        ]
+
+        self.stdout.write(f'{"scenario":<16}{"path":<8}{"ok":>4}{"queries":>9}{"median ms":>11}{"logins/s":>10}')
+        # The benchmark account never outlives the run
+        with transaction.atomic():
+            User.objects.create_user(
+                username=BENCH_USERNAME, email=BENCH_EMAIL, password=BENCH_PASSWORD,
+                phone_number='+000000000000',
+            )
+            for name, identifier, password in scenarios:
+                for label, login in (('old', username_then_email), ('new', single_lookup)):
+                    self.run(name, label, login, identifier, password, count)
+            transaction.set_rollback(True)
+
+    def run(self, name, label, login, identifier, password, count):
+        timings = []
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                user = login(identifier, password)
+                timings.append(time.perf_counter() - started)
+        median = statistics.median(timings)
+        self.stdout.write(
+            f'{name:<16}{label:<8}{"yes" if user else "no":>4}{len(queries):>9}'
+            f'{median * 1000:>11.1f}{1 / median:>10.1f}'
+        )
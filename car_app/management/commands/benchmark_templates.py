@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from car_app.models import Car
+
+
+class Command(BaseCommand):
+    help = 'Measure render time of the heavy pages with cold and warm card fragment caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--renders',
+            type=int,
+            default=50,
+            help='Renders per page and cache state (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['renders']
+        car = Car.objects.filter(status='active').first()
+        if car is None:
+            raise CommandError('No active cars found. Run `manage.py seed_data` first.')
+
+        # Lets the test client capture the context each page was rendered with
+        setup_test_environment()
+        client = Client()
+        pages = [
+            ('home.html', '/'),
+            ('listings.html', '/cars/'),
+            ('car_detail.html', f'/cars/{car.slug}/'),
+        ]
+
+        self.stdout.write(f'{"template":<18}{"cold ms":>10}{"warm ms":>10}{"saved":>8}{"html KB":>10}')
+        for template_name, path in pages:
+            response = client.get(path)
+            context = response.context[0].flatten()
+            request = response.wsgi_request
+            template = get_template(template_name)
+
+            # Querysets in the context are evaluated by now, so only rendering is timed
+            cold = self.time_renders(template, context, request, count, clear_cache=True)
+            warm = self.time_renders(template, context, request, count, clear_cache=False)
+            html = template.render(context, request)
+
+            saved = (1 - warm / cold) * 100 if cold else 0
+            self.stdout.write(
+                f'{template_name:<18}{cold:>10.2f}{warm:>10.2f}{saved:>7.0f}%{len(html) / 1024:>10.1f}'
+            )
+
+    @staticmethod
+    def time_renders(template, context, request, count, clear_cache):
+        timings = []
+        for _ in range(count):
+            if clear_cache:
+                cache.clear()
+            started = time.perf_counter()
+            template.render(context, request)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
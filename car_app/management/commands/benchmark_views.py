@@ -0,0 +1,78 @@
+import asyncio
+import statistics
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory, RequestFactory
+
+from car_app import async_views, views
+from car_app.models import Car
+
+
+class Command(BaseCommand):
+    help = 'Compare request latency of the sync (WSGI) and async (ASGI) read views'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Requests per page and implementation (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        car = Car.objects.filter(status='active').first()
+        if car is None:
+            raise CommandError('No active cars found. Run `manage.py seed_data` first.')
+
+        pages = [
+            ('home', '/', views.home, async_views.home, {}),
+            ('car_listing', '/cars/', views.car_listing, async_views.car_listing, {}),
+            ('car_detail', f'/cars/{car.slug}/', views.car_detail, async_views.car_detail, {'slug': car.slug}),
+        ]
+
+        self.stdout.write(f'{"page":<14}{"path":<7}{"median ms":>12}{"p95 ms":>12}')
+        for name, path, sync_view, async_view, kwargs in pages:
+            sync_times = self.run_sync(sync_view, path, kwargs, count)
+            async_times = asyncio.run(self.run_async(async_view, path, kwargs, count))
+            self.report(name, 'wsgi', sync_times)
+            self.report(name, 'asgi', async_times)
+
+    @staticmethod
+    def _prepare(request):
+        # No middleware runs here: an anonymous user with a new, empty
+        # session from the configured engine, as SessionMiddleware would give
+        request.user = AnonymousUser()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        return request
+
+    def run_sync(self, view, path, kwargs, count):
+        factory = RequestFactory()
+        timings = []
+        for _ in range(count):
+            request = self._prepare(factory.get(path))
+            started = time.perf_counter()
+            view(request, **kwargs)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    async def run_async(self, view, path, kwargs, count):
+        factory = AsyncRequestFactory()
+        timings = []
+        for _ in range(count):
+            request = self._prepare(factory.get(path))
+            started = time.perf_counter()
+            await view(request, **kwargs)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def report(self, name, path, timings):
+        timings = sorted(t * 1000 for t in timings)
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        self.stdout.write(
+            f'{name:<14}{path:<7}{statistics.median(timings):>12.2f}{p95:>12.2f}'
+        )
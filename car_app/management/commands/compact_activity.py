@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from car_app.activity import compact_activity, trim_activity
+
+
+class Command(BaseCommand):
+    help = 'Fold hourly car activity into daily stats and drop days past the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trim',
+            action='store_true',
+            help='Also delete daily stats older than ACTIVITY_RETENTION_DAYS',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep running, compacting every SECONDS',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            folded = compact_activity()
+            self.stdout.write(self.style.SUCCESS(f'Folded {folded} hourly buckets into daily stats'))
+            if options['trim']:
+                deleted = trim_activity()
+                self.stdout.write(f'Deleted {deleted} expired daily rows')
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
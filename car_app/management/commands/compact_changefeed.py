@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from car_app.changefeed import compact, latest_seq
+from car_app.models import FeedCursor
+
+
+class Command(BaseCommand):
+    help = 'Collapse duplicate change feed entries and drop entries all consumers have processed'
+
+    def handle(self, *args, **options):
+        collapsed, trimmed = compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Collapsed {collapsed} and trimmed {trimmed} change feed entries'
+        ))
+
+        head = latest_seq()
+        for cursor in FeedCursor.objects.order_by('name'):
+            self.stdout.write(f'  {cursor.name:<30} seq {cursor.seq} ({max(head - cursor.seq, 0)} behind)')
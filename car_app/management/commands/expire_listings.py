@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from car_app.bulk_jobs import submit
+
+
+class Command(BaseCommand):
+    help = 'Expire active listings that have not been updated for a number of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.LISTING_EXPIRY_DAYS,
+            help='Expire listings not updated for this many days (default: LISTING_EXPIRY_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        job = submit('expire_listings', params={'days': options['days']}, inline=True)
+        self.stdout.write(self.style.SUCCESS(f'Expired {job.processed} listings ({job})'))
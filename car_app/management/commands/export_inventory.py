@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from car_app.exports import EXPORT_FORMATS, inventory_queryset, iter_export
+from car_app.models import Dealer
+
+
+class Command(BaseCommand):
+    help = 'Stream the car inventory (with images, specifications and inspections) as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help='Output format (default: csv)',
+        )
+        parser.add_argument(
+            '--dealer',
+            help='Only export cars of the dealer with this slug',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to (default: stdout)',
+        )
+
+    def handle(self, *args, **options):
+        dealer = None
+        if options['dealer']:
+            try:
+                dealer = Dealer.objects.get(slug=options['dealer'])
+            except Dealer.DoesNotExist:
+                raise CommandError(f"Dealer '{options['dealer']}' does not exist")
+
+        cars = inventory_queryset(dealer=dealer)
+        if not options['output']:
+            for chunk in iter_export(cars, options['format']):
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='') as output:
+            for chunk in iter_export(cars, options['format']):
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exported inventory to {options['output']}"))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from car_app.dedup import find_duplicates
+
+
+class Command(BaseCommand):
+    help = 'Index changed listings and queue suspected duplicates for moderation (or rebuild with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-index and compare every live listing instead of following the change feed',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep running, following the change feed every SECONDS',
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            started = time.perf_counter()
+            indexed, found = find_duplicates(full=full)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Indexed {indexed} listings, found {found} suspected duplicates in {elapsed:.2f}s'
+            ))
+            if not options['loop']:
+                return
+            full = False
+            time.sleep(options['loop'])
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from car_app.imports import IMPORT_FORMATS, import_inventory
+from car_app.models import Dealer, User
+
+
+class Command(BaseCommand):
+    help = 'Bulk import cars from a CSV or JSONL file (rows with a VIN the seller already lists update that car)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import')
+        parser.add_argument(
+            '--format',
+            choices=IMPORT_FORMATS,
+            help='Input format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--dealer',
+            help='Slug of the dealer the cars belong to',
+        )
+        parser.add_argument(
+            '--seller',
+            help='Username of the seller (default: the dealer\'s user)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Validation worker processes for large files (default: one per CPU)',
+        )
+        parser.add_argument(
+            '--errors',
+            help='Write the per-row error report to this CSV file',
+        )
+
+    def handle(self, *args, **options):
+        dealer = None
+        if options['dealer']:
+            try:
+                dealer = Dealer.objects.select_related('user').get(slug=options['dealer'])
+            except Dealer.DoesNotExist:
+                raise CommandError(f"Dealer '{options['dealer']}' does not exist")
+
+        if options['seller']:
+            try:
+                seller = User.objects.get(username=options['seller'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['seller']}' does not exist")
+        elif dealer is not None:
+            seller = dealer.user
+        else:
+            raise CommandError('Pass --dealer or --seller')
+
+        import_format = options['format'] or ('jsonl' if options['path'].endswith('.jsonl') else 'csv')
+
+        started = time.perf_counter()
+        with open(options['path'], newline='', encoding='utf-8-sig') as source:
+            result = import_inventory(
+                source, import_format, seller, dealer, pool=True, workers=options['workers']
+            )
+        elapsed = time.perf_counter() - started
+
+        if options['errors'] and result.errors:
+            with open(options['errors'], 'w', newline='') as report:
+                result.write_error_report(report)
+        elif result.errors:
+            for line, messages in result.errors[:20]:
+                self.stderr.write(f"line {line}: {'; '.join(messages)}")
+            if result.failed > 20:
+                self.stderr.write(f'... and {result.failed - 20} more (use --errors to save them all)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.created}, updated {result.updated}, '
+            f'failed {result.failed} rows in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from car_app import dealer_stats
+from car_app.models import Dealer
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored dealer inventory stats from the cars table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dealer',
+            help='Only the dealer with this slug',
+        )
+
+    def handle(self, *args, **options):
+        dealer_ids = None
+        if options['dealer']:
+            dealer_ids = list(Dealer.objects.filter(slug=options['dealer']).values_list('id', flat=True))
+            if not dealer_ids:
+                raise CommandError(f"Dealer '{options['dealer']}' does not exist")
+
+        count = dealer_stats.recompute(dealer_ids)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed stats for {count} dealers'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from car_app.market import refresh_market_values
+
+
+class Command(BaseCommand):
+    help = 'Update market value percentiles from the car change feed (or rebuild them with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every segment instead of following the change feed',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written, processed = refresh_market_values(full=options['full'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} market segments from {processed} changes in {elapsed:.2f}s'
+        ))
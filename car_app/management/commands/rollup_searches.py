@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from car_app.search_log import rollup_searches
+
+
+class Command(BaseCommand):
+    help = 'Compute trending and zero-result search queries from recent search history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=settings.SEARCH_TRENDS_WINDOW_HOURS,
+            help=f'History window in hours (default: {settings.SEARCH_TRENDS_WINDOW_HOURS})',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=settings.SEARCH_TRENDS_LIMIT,
+            help=f'Queries kept per list (default: {settings.SEARCH_TRENDS_LIMIT})',
+        )
+
+    def handle(self, *args, **options):
+        trending, zero_results = rollup_searches(options['hours'], options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {trending} trending and {zero_results} zero-result queries'
+        ))
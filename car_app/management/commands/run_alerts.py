@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from car_app.alerts import build_index, index_version, run_alerts
+
+
+class Command(BaseCommand):
+    help = 'Send saved-search and price-drop notifications for cars changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep running, polling the change feed every SECONDS '
+                 '(the search index is only rebuilt when saved searches change)',
+        )
+
+    def handle(self, *args, **options):
+        version, index = None, None
+        while True:
+            current = index_version()
+            if current != version:
+                started = time.perf_counter()
+                version, index = current, build_index()
+                self.stdout.write(
+                    f'Indexed {index.size} saved searches in {time.perf_counter() - started:.2f}s'
+                )
+
+            searches, price_drops, processed = run_alerts(index)
+            if processed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{processed} changes: {searches} saved search and {price_drops} price drop notifications'
+                ))
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
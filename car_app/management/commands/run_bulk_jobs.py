@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from car_app.bulk_jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued admin bulk jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Keep running, checking for new jobs every SECONDS',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is not None:
+                started = time.perf_counter()
+                run_job(job)
+                style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+                self.stdout.write(style(
+                    f'{job}: {job.processed}/{job.total} rows in {time.perf_counter() - started:.2f}s'
+                ))
+                continue
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
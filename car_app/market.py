@@ -0,0 +1,209 @@
+# cars/market.py
+"""
+Market values: asking price percentiles per segment.
+
+A segment is (model, year band, condition, mileage band). All active cars
+are loaded as plain tuples and turned into percentiles in a single
+vectorised NumPy pass: sort by segment and price, find the group
+boundaries, and interpolate every percentile of every group at once. The
+results are stored in ``MarketSegment`` rows, which the detail page uses
+for its great/fair/high price badge.
+
+After the first full build, ``refresh_market_values`` follows the car change
+feed and only recomputes the models whose cars changed. A periodic
+``--full`` rebuild picks up cars that moved to another model or were
+deleted. The refresh also caches the catalogue-wide price summary shown on
+the home page.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min
+
+from . import changefeed
+from .models import Car, MarketSegment
+
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+CONDITIONS = [value for value, _ in Car.CONDITION_CHOICES]
+
+SUMMARY_CACHE_KEY = 'market:summary'
+
+FEED_CONSUMER = 'market_values'
+
+RATING_TITLES = {
+    'great': 'Great price',
+    'fair': 'Fair price',
+    'high': 'High price',
+}
+
+
+def year_band(year):
+    size = settings.MARKET_YEAR_BAND
+    return year - year % size
+
+
+def mileage_band(mileage):
+    size = settings.MARKET_MILEAGE_BAND
+    return min(mileage // size, settings.MARKET_MILEAGE_BANDS - 1) * size
+
+
+def compute_segments(rows):
+    """
+    Percentiles for ``rows`` of ``(make_id, model_id, year, condition,
+    mileage, price)``. Returns a list of unsaved ``MarketSegment`` objects.
+    """
+    if not rows:
+        return []
+
+    make_ids, model_ids, years, conditions, mileages, prices = zip(*rows)
+    make_ids = np.array(make_ids, dtype=np.int64)
+    model_ids = np.array(model_ids, dtype=np.int64)
+    years = np.array(years, dtype=np.int64)
+    condition_index = {condition: index for index, condition in enumerate(CONDITIONS)}
+    conditions = np.array([condition_index[c] for c in conditions], dtype=np.int64)
+    mileages = np.array(mileages, dtype=np.int64)
+    prices = np.array(prices, dtype=np.float64)
+
+    years -= years % settings.MARKET_YEAR_BAND
+    mileages = np.minimum(
+        mileages // settings.MARKET_MILEAGE_BAND, settings.MARKET_MILEAGE_BANDS - 1
+    ) * settings.MARKET_MILEAGE_BAND
+
+    # Sort by segment, then price within each segment
+    order = np.lexsort((prices, mileages, conditions, years, model_ids))
+    keys = np.stack([model_ids, years, conditions, mileages])[:, order]
+    make_ids, prices = make_ids[order], prices[order]
+
+    boundaries = np.flatnonzero(np.any(keys[:, 1:] != keys[:, :-1], axis=0)) + 1
+    starts = np.concatenate(([0], boundaries))
+    counts = np.diff(np.append(starts, len(prices)))
+
+    # Linear interpolation between closest ranks, like numpy.percentile
+    positions = starts[:, None] + (np.array(PERCENTILES) / 100)[None, :] * (counts[:, None] - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    values = prices[lower] + (prices[upper] - prices[lower]) * (positions - lower)
+
+    segments = []
+    for index, start in enumerate(starts):
+        model_id, band, condition, mileage = keys[:, start]
+        p10, p25, p50, p75, p90 = (Decimal(f'{value:.2f}') for value in values[index])
+        segments.append(MarketSegment(
+            make_id=int(make_ids[start]),
+            model_id=int(model_id),
+            year_band=int(band),
+            condition=CONDITIONS[condition],
+            mileage_band=int(mileage),
+            sample_size=int(counts[index]),
+            p10=p10, p25=p25, p50=p50, p75=p75, p90=p90,
+        ))
+    return segments
+
+
+def _active_rows(model_ids=None):
+    cars = Car.objects.filter(status='active')
+    if model_ids is not None:
+        cars = cars.filter(model_id__in=model_ids)
+    return list(cars.values_list('make_id', 'model_id', 'year', 'condition', 'mileage', 'price'))
+
+
+def rebuild_segments(model_ids=None):
+    """Recompute all segments, or only those of ``model_ids``. Returns the segment count"""
+    segments = compute_segments(_active_rows(model_ids))
+    with transaction.atomic():
+        stale = MarketSegment.objects.all()
+        if model_ids is not None:
+            stale = stale.filter(model_id__in=model_ids)
+        stale.delete()
+        MarketSegment.objects.bulk_create(segments, batch_size=1000)
+    return len(segments)
+
+
+def refresh_summary():
+    """Recompute and cache the catalogue-wide price summary"""
+    summary = Car.objects.filter(status='active').aggregate(
+        total_cars=Count('id'),
+        avg_price=Avg('price'),
+        min_price=Min('price'),
+        max_price=Max('price'),
+    )
+    cache.set(SUMMARY_CACHE_KEY, summary, settings.MARKET_SUMMARY_TIMEOUT)
+    return summary
+
+
+def market_summary():
+    """Cached ``total_cars``/``avg_price``/``min_price``/``max_price`` of active cars"""
+    summary = cache.get(SUMMARY_CACHE_KEY)
+    if summary is None:
+        summary = refresh_summary()
+    return summary
+
+
+def refresh_market_values(full=False):
+    """
+    Bring market segments up to date with the change feed.
+
+    Returns ``(segments_written, changes_processed)``.
+    """
+    if full or not changefeed.has_cursor(FEED_CONSUMER):
+        # Everything up to here is covered by the rebuild
+        head = changefeed.latest_seq()
+        written = rebuild_segments()
+        changefeed.advance_cursor(FEED_CONSUMER, head)
+        refresh_summary()
+        return written, 0
+
+    written = 0
+
+    def handle(changes):
+        nonlocal written
+        model_ids = set(
+            Car.objects.filter(
+                id__in=changefeed.changed_car_ids(changes)
+            ).values_list('model_id', flat=True)
+        )
+        if model_ids:
+            written += rebuild_segments(model_ids)
+
+    processed = changefeed.consume(FEED_CONSUMER, handle)
+    if processed:
+        refresh_summary()
+    return written, processed
+
+
+def price_rating(car):
+    """
+    Where ``car`` sits in its segment: a dict with ``label``
+    (great/fair/high), ``title``, the segment ``median`` and ``sample_size``,
+    and the ``difference`` to the median. ``None`` when the segment has too
+    few cars to say.
+    """
+    segment = MarketSegment.objects.filter(
+        model_id=car.model_id,
+        year_band=year_band(car.year),
+        condition=car.condition,
+        mileage_band=mileage_band(car.mileage),
+    ).first()
+    if segment is None or segment.sample_size < settings.MARKET_MIN_SAMPLE:
+        return None
+
+    if car.price <= segment.p25:
+        label = 'great'
+    elif car.price <= segment.p75:
+        label = 'fair'
+    else:
+        label = 'high'
+
+    return {
+        'label': label,
+        'title': RATING_TITLES[label],
+        'median': segment.p50,
+        'sample_size': segment.sample_size,
+        'difference': abs(car.price - segment.p50),
+        'below_median': car.price < segment.p50,
+    }
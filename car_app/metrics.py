@@ -0,0 +1,75 @@
+# cars/metrics.py
+"""
+Tiny in-process instrumentation registry.
+
+Counters and timings are kept per worker process and exposed as JSON through
+the staff-only ``metrics`` view. That is enough to eyeball connection churn,
+pool usage and outbound latency without running a metrics agent.
+"""
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = {}  # name -> [count, total_seconds, max_seconds]
+
+
+def incr(name, value=1):
+    """Increment a counter"""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, seconds):
+    """Record one duration sample"""
+    with _lock:
+        stats = _timings.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+
+def snapshot():
+    """Current counters and timing summaries"""
+    with _lock:
+        timings = {
+            name: {
+                'count': count,
+                'avg_ms': round(total / count * 1000, 2) if count else 0,
+                'max_ms': round(maximum * 1000, 2),
+            }
+            for name, (count, total, maximum) in _timings.items()
+        }
+        return {'counters': dict(_counters), 'timings': timings}
+
+
+def database_stats():
+    """Connection/pool state for every configured database alias"""
+    stats = {}
+    for alias in settings.DATABASES:
+        connection = connections[alias]
+        alias_stats = {
+            'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+            'server_side_cursors': not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'),
+            'open_in_this_thread': connection.connection is not None,
+            'opened_total': _counters.get(f'db.{alias}.connections_opened', 0),
+        }
+        # Django >= 5.1 exposes the psycopg pool on the connection wrapper
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            alias_stats['pool'] = pool.get_stats()
+        stats[alias] = alias_stats
+    return stats
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    """Every new physical connection is a miss for persistent connections"""
+    incr(f'db.{connection.alias}.connections_opened')
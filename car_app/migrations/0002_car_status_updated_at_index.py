@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['status', 'updated_at'], name='cars_status_0ca570_idx'),
+        ),
+    ]
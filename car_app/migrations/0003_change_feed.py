@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0002_car_status_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('car_id', models.BigIntegerField(db_index=True)),
+                ('source', models.CharField(choices=[('car', 'Car'), ('image', 'Car Image'), ('review', 'Review')], max_length=10)),
+                ('action', models.CharField(choices=[('save', 'Saved'), ('delete', 'Deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'car_changes',
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FeedCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('seq', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'feed_cursors',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0003_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_band', models.IntegerField(help_text='First year of the band')),
+                ('condition', models.CharField(choices=[('brand_new', 'Brand New'), ('foreign_used', 'Foreign Used'), ('locally_used', 'Locally Used'), ('crashed', 'Crashed/Salvage')], max_length=20)),
+                ('mileage_band', models.IntegerField(help_text='Lower bound of the mileage band, in kilometers')),
+                ('sample_size', models.IntegerField()),
+                ('p10', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p25', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p50', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p75', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p90', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('make', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='market_segments', to='car_app.carmake')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='market_segments', to='car_app.carmodel')),
+            ],
+            options={
+                'db_table': 'market_segments',
+                'unique_together': {('model', 'year_band', 'condition', 'mileage_band')},
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def snapshot_favorite_prices(apps, schema_editor):
+    Car = apps.get_model('car_app', 'Car')
+    Favorite = apps.get_model('car_app', 'Favorite')
+    Favorite.objects.update(
+        saved_price=Subquery(Car.objects.filter(id=OuterRef('car_id')).values('price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0004_market_segment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(blank=True, max_length=200)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'saved_searches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='saved_price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Price when saved or last alerted, for price drop alerts', max_digits=12, null=True),
+        ),
+        migrations.RunPython(snapshot_favorite_prices, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('inquiry', 'New Inquiry'), ('order', 'Order Update'), ('payment', 'Payment'), ('review', 'New Review'), ('price_drop', 'Price Drop'), ('saved_search', 'Saved Search Match'), ('system', 'System')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='SavedSearchMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_matches', to='car_app.car')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='car_app.savedsearch')),
+            ],
+            options={
+                'db_table': 'saved_search_matches',
+                'unique_together': {('saved_search', 'car')},
+            },
+        ),
+    ]
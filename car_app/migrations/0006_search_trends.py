@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0005_saved_search_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('trending', 'Trending'), ('zero_results', 'Zero Results')], max_length=20)),
+                ('query', models.CharField(max_length=200)),
+                ('search_count', models.IntegerField()),
+                ('rank', models.IntegerField()),
+                ('computed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'search_trends',
+                'ordering': ['kind', 'rank'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchhistory',
+            index=models.Index(fields=['created_at'], name='search_hist_created_7f2b0d_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:00
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+def backfill_dealer_stats(apps, schema_editor):
+    Car = apps.get_model('car_app', 'Car')
+    Dealer = apps.get_model('car_app', 'Dealer')
+    for dealer in Dealer.objects.all():
+        cars = Car.objects.filter(dealer=dealer)
+        stats = cars.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='active')),
+            sold=Count('id', filter=Q(status='sold')),
+            views=Sum('views'),
+            inquiries=Sum('inquiries'),
+        )
+        days = 0
+        for car in cars.filter(status='sold'):
+            listed = car.published_at or car.created_at
+            days += max(((car.sold_at or timezone.now()) - listed).days, 0)
+        dealer.total_listings = stats['total']
+        dealer.active_listings = stats['active']
+        dealer.sold_listings = stats['sold']
+        dealer.total_views = stats['views'] or 0
+        dealer.total_inquiries = stats['inquiries'] or 0
+        dealer.total_days_to_sell = days
+        dealer.save(update_fields=[
+            'total_listings', 'active_listings', 'sold_listings',
+            'total_views', 'total_inquiries', 'total_days_to_sell',
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0006_search_trends'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealer',
+            name='active_listings',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dealer',
+            name='sold_listings',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dealer',
+            name='total_days_to_sell',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dealer',
+            name='total_inquiries',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dealer',
+            name='total_views',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_dealer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0007_dealer_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_id', models.BigIntegerField()),
+                ('seller_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('views', models.IntegerField(default=0)),
+                ('inquiries', models.IntegerField(default=0)),
+                ('favorites', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'car_daily_stats',
+                'indexes': [models.Index(fields=['seller_id', 'date'], name='car_daily_s_seller__6095c0_idx')],
+                'unique_together': {('car_id', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CarActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_id', models.BigIntegerField()),
+                ('seller_id', models.BigIntegerField()),
+                ('hour', models.DateTimeField()),
+                ('views', models.IntegerField(default=0)),
+                ('inquiries', models.IntegerField(default=0)),
+                ('favorites', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'car_activity',
+                'indexes': [models.Index(fields=['hour'], name='car_activit_hour_d88671_idx')],
+                'unique_together': {('car_id', 'hour')},
+            },
+        ),
+    ]
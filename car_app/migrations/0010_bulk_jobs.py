@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0009_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='is_rejected',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('pending', 'Pending Approval'), ('active', 'Active'), ('sold', 'Sold'), ('reserved', 'Reserved'), ('rejected', 'Rejected'), ('expired', 'Expired')], default='draft', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BulkJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('approve_reviews', 'Approve reviews'), ('reject_reviews', 'Reject reviews'), ('feature_cars', 'Feature cars'), ('unfeature_cars', 'Unfeature cars'), ('mark_cars_sold', 'Mark cars sold'), ('expire_listings', 'Expire listings')], max_length=30)),
+                ('object_ids', models.JSONField(blank=True, help_text="Selected ids; empty means the action's default scope", null=True)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total', models.IntegerField(default=0)),
+                ('processed', models.IntegerField(default=0)),
+                ('last_id', models.BigIntegerField(default=0, help_text='Highest id processed, to resume from')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'bulk_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='bulk_jobs_status_31ebf5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_moderation_tasks(apps, schema_editor):
+    ModerationTask = apps.get_model('car_app', 'ModerationTask')
+    Review = apps.get_model('car_app', 'Review')
+    Car = apps.get_model('car_app', 'Car')
+    Dealer = apps.get_model('car_app', 'Dealer')
+    User = apps.get_model('car_app', 'User')
+    pending = [
+        ('id_document', 30, User.objects.filter(id_verified=False).exclude(id_document='').exclude(id_document__isnull=True)),
+        ('dealer', 20, Dealer.objects.filter(is_verified=False)),
+        ('car', 10, Car.objects.filter(status='pending')),
+        ('review', 0, Review.objects.filter(is_approved=False, is_rejected=False)),
+    ]
+    for kind, priority, items in pending:
+        ModerationTask.objects.bulk_create(
+            [ModerationTask(kind=kind, object_id=pk, priority=priority) for pk in items.values_list('id', flat=True)],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0010_bulk_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('review', 'Review'), ('car', 'Pending Car'), ('dealer', 'Unverified Dealer'), ('id_document', 'ID Document')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('priority', models.IntegerField(default=0)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('resolution', models.CharField(blank=True, choices=[('approved', 'Approved'), ('rejected', 'Rejected'), ('skipped', 'Already Handled')], max_length=20)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('leased_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'moderation_tasks',
+                'indexes': [models.Index(condition=models.Q(('resolved_at__isnull', True)), fields=['-priority', 'created_at'], name='moderation_open_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='moderationtask',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('kind', 'object_id'), name='moderation_open_unique'),
+        ),
+        migrations.RunPython(backfill_moderation_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0011_moderation_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('inquiry', 'Inquiry'), ('review', 'Review')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('sender_id', models.BigIntegerField()),
+                ('signature', models.BinaryField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'content_fingerprints',
+            },
+        ),
+        migrations.AddField(
+            model_name='inquiry',
+            name='is_flagged',
+            field=models.BooleanField(default=False, help_text='Near-duplicate of other messages (see spam.py)'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='is_flagged',
+            field=models.BooleanField(default=False, help_text='Near-duplicate of other reviews (see spam.py)'),
+        ),
+        migrations.CreateModel(
+            name='LshBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(db_index=True)),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='car_app.contentfingerprint')),
+            ],
+            options={
+                'db_table': 'lsh_buckets',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='contentfingerprint',
+            index=models.Index(fields=['created_at'], name='content_fin_created_28a807_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='contentfingerprint',
+            unique_together={('source', 'object_id')},
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0012_spam_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='moderationtask',
+            name='kind',
+            field=models.CharField(choices=[('review', 'Review'), ('car', 'Pending Car'), ('dealer', 'Unverified Dealer'), ('id_document', 'ID Document'), ('duplicate', 'Suspected Duplicate')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ListingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('vin', 'VIN'), ('features', 'Features'), ('photo', 'Photo')], max_length=10)),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('dhash', models.BigIntegerField(blank=True, null=True)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listing_keys', to='car_app.car')),
+                ('image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='car_app.carimage')),
+            ],
+            options={
+                'db_table': 'listing_keys',
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reasons', models.CharField(help_text='Comma-separated: vin, photo, features', max_length=50)),
+                ('score', models.FloatField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('dismissed', 'Dismissed')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('car', models.ForeignKey(help_text='The newer listing', on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_matches', to='car_app.car')),
+                ('duplicate_of', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='car_app.car')),
+            ],
+            options={
+                'db_table': 'duplicate_listings',
+                'unique_together': {('car', 'duplicate_of')},
+            },
+        ),
+    ]
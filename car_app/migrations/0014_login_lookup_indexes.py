@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking the users table against writes
+    atomic = False
+
+    dependencies = [
+        ('car_app', '0013_duplicate_listings'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Upper('username'), name='users_username_upper'),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='users_email_upper'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+from car_app.normalize import normalize_email, normalize_phone
+
+
+def backfill_canonical_contacts(apps, schema_editor):
+    # The oldest account keeps a canonical value that several accounts
+    # share. The others stay NULL until their owners change their details
+    # (User.save() leaves the NULL alone until then), and are listed here
+    # so support can contact them.
+    User = apps.get_model('car_app', 'User')
+    seen_phones, seen_emails = {}, {}
+    collisions = []
+    batch = []
+    for user in User.objects.order_by('id').only('id', 'username', 'phone_number', 'email').iterator(chunk_size=2000):
+        phone, email = normalize_phone(user.phone_number), normalize_email(user.email)
+        user.phone_canonical = phone if phone not in seen_phones else None
+        user.email_canonical = email if email not in seen_emails else None
+        if phone and user.phone_canonical is None:
+            collisions.append((user, 'phone', user.phone_number, seen_phones[phone]))
+        if email and user.email_canonical is None:
+            collisions.append((user, 'email', user.email, seen_emails[email]))
+        seen_phones.setdefault(phone, user.id)
+        seen_emails.setdefault(email, user.id)
+        batch.append(user)
+        if len(batch) >= 1000:
+            User.objects.bulk_update(batch, ['phone_canonical', 'email_canonical'])
+            batch = []
+    User.objects.bulk_update(batch, ['phone_canonical', 'email_canonical'])
+
+    if collisions:
+        print(f'\n  {len(collisions)} contact details already belong to an older account; left unset:')
+        for user, kind, value, owner_id in collisions:
+            print(f'    user {user.id} ({user.username}): {kind} {value!r} is also on user {owner_id}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0014_login_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_canonical',
+            field=models.CharField(editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='phone_canonical',
+            field=models.CharField(editable=False, max_length=15, null=True),
+        ),
+        migrations.RunPython(backfill_canonical_contacts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email_canonical',
+            field=models.CharField(editable=False, max_length=254, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='phone_canonical',
+            field=models.CharField(editable=False, max_length=15, null=True, unique=True),
+        ),
+    ]
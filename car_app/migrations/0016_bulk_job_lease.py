@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('car_app', '0015_canonical_contacts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkjob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='A running job not renewed by then is taken over by a worker', null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:12
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking the tables against writes
+    atomic = False
+
+    dependencies = [
+        ('car_app', '0016_bulk_job_lease'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='inquiry',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='inquiries_name_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='inquiry',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='inquiries_email_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='inquiry',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('message'), name='gin_trgm_ops'), name='inquiries_message_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='notifications_title_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('message'), name='gin_trgm_ops'), name='notifications_message_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='searchhistory',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('query'), name='gin_trgm_ops'), name='search_history_query_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='savedsearch',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('query'), name='gin_trgm_ops'), name='saved_searches_query_trgm'),
+        ),
+    ]
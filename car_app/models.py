@@ -1,12 +1,17 @@
 
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import Avg
 from decimal import Decimal
 import uuid
 
+from .normalize import normalize_email, normalize_phone
+
 
 class User(AbstractUser):
     """Extended user model"""
@@ -33,11 +38,53 @@ class User(AbstractUser):
     total_sales = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Canonical copies of phone_number and email (see normalize.py); their
+    # unique indexes are what actually keeps contact details unique
+    phone_canonical = models.CharField(max_length=15, unique=True, null=True, editable=False)
+    email_canonical = models.CharField(max_length=254, unique=True, null=True, editable=False)
+    
     class Meta:
         db_table = 'users'
+        indexes = [
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='users_username_trgm'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='users_email_trgm'),
+            GinIndex(OpClass(Upper('phone_number'), name='gin_trgm_ops'), name='users_phone_trgm'),
+            # B-tree indexes for the login backend's case-insensitive equality lookup
+            models.Index(Upper('username'), name='users_username_upper'),
+            models.Index(Upper('email'), name='users_email_upper'),
+        ]
+    
+    CANONICAL_FIELDS = {
+        'phone_number': ('phone_canonical', normalize_phone),
+        'email': ('email_canonical', normalize_email),
+    }
     
     def __str__(self):
         return self.username
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._loaded_contacts = {field: user.__dict__.get(field) for field in cls.CANONICAL_FIELDS}
+        return user
+    
+    def save(self, *args, **kwargs):
+        # Canonical values are only recomputed when the contact detail
+        # changes. Accounts that share a number or email with an older
+        # account (see migration 0015) keep their NULL until then, instead
+        # of failing on the unique index with every save.
+        loaded = getattr(self, '_loaded_contacts', {})
+        for field, (canonical, normalize) in self.CANONICAL_FIELDS.items():
+            value = self.__dict__.get(field)
+            if self._state.adding or field not in loaded or loaded[field] != value:
+                setattr(self, canonical, normalize(value))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {field: canonical for field, (canonical, _) in self.CANONICAL_FIELDS.items()}
+            kwargs['update_fields'] = set(update_fields) | {extra[name] for name in update_fields if name in extra}
+        super().save(*args, **kwargs)
+        self._loaded_contacts = {field: self.__dict__.get(field) for field in self.CANONICAL_FIELDS}
 
 
 class Dealer(models.Model):
@@ -62,6 +109,12 @@ class Dealer(models.Model):
     is_premium = models.BooleanField(default=False)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_listings = models.IntegerField(default=0)
+    # Inventory stats, kept up to date by car signals (see dealer_stats.py)
+    active_listings = models.IntegerField(default=0)
+    sold_listings = models.IntegerField(default=0)
+    total_views = models.IntegerField(default=0)
+    total_inquiries = models.IntegerField(default=0)
+    total_days_to_sell = models.IntegerField(default=0)
     established_year = models.IntegerField(null=True, blank=True)
     operating_hours = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -74,6 +127,12 @@ class Dealer(models.Model):
             self.slug = slugify(self.business_name)
         super().save(*args, **kwargs)
     
+    @property
+    def average_days_to_sell(self):
+        if not self.sold_listings:
+            return None
+        return round(self.total_days_to_sell / self.sold_listings)
+    
     def __str__(self):
         return self.business_name
 
@@ -172,6 +231,7 @@ class Car(models.Model):
         ('sold', 'Sold'),
         ('reserved', 'Reserved'),
         ('rejected', 'Rejected'),
+        ('expired', 'Expired'),
     )
     
     # Basic Information
@@ -238,10 +298,24 @@ class Car(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['status', 'updated_at']),
             models.Index(fields=['make', 'model']),
             models.Index(fields=['price']),
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='cars_title_trgm'),
+            GinIndex(OpClass(Upper('vin'), name='gin_trgm_ops'), name='cars_vin_trgm'),
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status and dealer so dealer stats can be
+        # adjusted by the difference on save (see dealer_stats.py)
+        loaded = dict(zip(field_names, values))
+        if 'dealer_id' in loaded and 'status' in loaded:
+            instance._loaded_state = (loaded['dealer_id'], loaded['status'])
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(f"{self.make.name} {self.model.name} {self.year}")
@@ -326,12 +400,19 @@ class Inquiry(models.Model):
     
     is_read = models.BooleanField(default=False)
     replied = models.BooleanField(default=False)
+    is_flagged = models.BooleanField(default=False, help_text="Near-duplicate of other messages (see spam.py)")
     
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'inquiries'
         ordering = ['-created_at']
+        indexes = [
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='inquiries_name_trgm'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='inquiries_email_trgm'),
+            GinIndex(OpClass(Upper('message'), name='gin_trgm_ops'), name='inquiries_message_trgm'),
+        ]
     
     def __str__(self):
         return f"Inquiry for {self.car.title} from {self.name}"
@@ -357,12 +438,19 @@ class Review(models.Model):
     
     is_verified_purchase = models.BooleanField(default=False)
     is_approved = models.BooleanField(default=False)
+    is_rejected = models.BooleanField(default=False)
+    is_flagged = models.BooleanField(default=False, help_text="Near-duplicate of other reviews (see spam.py)")
     
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'reviews'
         ordering = ['-created_at']
+        indexes = [
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='reviews_title_trgm'),
+            GinIndex(OpClass(Upper('comment'), name='gin_trgm_ops'), name='reviews_comment_trgm'),
+        ]
     
     def __str__(self):
         return f"{self.rating}★ review by {self.reviewer.username}"
@@ -372,6 +460,8 @@ class Favorite(models.Model):
     """User favorites/saved cars"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='favorited_by')
+    saved_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True,
+                                      help_text="Price when saved or last alerted, for price drop alerts")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -420,6 +510,10 @@ class Order(models.Model):
     
     class Meta:
         db_table = 'orders'
+        indexes = [
+            # Trigram index on UPPER(order_number) serves the admin's icontains search
+            GinIndex(OpClass(Upper('order_number'), name='gin_trgm_ops'), name='orders_number_trgm'),
+        ]
         ordering = ['-created_at']
     
     def save(self, *args, **kwargs):
@@ -484,6 +578,12 @@ class Payment(models.Model):
     class Meta:
         db_table = 'payments'
         ordering = ['-created_at']
+        indexes = [
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('transaction_id'), name='gin_trgm_ops'), name='payments_txn_trgm'),
+            GinIndex(OpClass(Upper('mpesa_receipt'), name='gin_trgm_ops'), name='payments_mpesa_receipt_trgm'),
+            GinIndex(OpClass(Upper('paypal_transaction_id'), name='gin_trgm_ops'), name='payments_paypal_txn_trgm'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.transaction_id:
@@ -501,6 +601,8 @@ class Notification(models.Model):
         ('order', 'Order Update'),
         ('payment', 'Payment'),
         ('review', 'New Review'),
+        ('price_drop', 'Price Drop'),
+        ('saved_search', 'Saved Search Match'),
         ('system', 'System'),
     )
     
@@ -515,6 +617,11 @@ class Notification(models.Model):
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='notifications_title_trgm'),
+            GinIndex(OpClass(Upper('message'), name='gin_trgm_ops'), name='notifications_message_trgm'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -532,11 +639,69 @@ class SearchHistory(models.Model):
     class Meta:
         db_table = 'search_history'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('query'), name='gin_trgm_ops'), name='search_history_query_trgm'),
+        ]
     
     def __str__(self):
         return self.query
 
 
+class SearchTrend(models.Model):
+    """Rolled-up trending and zero-result search queries"""
+    KIND_CHOICES = (
+        ('trending', 'Trending'),
+        ('zero_results', 'Zero Results'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    query = models.CharField(max_length=200)
+    search_count = models.IntegerField()
+    rank = models.IntegerField()
+    computed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'search_trends'
+        ordering = ['kind', 'rank']
+    
+    def __str__(self):
+        return f"{self.kind} #{self.rank}: {self.query}"
+
+
+class SavedSearch(models.Model):
+    """Listing search a user wants to be alerted about"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches')
+    query = models.CharField(max_length=200, blank=True)
+    filters = models.JSONField(default=dict, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'saved_searches'
+        ordering = ['-created_at']
+        indexes = [
+            # Trigram indexes on UPPER(column) serve the admin's icontains searches
+            GinIndex(OpClass(Upper('query'), name='gin_trgm_ops'), name='saved_searches_query_trgm'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.query or self.filters}"
+
+
+class SavedSearchMatch(models.Model):
+    """A car a saved search has already alerted about"""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches')
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='saved_search_matches')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'saved_search_matches'
+        unique_together = ['saved_search', 'car']
+
+
 class CompareList(models.Model):
     """Car comparison lists"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='compare_lists')
@@ -590,4 +755,287 @@ class SiteSettings(models.Model):
         verbose_name_plural = 'Site Settings'
     
     def __str__(self):
-        return self.site_name
\ No newline at end of file
+        return self.site_name
+
+class MarketSegment(models.Model):
+    """Precomputed asking price percentiles of active cars in one market segment"""
+    make = models.ForeignKey(CarMake, on_delete=models.CASCADE, related_name='market_segments')
+    model = models.ForeignKey(CarModel, on_delete=models.CASCADE, related_name='market_segments')
+    year_band = models.IntegerField(help_text="First year of the band")
+    condition = models.CharField(max_length=20, choices=Car.CONDITION_CHOICES)
+    mileage_band = models.IntegerField(help_text="Lower bound of the mileage band, in kilometers")
+    sample_size = models.IntegerField()
+    p10 = models.DecimalField(max_digits=12, decimal_places=2)
+    p25 = models.DecimalField(max_digits=12, decimal_places=2)
+    p50 = models.DecimalField(max_digits=12, decimal_places=2)
+    p75 = models.DecimalField(max_digits=12, decimal_places=2)
+    p90 = models.DecimalField(max_digits=12, decimal_places=2)
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'market_segments'
+        unique_together = ['model', 'year_band', 'condition', 'mileage_band']
+    
+    def __str__(self):
+        return f"{self.model} {self.year_band}+ {self.condition} {self.mileage_band}km+"
+
+
+class CarChange(models.Model):
+    """Change feed entry: one row per committed change that affects a car"""
+    SOURCE_CHOICES = (
+        ('car', 'Car'),
+        ('image', 'Car Image'),
+        ('review', 'Review'),
+    )
+    
+    ACTION_CHOICES = (
+        ('save', 'Saved'),
+        ('delete', 'Deleted'),
+    )
+    
+    seq = models.BigAutoField(primary_key=True)
+    car_id = models.BigIntegerField(db_index=True)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'car_changes'
+        ordering = ['seq']
+    
+    def __str__(self):
+        return f"#{self.seq} {self.source} {self.action} car {self.car_id}"
+
+
+class FeedCursor(models.Model):
+    """Last change feed sequence processed by a named consumer"""
+    name = models.CharField(max_length=100, unique=True)
+    seq = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'feed_cursors'
+    
+    def __str__(self):
+        return f"{self.name} @ {self.seq}"
+
+
+class CarActivity(models.Model):
+    """Views/inquiries/favorites of one car in one hour, upserted in batches"""
+    car_id = models.BigIntegerField()
+    seller_id = models.BigIntegerField()
+    hour = models.DateTimeField()
+    views = models.IntegerField(default=0)
+    inquiries = models.IntegerField(default=0)
+    favorites = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'car_activity'
+        unique_together = ['car_id', 'hour']
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+    
+    def __str__(self):
+        return f"car {self.car_id} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+class CarDailyStats(models.Model):
+    """Views/inquiries/favorites of one car on one day, compacted from CarActivity"""
+    car_id = models.BigIntegerField()
+    seller_id = models.BigIntegerField()
+    date = models.DateField()
+    views = models.IntegerField(default=0)
+    inquiries = models.IntegerField(default=0)
+    favorites = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'car_daily_stats'
+        unique_together = ['car_id', 'date']
+        indexes = [
+            # Seller dashboards read a date range of all their cars at once
+            models.Index(fields=['seller_id', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"car {self.car_id} on {self.date}"
+
+
+class BulkJob(models.Model):
+    """Admin bulk action applied in chunked UPDATEs (see bulk_jobs.py)"""
+    ACTION_CHOICES = (
+        ('approve_reviews', 'Approve reviews'),
+        ('reject_reviews', 'Reject reviews'),
+        ('feature_cars', 'Feature cars'),
+        ('unfeature_cars', 'Unfeature cars'),
+        ('mark_cars_sold', 'Mark cars sold'),
+        ('expire_listings', 'Expire listings'),
+    )
+    
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    action = models.CharField(max_length=30, choices=ACTION_CHOICES)
+    object_ids = models.JSONField(null=True, blank=True, help_text="Selected ids; empty means the action's default scope")
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    last_id = models.BigIntegerField(default=0, help_text="Highest id processed, to resume from")
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True, help_text="A running job not renewed by then is taken over by a worker")
+    
+    class Meta:
+        db_table = 'bulk_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.get_action_display()} ({self.status})"
+    
+    @property
+    def progress(self):
+        # processed counts updated rows, which can stay below the selection
+        if self.status == 'done' or not self.total:
+            return 100 if self.status == 'done' else 0
+        return min(100, round(self.processed * 100 / self.total))
+
+
+class ModerationTask(models.Model):
+    """An item waiting for a moderator decision (see moderation.py)"""
+    KIND_CHOICES = (
+        ('review', 'Review'),
+        ('car', 'Pending Car'),
+        ('dealer', 'Unverified Dealer'),
+        ('id_document', 'ID Document'),
+        ('duplicate', 'Suspected Duplicate'),
+    )
+    
+    RESOLUTION_CHOICES = (
+        ('approved', 'Approved'),
+        ('rejected', 'Rejected'),
+        ('skipped', 'Already Handled'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    priority = models.IntegerField(default=0)
+    leased_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    resolution = models.CharField(max_length=20, choices=RESOLUTION_CHOICES, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'moderation_tasks'
+        indexes = [
+            # Only open tasks are indexed, so the queue stays small however
+            # many tasks have been resolved
+            models.Index(
+                fields=['-priority', 'created_at'],
+                condition=models.Q(resolved_at__isnull=True),
+                name='moderation_open_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                condition=models.Q(resolved_at__isnull=True),
+                name='moderation_open_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}"
+
+
+class ContentFingerprint(models.Model):
+    """MinHash signature of an inquiry message or review comment (see spam.py)"""
+    SOURCE_CHOICES = (
+        ('inquiry', 'Inquiry'),
+        ('review', 'Review'),
+    )
+    
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    object_id = models.BigIntegerField()
+    sender_id = models.BigIntegerField()
+    signature = models.BinaryField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'content_fingerprints'
+        unique_together = ['source', 'object_id']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} #{self.object_id}"
+
+
+class LshBucket(models.Model):
+    """One LSH band of a fingerprint; similar texts share at least one bucket"""
+    bucket = models.BigIntegerField(db_index=True)
+    fingerprint = models.ForeignKey(ContentFingerprint, on_delete=models.CASCADE, related_name='buckets')
+    
+    class Meta:
+        db_table = 'lsh_buckets'
+    
+    def __str__(self):
+        return f"{self.bucket} -> {self.fingerprint_id}"
+
+
+class ListingKey(models.Model):
+    """Blocking key of a live listing (see dedup.py); listings sharing a key are compared"""
+    KIND_CHOICES = (
+        ('vin', 'VIN'),
+        ('features', 'Features'),
+        ('photo', 'Photo'),
+    )
+    
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='listing_keys')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.BigIntegerField(db_index=True)
+    # Photo keys only: the image and its full 64-bit difference hash
+    image = models.ForeignKey(CarImage, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    dhash = models.BigIntegerField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'listing_keys'
+    
+    def __str__(self):
+        return f"{self.kind} {self.key} -> {self.car_id}"
+
+
+class DuplicateListing(models.Model):
+    """Two listings by different sellers that look like the same vehicle"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('confirmed', 'Confirmed'),
+        ('dismissed', 'Dismissed'),
+    )
+    
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='duplicate_matches',
+                            help_text="The newer listing")
+    duplicate_of = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='+')
+    reasons = models.CharField(max_length=50, help_text="Comma-separated: vin, photo, features")
+    score = models.FloatField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'duplicate_listings'
+        unique_together = ['car', 'duplicate_of']
+    
+    def __str__(self):
+        return f"{self.car_id} duplicates {self.duplicate_of_id}"
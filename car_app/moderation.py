@@ -0,0 +1,223 @@
+# cars/moderation.py
+"""
+Moderation queue.
+
+Anything waiting for a moderator gets one open ``ModerationTask``: new
+unapproved reviews, cars submitted as pending, unverified dealers and
+uploaded ID documents (see signals.py), and suspected duplicate listings
+(see dedup.py). A partial unique constraint keeps
+it to one open task per item. A partial index on open tasks, ordered by
+priority and age, means the queue is read without touching resolved
+history.
+
+Moderators lease a handful of tasks at a time with ``SELECT ... FOR UPDATE
+SKIP LOCKED``, so concurrent moderators never block on or receive the same
+rows. Leases expire after ``MODERATION_LEASE_SECONDS`` and abandoned tasks
+return to the queue. Tasks whose item was already handled elsewhere (e.g.
+by an admin bulk action) are closed as skipped when they are leased.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import bulk_jobs
+from .models import Car, Dealer, DuplicateListing, ModerationTask, Review, User
+
+
+# Higher goes first: identity and dealer checks block whole accounts
+PRIORITIES = {
+    'id_document': 30,
+    'dealer': 20,
+    'duplicate': 15,
+    'car': 10,
+    'review': 0,
+}
+
+
+def _pending_reviews():
+    return Review.objects.filter(is_approved=False, is_rejected=False)
+
+
+def _pending_cars():
+    return Car.objects.filter(status='pending')
+
+
+def _unverified_dealers():
+    return Dealer.objects.filter(is_verified=False)
+
+
+def _unchecked_id_documents():
+    return User.objects.filter(id_verified=False).exclude(id_document='').exclude(id_document__isnull=True)
+
+
+def _suspected_duplicates():
+    return DuplicateListing.objects.filter(status='pending')
+
+
+# kind -> items that still need a decision
+PENDING = {
+    'review': _pending_reviews,
+    'car': _pending_cars,
+    'dealer': _unverified_dealers,
+    'id_document': _unchecked_id_documents,
+    'duplicate': _suspected_duplicates,
+}
+
+
+def enqueue(kind, object_ids):
+    """Open tasks for ``object_ids``; items that already have one are skipped"""
+    tasks = [
+        ModerationTask(kind=kind, object_id=object_id, priority=PRIORITIES[kind])
+        for object_id in object_ids
+    ]
+    ModerationTask.objects.bulk_create(tasks, batch_size=1000, ignore_conflicts=True)
+
+
+def open_tasks():
+    return ModerationTask.objects.filter(resolved_at__isnull=True)
+
+
+def queue_counts():
+    """Open task count per kind"""
+    return dict(open_tasks().values('kind').annotate(count=Count('id')).values_list('kind', 'count').order_by())
+
+
+def _close(task_ids, resolution):
+    ModerationTask.objects.filter(id__in=task_ids).update(
+        resolution=resolution, resolved_at=timezone.now(), lease_expires_at=None
+    )
+
+
+def lease(moderator, kind=None, limit=None):
+    """
+    Lease up to ``limit`` of the highest priority available tasks to
+    ``moderator``. Rows locked by another moderator's lease are skipped.
+    """
+    limit = limit or settings.MODERATION_CLAIM_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        available = open_tasks().filter(Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now))
+        if kind:
+            available = available.filter(kind=kind)
+        tasks = list(
+            available.select_for_update(skip_locked=True).order_by('-priority', 'created_at')[:limit]
+        )
+
+        # Drop tasks whose item was decided somewhere else in the meantime
+        by_kind = {}
+        for task in tasks:
+            by_kind.setdefault(task.kind, []).append(task.object_id)
+        still_pending = {
+            (task_kind, object_id)
+            for task_kind, object_ids in by_kind.items()
+            for object_id in PENDING[task_kind]().filter(id__in=object_ids).values_list('id', flat=True)
+        }
+        handled = [task.id for task in tasks if (task.kind, task.object_id) not in still_pending]
+        if handled:
+            _close(handled, 'skipped')
+        tasks = [task for task in tasks if (task.kind, task.object_id) in still_pending]
+
+        expires = now + timedelta(seconds=settings.MODERATION_LEASE_SECONDS)
+        ModerationTask.objects.filter(id__in=[task.id for task in tasks]).update(
+            leased_by=moderator, lease_expires_at=expires
+        )
+    for task in tasks:
+        task.leased_by, task.lease_expires_at = moderator, expires
+    return tasks
+
+
+def leased_tasks(moderator):
+    """Tasks currently leased to ``moderator``, with their items loaded as ``task.item``"""
+    tasks = list(
+        open_tasks().filter(leased_by=moderator, lease_expires_at__gte=timezone.now()).order_by(
+            '-priority', 'created_at'
+        )
+    )
+    return load_items(tasks)
+
+
+def load_items(tasks):
+    """Attach each task's item as ``task.item`` with one query per kind"""
+    related = {
+        'review': ['car', 'reviewer'],
+        'car': ['make', 'model', 'seller'],
+        'dealer': ['user'],
+        'id_document': [],
+        'duplicate': ['car__seller', 'duplicate_of__seller'],
+    }
+    by_kind = {}
+    for task in tasks:
+        by_kind.setdefault(task.kind, []).append(task.object_id)
+    items = {
+        (kind, item.id): item
+        for kind, object_ids in by_kind.items()
+        for item in PENDING[kind]().model.objects.select_related(*related[kind]).filter(id__in=object_ids)
+    }
+    for task in tasks:
+        task.item = items.get((task.kind, task.object_id))
+    return tasks
+
+
+def _decide_review(review_id, approve):
+    action = bulk_jobs.ACTIONS['approve_reviews' if approve else 'reject_reviews']
+    touched, _ = action.apply([review_id])
+    action.finish(touched)
+
+
+def _decide_car(car_id, approve):
+    car = Car.objects.get(id=car_id)
+    car.status = 'active' if approve else 'rejected'
+    if approve and not car.published_at:
+        car.published_at = timezone.now()
+    car.save()
+
+
+def _decide_dealer(dealer_id, approve):
+    if approve:
+        Dealer.objects.filter(id=dealer_id).update(is_verified=True)
+
+
+def _decide_id_document(user_id, approve):
+    if approve:
+        User.objects.filter(id=user_id).update(id_verified=True, is_verified=True)
+    else:
+        # The user has to upload a new document, which queues a new check
+        User.objects.filter(id=user_id).update(id_document='')
+
+
+def _decide_duplicate(match_id, approve):
+    # Approving keeps both listings; rejecting takes the newer one down
+    match = DuplicateListing.objects.select_related('car').get(id=match_id)
+    match.status = 'dismissed' if approve else 'confirmed'
+    match.save(update_fields=['status'])
+    if not approve:
+        match.car.status = 'rejected'
+        match.car.save()
+
+
+DECISIONS = {
+    'review': _decide_review,
+    'car': _decide_car,
+    'dealer': _decide_dealer,
+    'id_document': _decide_id_document,
+    'duplicate': _decide_duplicate,
+}
+
+
+def resolve(task_id, moderator, approve):
+    """
+    Apply a moderator's decision. Returns False when the task is no longer
+    leased to ``moderator`` (the lease expired and someone else took it).
+    """
+    with transaction.atomic():
+        task = open_tasks().select_for_update().filter(
+            id=task_id, leased_by=moderator, lease_expires_at__gte=timezone.now()
+        ).first()
+        if task is None:
+            return False
+        DECISIONS[task.kind](task.object_id, approve)
+        _close([task.id], 'approved' if approve else 'rejected')
+    return True
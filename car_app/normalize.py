@@ -0,0 +1,40 @@
+# cars/normalize.py
+"""
+Canonical forms of contact details.
+
+Phone numbers and emails are stored as typed. A canonical copy of each
+(``User.phone_canonical``, ``User.email_canonical``) carries the unique
+index, so "0712 345 678", "+254712345678" and "254-712-345678" are the
+same number to the database. M-Pesa uses the same canonical phone form.
+"""
+import re
+
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(phone):
+    """
+    Digits-only international form of a phone number. Kenyan local numbers
+    (``07…``/``01…``, or the 9 digits without the leading 0) get the 254
+    country code. Returns None when there are no digits.
+    """
+    digits = _NON_DIGITS.sub('', phone or '')
+    if not digits:
+        return None
+    if digits.startswith('0') and len(digits) == 10:
+        return '254' + digits[1:]
+    if len(digits) == 9 and digits[0] in '17':
+        return '254' + digits
+    return digits
+
+
+def is_kenyan_mobile(phone):
+    """Whether a canonical phone number is a Kenyan mobile number (2547…/2541…)"""
+    return bool(phone) and len(phone) == 12 and phone[:4] in ('2547', '2541')
+
+
+def normalize_email(email):
+    """Case-folded email address with surrounding whitespace removed, or None"""
+    email = (email or '').strip().lower()
+    return email or None
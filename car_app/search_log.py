@@ -0,0 +1,186 @@
+# cars/search_log.py
+"""
+Non-blocking search logging and trending search rollups.
+
+``log_search`` only appends an unsaved ``SearchHistory`` row to an
+in-process buffer, so the listing page never waits on an INSERT. A daemon
+thread writes the buffer with one ``bulk_create`` every
+``SEARCH_LOG_FLUSH_INTERVAL`` seconds, or as soon as
+``SEARCH_LOG_BUFFER_SIZE`` rows are waiting. Rows still buffered when a
+worker is killed are lost, which is fine for analytics.
+
+``rollup_searches`` condenses recent history into the small
+``SearchTrend`` table (trending and zero-result queries), which the home
+page reads through the cache. A query has to be searched by at least
+``SEARCH_TRENDS_MIN_SEARCHERS`` different users or sessions, so one
+client repeating a search can't put it on the home page. Trending queries
+must also be made of known words (makes, models, listing keywords, years),
+which keeps junk and abuse off the page; zero-result queries are kept
+as they are, since unknown words are what they are there to show.
+"""
+import atexit
+import logging
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.db.models.functions import Cast, Concat, Lower, Trim
+from django.utils import timezone
+
+from .models import Car, CarMake, CarModel, SearchHistory, SearchTrend
+
+
+logger = logging.getLogger(__name__)
+
+TRENDING_CACHE_KEY = 'search:trending'
+
+_NON_WORD = re.compile(r'[\W_]+')
+_YEAR = re.compile(r'(19|20)\d\d')
+
+_lock = threading.Lock()
+_buffer = []
+_wakeup = threading.Event()
+_flusher = None
+
+
+def log_search(user, session_key, query, filters, results_count):
+    """Queue one search for writing; never touches the database"""
+    global _flusher
+    entry = SearchHistory(
+        user=user if user is not None and user.is_authenticated else None,
+        session_key=session_key or '',
+        query=query[:200],
+        filters=filters or None,
+        results_count=results_count,
+    )
+    with _lock:
+        _buffer.append(entry)
+        full = len(_buffer) >= settings.SEARCH_LOG_BUFFER_SIZE
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, name='search-log-flusher', daemon=True)
+            _flusher.start()
+    if full:
+        _wakeup.set()
+
+
+def log_listing_search(user, session_key, search_query, current_filters, results_count, page_number):
+    """Log the first page of a listing search that has a query or filters"""
+    filters = {key: value for key, value in current_filters.items() if value and key != 'sort'}
+    if (search_query or filters) and str(page_number) == '1':
+        log_search(user, session_key, search_query, filters, results_count)
+
+
+def flush():
+    """Write all buffered searches. Returns the number of rows written"""
+    with _lock:
+        entries = _buffer[:]
+        del _buffer[:]
+    if entries:
+        SearchHistory.objects.bulk_create(entries, batch_size=500)
+    return len(entries)
+
+
+def _flush_forever():
+    while True:
+        _wakeup.wait(settings.SEARCH_LOG_FLUSH_INTERVAL)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Could not write search history')
+
+
+atexit.register(flush)
+
+
+def _words(text):
+    return _NON_WORD.sub(' ', text.lower()).split()
+
+
+def known_words():
+    """Words a trending query may be made of: makes, models, listing choices and keywords"""
+    words = set(settings.SEARCH_TRENDS_KEYWORDS)
+    for name in CarMake.objects.values_list('name', flat=True):
+        words.update(_words(name))
+    for name in CarModel.objects.values_list('name', flat=True):
+        words.update(_words(name))
+    for field in ('condition', 'body_type', 'fuel_type', 'transmission', 'drive_type'):
+        for value, label in Car._meta.get_field(field).choices:
+            words.update(_words(value))
+            words.update(_words(label))
+    return words
+
+
+def is_known_query(query, words):
+    """Whether every word of ``query`` is in ``words`` or is a year"""
+    query_words = _words(query)
+    return bool(query_words) and all(word in words or _YEAR.fullmatch(word) for word in query_words)
+
+
+def rollup_searches(hours=None, limit=None):
+    """
+    Rebuild ``SearchTrend`` from the last ``hours`` of search history.
+    Returns ``(trending, zero_result)`` row counts.
+    """
+    hours = hours or settings.SEARCH_TRENDS_WINDOW_HOURS
+    limit = limit or settings.SEARCH_TRENDS_LIMIT
+    since = timezone.now() - timedelta(hours=hours)
+
+    # Signed-in users count once whatever their session; anonymous
+    # searches count by session, and those without one don't count
+    searcher = Case(
+        When(user__isnull=False, then=Concat(Value('u'), Cast('user_id', CharField()))),
+        When(~Q(session_key=''), then=Concat(Value('s'), 'session_key')),
+        output_field=CharField(),
+    )
+    queries = SearchHistory.objects.filter(created_at__gte=since).exclude(query='').annotate(
+        normalized=Lower(Trim('query'))
+    ).values('normalized')
+
+    def ranked(found):
+        return queries.annotate(
+            searches=Count('id', filter=found),
+            searchers=Count(searcher, filter=found, distinct=True),
+        ).filter(searchers__gte=settings.SEARCH_TRENDS_MIN_SEARCHERS).order_by('-searches', 'normalized')
+
+    # Queries that found nothing are reported separately, not promoted as trending
+    words = known_words()
+    trending = []
+    for row in ranked(Q(results_count__gt=0)).iterator():
+        if is_known_query(row['normalized'], words):
+            trending.append(row)
+            if len(trending) == limit:
+                break
+    zero_results = ranked(Q(results_count=0))[:limit]
+
+    trends = [
+        SearchTrend(kind=kind, query=row['normalized'], search_count=row['searches'], rank=rank)
+        for kind, rows in (('trending', trending), ('zero_results', zero_results))
+        for rank, row in enumerate(rows, start=1)
+    ]
+    with transaction.atomic():
+        SearchTrend.objects.all().delete()
+        SearchTrend.objects.bulk_create(trends)
+    cache.delete(TRENDING_CACHE_KEY)
+    return (
+        sum(1 for trend in trends if trend.kind == 'trending'),
+        sum(1 for trend in trends if trend.kind == 'zero_results'),
+    )
+
+
+def trending_searches():
+    """Top trending queries for the home page (cached)"""
+    queries = cache.get(TRENDING_CACHE_KEY)
+    if queries is None:
+        queries = list(
+            SearchTrend.objects.filter(kind='trending').order_by('rank').values_list('query', flat=True)[
+                :settings.SEARCH_TRENDS_HOME_COUNT
+            ]
+        )
+        cache.set(TRENDING_CACHE_KEY, queries, settings.SEARCH_TRENDS_CACHE_TIMEOUT)
+    return queries
@@ -0,0 +1,93 @@
+# cars/session_backend.py
+"""
+Cache-first session engine.
+
+Built on Django's ``cached_db`` backend, but with SESSION_SAVE_EVERY_REQUEST
+in mind: an unchanged session is not written back to ``django_session`` on
+every page view. The database row is only rewritten when the data changes,
+or when its expiry date is older than SESSION_REFRESH_INTERVAL seconds.
+In between, only the cache entry's TTL is extended.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.utils import timezone
+
+
+KEY_PREFIX = 'car_app.session_backend'
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_fingerprint = None
+
+    @staticmethod
+    def _fingerprint(data):
+        payload = json.dumps(data, sort_keys=True, default=str).encode()
+        return hashlib.md5(payload).hexdigest()
+
+    @property
+    def refresh_marker_key(self):
+        return self.cache_key + ':refreshed'
+
+    def load(self):
+        data = super().load()
+        self._loaded_fingerprint = self._fingerprint(data)
+        return data
+
+    def _is_dirty(self):
+        if self._loaded_fingerprint is None:
+            return True
+        return self.modified or self._fingerprint(self._session) != self._loaded_fingerprint
+
+    def _refresh_due(self):
+        return self._cache.get(self.refresh_marker_key) is None
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+
+        if not must_create and not self._is_dirty() and not self._refresh_due():
+            # Nothing changed and the DB expiry is recent enough: keep the
+            # cached copy alive for the new cookie age and skip the write.
+            self._cache.touch(self.cache_key, self.get_expiry_age())
+            return
+
+        super().save(must_create)
+        self._loaded_fingerprint = self._fingerprint(self._session)
+        self._cache.set(
+            self.refresh_marker_key, True,
+            getattr(settings, 'SESSION_REFRESH_INTERVAL', 300),
+        )
+
+    def delete(self, session_key=None):
+        if session_key is None and self.session_key is not None:
+            self._cache.delete(self.refresh_marker_key)
+        elif session_key is not None:
+            self._cache.delete(self.cache_key_prefix + session_key + ':refreshed')
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        """Delete expired rows in batches so ``clearsessions`` never holds long locks"""
+        batch_size = getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000)
+        model = cls.get_model_class()
+        now = timezone.now()
+        deleted_total = 0
+
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            deleted, _ = model.objects.filter(session_key__in=keys).delete()
+            deleted_total += deleted
+
+        return deleted_total
@@ -0,0 +1,63 @@
+# cars/signals.py
+"""Model signal receivers: car change feed, dealer stats and moderation queue"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import dealer_stats, moderation
+from .changefeed import record_change
+from .models import Car, CarImage, Dealer, Review, User
+
+
+@receiver(post_save, sender=Car)
+def car_saved(sender, instance, created, **kwargs):
+    record_change(instance.pk, 'car', 'save')
+    dealer_stats.car_saved(instance, created)
+    if instance.status == 'pending':
+        moderation.enqueue('car', [instance.pk])
+
+
+@receiver(post_delete, sender=Car)
+def car_deleted(sender, instance, **kwargs):
+    record_change(instance.pk, 'car', 'delete')
+    dealer_stats.car_deleted(instance)
+
+
+@receiver(post_save, sender=CarImage)
+def car_image_saved(sender, instance, **kwargs):
+    record_change(instance.car_id, 'image', 'save')
+
+
+@receiver(post_delete, sender=CarImage)
+def car_image_deleted(sender, instance, **kwargs):
+    record_change(instance.car_id, 'image', 'delete')
+
+
+# Reviews of sellers/dealers don't belong to a car; record_change skips them
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    record_change(instance.car_id, 'review', 'save')
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    record_change(instance.car_id, 'review', 'delete')
+
+
+@receiver(post_save, sender=Review)
+def review_submitted(sender, instance, created, **kwargs):
+    if created and not instance.is_approved:
+        moderation.enqueue('review', [instance.pk])
+
+
+@receiver(post_save, sender=Dealer)
+def dealer_registered(sender, instance, created, **kwargs):
+    if created and not instance.is_verified:
+        moderation.enqueue('dealer', [instance.pk])
+
+
+@receiver(post_save, sender=User)
+def id_document_uploaded(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'id_document' not in update_fields:
+        return
+    if instance.id_document and not instance.id_verified:
+        moderation.enqueue('id_document', [instance.pk])
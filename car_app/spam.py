@@ -0,0 +1,239 @@
+# cars/spam.py
+"""
+Near-duplicate detection for inquiry messages and review comments.
+
+Texts are normalised and cut into overlapping character shingles. A MinHash
+signature of ``SPAM_MINHASH_PERMUTATIONS`` values is computed with NumPy
+for any number of texts at once. The signature is split into
+``SPAM_LSH_BANDS`` bands, and each band hashes to one ``LshBucket``.
+Texts that are near-duplicates almost certainly share a bucket, so checking
+a new submission is a single indexed ``bucket IN (...)`` lookup over the
+last ``SPAM_WINDOW_DAYS``, followed by comparing the signatures of the few
+candidates. The cost does not grow with history.
+
+Wording every sender shares because the form pre-fills it (the default
+inquiry text on the car page) is cut out before fingerprinting. Otherwise
+every untouched inquiry about the same model would look like a copy of the
+others. An inquiry that is only the default text is not checked at all.
+
+A sender repeating the same text ``SPAM_MAX_REPEATS`` times is throttled.
+A text that several senders have already sent is saved but flagged. At
+most ``SPAM_MAX_CANDIDATES`` candidates are compared, so even very common
+messages cost a bounded amount of work.
+
+``backscan`` fingerprints historical rows in vectorised chunks.
+"""
+import re
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ContentFingerprint, Inquiry, LshBucket, Review
+
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK = np.uint64(0xFFFFFFFF)
+_random = np.random.RandomState(20231)
+_A = _random.randint(1, 1 << 31, settings.SPAM_MINHASH_PERMUTATIONS).astype(np.uint64)
+_B = _random.randint(0, 1 << 31, settings.SPAM_MINHASH_PERMUTATIONS).astype(np.uint64)
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+# source -> (model, text field, sender field)
+SOURCES = {
+    'inquiry': (Inquiry, 'message', 'sender_id'),
+    'review': (Review, 'comment', 'reviewer_id'),
+}
+
+
+# source -> pre-filled wording, matched against normalised text. Keep in
+# step with the inquiry form in templates/car_detail.html.
+BOILERPLATE = {
+    'inquiry': [
+        re.compile(r'i m interested in this \d{4}(?: \w+)*? please contact me with more information'),
+    ],
+}
+
+
+def normalize(text):
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def content(source, text):
+    """Normalised ``text`` without the wording the form pre-fills for ``source``"""
+    text = normalize(text)
+    for pattern in BOILERPLATE.get(source, ()):
+        text = pattern.sub(' ', text)
+    return ' '.join(text.split())
+
+
+def _shingle_hashes(text):
+    size = settings.SPAM_SHINGLE_SIZE
+    text = normalize(text)
+    shingles = {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+    return np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64)
+
+
+def signatures(texts):
+    """MinHash signatures of ``texts``, one uint32 row per text"""
+    hashes = [_shingle_hashes(text) for text in texts]
+    if not hashes:
+        return np.empty((0, len(_A)), dtype=np.uint32)
+    offsets = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+    shingles = np.concatenate(hashes)
+    # a * x + b stays below 2**63 for 31-bit a, b and 32-bit x
+    permuted = (shingles[:, None] * _A[None, :] + _B[None, :]) % _PRIME & _MASK
+    return np.minimum.reduceat(permuted, offsets, axis=0).astype(np.uint32)
+
+
+def band_buckets(signatures):
+    """LSH bucket keys (one per band) for each signature row, as int64"""
+    bands = settings.SPAM_LSH_BANDS
+    rows = signatures.reshape(len(signatures), bands, -1).astype(np.uint64)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for column in range(rows.shape[2]):
+        keys = keys * np.uint64(1000003) + rows[:, :, column]
+    # Band number in the top bits keeps equal values of different bands apart
+    band_ids = np.arange(bands, dtype=np.uint64)[None, :] << np.uint64(56)
+    return (band_ids | (keys & np.uint64((1 << 56) - 1))).astype(np.int64)
+
+
+def similarity(signature, others):
+    """Estimated Jaccard similarity of ``signature`` to each row of ``others``"""
+    return (others == signature[None, :]).mean(axis=1)
+
+
+class Verdict:
+    """Outcome of checking one submission"""
+
+    def __init__(self, signature, buckets, same_sender, other_senders):
+        self.signature = signature
+        self.buckets = buckets
+        self.same_sender = same_sender
+        self.other_senders = other_senders
+
+    @property
+    def throttled(self):
+        return self.same_sender >= settings.SPAM_MAX_REPEATS
+
+    @property
+    def flagged(self):
+        return self.same_sender > 0 or self.other_senders >= settings.SPAM_FLAG_SENDERS
+
+
+def check(source, text, sender_id):
+    """Compare a new submission with recent ones through the LSH index"""
+    text = content(source, text)
+    signature = signatures([text])[0]
+    buckets = band_buckets(signature[None, :])[0]
+    if len(text) < settings.SPAM_MIN_CHARS:
+        return Verdict(signature, buckets, 0, 0)
+
+    since = timezone.now() - timedelta(days=settings.SPAM_WINDOW_DAYS)
+    candidates = list(
+        ContentFingerprint.objects.filter(
+            source=source, created_at__gte=since, buckets__bucket__in=buckets.tolist()
+        ).distinct().order_by('-created_at').values_list('sender_id', 'signature')[:settings.SPAM_MAX_CANDIDATES]
+    )
+    same_sender, other_senders = 0, set()
+    if candidates:
+        stored = np.array([np.frombuffer(bytes(sig), dtype=np.uint32) for _, sig in candidates])
+        scores = similarity(signature, stored)
+        for (candidate_sender, _), score in zip(candidates, scores):
+            if score < settings.SPAM_SIMILARITY_THRESHOLD:
+                continue
+            if candidate_sender == sender_id:
+                same_sender += 1
+            else:
+                other_senders.add(candidate_sender)
+    return Verdict(signature, buckets, same_sender, len(other_senders))
+
+
+def remember(source, object_id, sender_id, verdict):
+    """Add a saved submission to the index"""
+    with transaction.atomic():
+        fingerprint = ContentFingerprint.objects.create(
+            source=source, object_id=object_id, sender_id=sender_id,
+            signature=verdict.signature.tobytes(),
+        )
+        LshBucket.objects.bulk_create(
+            [LshBucket(bucket=bucket, fingerprint=fingerprint) for bucket in set(verdict.buckets.tolist())]
+        )
+
+
+def trim(days=None):
+    """Drop fingerprints older than the detection window. Returns the number deleted"""
+    since = timezone.now() - timedelta(days=days or settings.SPAM_WINDOW_DAYS)
+    stale = ContentFingerprint.objects.filter(created_at__lt=since)
+    LshBucket.objects.filter(fingerprint__in=stale).delete()
+    deleted, _ = stale.delete()
+    return deleted
+
+
+def backscan(source, days=None, chunk_size=5000):
+    """
+    Fingerprint the rows of ``source`` from the last ``days`` that aren't
+    indexed yet, and flag the ones that repeat earlier text. Returns
+    ``(scanned, flagged)``.
+    """
+    model, text_field, sender_field = SOURCES[source]
+    since = timezone.now() - timedelta(days=days or settings.SPAM_WINDOW_DAYS)
+    rows = model.objects.filter(created_at__gte=since).order_by('id')
+
+    # Everything seen during the scan: bucket -> [(sender, signature)]
+    seen = defaultdict(list)
+    scanned = flagged = 0
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id).values_list('id', sender_field, text_field, 'created_at')[:chunk_size])
+        if not chunk:
+            return scanned, flagged
+        last_id = chunk[-1][0]
+        indexed = set(
+            ContentFingerprint.objects.filter(
+                source=source, object_id__in=[row[0] for row in chunk]
+            ).values_list('object_id', flat=True)
+        )
+
+        texts = [content(source, row[2]) for row in chunk]
+        sigs = signatures(texts)
+        keys = band_buckets(sigs)
+        fingerprints, flagged_ids = [], []
+        for (object_id, sender_id, _, created_at), text, sig, row_keys in zip(chunk, texts, sigs, keys):
+            same_sender, other_senders = 0, set()
+            if len(text) >= settings.SPAM_MIN_CHARS:
+                matched = {id(entry): entry for key in row_keys.tolist() for entry in seen.get(key, ())}
+                for earlier_sender, earlier_sig in matched.values():
+                    if (earlier_sig == sig).mean() >= settings.SPAM_SIMILARITY_THRESHOLD:
+                        if earlier_sender == sender_id:
+                            same_sender += 1
+                        else:
+                            other_senders.add(earlier_sender)
+                entry = (sender_id, sig)
+                for key in row_keys.tolist():
+                    # A sample per bucket is enough to recognise a repeated text
+                    if len(seen[key]) < settings.SPAM_MAX_CANDIDATES:
+                        seen[key].append(entry)
+            if Verdict(sig, row_keys, same_sender, len(other_senders)).flagged:
+                flagged_ids.append(object_id)
+            if object_id not in indexed:
+                fingerprints.append((ContentFingerprint(
+                    source=source, object_id=object_id, sender_id=sender_id,
+                    signature=sig.tobytes(), created_at=created_at,
+                ), row_keys))
+
+        with transaction.atomic():
+            created = ContentFingerprint.objects.bulk_create([fingerprint for fingerprint, _ in fingerprints])
+            LshBucket.objects.bulk_create([
+                LshBucket(bucket=bucket, fingerprint=fingerprint)
+                for fingerprint, (_, row_keys) in zip(created, fingerprints)
+                for bucket in set(row_keys.tolist())
+            ], batch_size=5000)
+            model.objects.filter(id__in=flagged_ids).update(is_flagged=True)
+        scanned += len(chunk)
+        flagged += len(flagged_ids)
@@ -0,0 +1,50 @@
+# cars/storage.py
+"""
+Static files storage used in production.
+
+Adds a CSS minification step in front of WhiteNoise's hashed, compressed
+manifest storage, so the bundles in static/css are shipped minified,
+fingerprinted and pre-compressed (gzip + brotli) by one ``collectstatic``.
+"""
+import re
+
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+_COMMENTS = re.compile(r'/\*.*?\*/', re.S)
+_WHITESPACE = re.compile(r'\s+')
+_AROUND_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(css):
+    """Conservative CSS minifier: comments, whitespace, redundant semicolons"""
+    css = _COMMENTS.sub('', css)
+    css = _WHITESPACE.sub(' ', css)
+    css = _AROUND_PUNCTUATION.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+class MinifiedManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for path in paths:
+                if path.endswith('.css') and not path.endswith('.min.css'):
+                    self._minify(path)
+            # Hash the collected (minified) copies, not the original sources
+            paths = {path: (self, path) for path in paths}
+        yield from super().post_process(paths, dry_run, **options)
+
+    def _minify(self, path):
+        with self.open(path) as source:
+            css = source.read().decode('utf-8')
+        self.delete(path)
+        self._save(path, ContentFile(minify_css(css).encode('utf-8')))
+
+    def stored_name(self, name):
+        # Templates reference a few optional images that may not exist;
+        # fall back to the plain name instead of failing the whole page.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
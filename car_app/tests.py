@@ -1,3 +1,1095 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from paypalrestsdk import exceptions as paypal_exceptions
+
+from . import (
+    activity, alerts, auth_backend, bulk_jobs, changefeed, compare, db_router, dealer_stats, dedup, http_client,
+    imports, market, moderation, search_log, session_backend, spam, throttle,
+)
+from .conditional import detail_fingerprint
+from .forms import UserUpdateForm
+from .models import (
+    BulkJob, Car, CarActivity, CarChange, CarDailyStats, CarImage, CarMake, CarModel, Dealer, DuplicateListing,
+    Favorite, ModerationTask, Notification, Review, SavedSearch, SearchHistory, SearchTrend, User,
+)
+from .views import PayPalApi, car_listing
+
+
+def make_user(username, **kwargs):
+    kwargs.setdefault('email', f'{username}@example.com')
+    kwargs.setdefault('phone_number', f'+2547{abs(hash(username)) % 10 ** 8:08d}')
+    return User.objects.create_user(username=username, **kwargs)
+
+
+def make_car(seller, status='active', make='Toyota', model='Corolla', year=2015, **kwargs):
+    car_make, _ = CarMake.objects.get_or_create(name=make, defaults={'slug': make.lower(), 'country': 'Japan'})
+    car_model, _ = CarModel.objects.get_or_create(make=car_make, name=model, defaults={'slug': model.lower()})
+    fields = {
+        'title': f'{year} {make} {model}', 'condition': 'foreign_used', 'body_type': 'sedan',
+        'mileage': 80000, 'engine_size': '1.5', 'fuel_type': 'petrol', 'transmission': 'automatic',
+        'drive_type': 'fwd', 'exterior_color': 'White', 'interior_color': 'Black', 'doors': 4,
+        'seats': 5, 'price': '1500000', 'location': 'Westlands', 'city': 'Nairobi',
+        'description': 'Clean car', 'features': 'Air Conditioning',
+    }
+    fields.update(kwargs)
+    return Car.objects.create(
+        seller=seller, make=car_make, model=car_model, year=year, status=status,
+        slug=f'{make}-{model}-{year}-{uuid.uuid4().hex[:8]}'.lower(), **fields,
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers each request with the next scripted ``(status, delay, body)``"""
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        server = self.server
+        with server.lock:
+            server.hits.append((self.command, self.path))
+            status, delay, body = server.script.pop(0) if len(server.script) > 1 else server.script[0]
+        if delay:
+            time.sleep(delay)
+        payload = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except OSError:
+            # The client gave up waiting
+            pass
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+FAST_HTTP = {
+    'connect_timeout': 1,
+    'read_timeout': 2,
+    'retries': 3,
+    'backoff': 0,
+    'pool_size': 2,
+    'failure_threshold': 3,
+    'reset_seconds': 0.2,
+}
+
+
+@override_settings(OUTBOUND_HTTP_DEFAULTS=FAST_HTTP, OUTBOUND_HTTP={})
+class HttpClientTestCase(SimpleTestCase):
+    provider = 'stub'
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = []
+        self.server.script = [(200, 0, {})]
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        # Sessions and breakers are built from settings on first use
+        self.addCleanup(self.reset_client)
+        self.reset_client()
+
+    def reset_client(self):
+        for provider_session in http_client._sessions.values():
+            provider_session.close()
+        http_client._sessions.clear()
+        http_client._breakers.clear()
+
+    def script(self, *responses):
+        self.server.script = list(responses)
+
+
+class RetryTests(HttpClientTestCase):
+    def test_get_is_retried_on_gateway_errors(self):
+        self.script((502, 0, {}), (503, 0, {}), (504, 0, {}), (200, 0, {'ok': True}))
+        response = http_client.get(self.provider, f'{self.url}/status')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'ok': True})
+        self.assertEqual(len(self.server.hits), 4)
+
+    def test_get_gives_up_after_the_configured_retries(self):
+        self.script((503, 0, {}))
+        response = http_client.get(self.provider, f'{self.url}/status')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.hits), FAST_HTTP['retries'] + 1)
+
+    def test_post_is_not_retried_on_gateway_errors(self):
+        self.script((503, 0, {}), (200, 0, {}))
+        response = http_client.post(self.provider, f'{self.url}/charge', json={'amount': 100})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.hits, [('POST', '/charge')])
+
+    @override_settings(OUTBOUND_HTTP={'stub': {'read_timeout': 0.2}})
+    def test_post_is_not_resent_after_a_read_timeout(self):
+        self.script((200, 1, {}), (200, 0, {}))
+        with self.assertRaises(requests.ReadTimeout):
+            http_client.post(self.provider, f'{self.url}/charge', json={'amount': 100})
+        self.assertEqual(self.server.hits, [('POST', '/charge')])
+
+
+class TimeoutTests(HttpClientTestCase):
+    @override_settings(OUTBOUND_HTTP={'stub': {'read_timeout': 0.2, 'retries': 0}})
+    def test_read_timeout_is_enforced(self):
+        self.script((200, 2, {}))
+        started = time.monotonic()
+        # Once retries are used up urllib3 reports the timeout as a ConnectionError
+        with self.assertRaises(requests.ConnectionError):
+            http_client.get(self.provider, f'{self.url}/slow')
+        self.assertLess(time.monotonic() - started, 1)
+
+    @override_settings(OUTBOUND_HTTP={'stub': {'connect_timeout': 0.2, 'retries': 0}})
+    def test_connect_timeout_is_enforced(self):
+        # A listener whose accept queue is full drops new SYNs, so connects hang
+        listener = socket.socket()
+        self.addCleanup(listener.close)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(0)
+        address = listener.getsockname()
+        while True:
+            sock = socket.socket()
+            self.addCleanup(sock.close)
+            sock.settimeout(0.2)
+            try:
+                sock.connect(address)
+            except socket.timeout:
+                break
+
+        started = time.monotonic()
+        with self.assertRaises(requests.ConnectTimeout):
+            http_client.get(self.provider, f'http://{address[0]}:{address[1]}/status')
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_default_timeout_comes_from_settings(self):
+        sent = {}
+        original = requests.Session.request
+
+        def spy(session, method, url, **kwargs):
+            sent.update(kwargs)
+            return original(session, method, url, **kwargs)
+
+        with self.settings(OUTBOUND_HTTP={'stub': {'connect_timeout': 0.5, 'read_timeout': 7}}):
+            requests.Session.request = spy
+            try:
+                http_client.get(self.provider, f'{self.url}/status')
+            finally:
+                requests.Session.request = original
+        self.assertEqual(sent['timeout'], (0.5, 7))
+
+
+@override_settings(OUTBOUND_HTTP={'stub': {'retries': 0}})
+class CircuitBreakerTests(HttpClientTestCase):
+    def fail(self, times):
+        for _ in range(times):
+            self.assertEqual(http_client.get(self.provider, f'{self.url}/status').status_code, 500)
+
+    def test_opens_after_the_failure_threshold_and_fails_fast(self):
+        self.script((500, 0, {}))
+        self.fail(FAST_HTTP['failure_threshold'])
+        with self.assertRaises(http_client.ProviderUnavailable):
+            http_client.get(self.provider, f'{self.url}/status')
+        self.assertEqual(len(self.server.hits), FAST_HTTP['failure_threshold'])
+
+    def test_success_resets_the_failure_count(self):
+        self.script((500, 0, {}), (500, 0, {}), (200, 0, {}), (500, 0, {}))
+        for _ in range(FAST_HTTP['failure_threshold'] + 1):
+            http_client.get(self.provider, f'{self.url}/status')
+        self.assertIsNone(http_client.breaker(self.provider).opened_at)
+
+    def test_closes_after_a_successful_half_open_trial(self):
+        self.script(*[(500, 0, {})] * FAST_HTTP['failure_threshold'], (200, 0, {}))
+        self.fail(FAST_HTTP['failure_threshold'])
+        time.sleep(FAST_HTTP['reset_seconds'] + 0.05)
+        self.assertEqual(http_client.get(self.provider, f'{self.url}/status').status_code, 200)
+        self.assertEqual(http_client.get(self.provider, f'{self.url}/status').status_code, 200)
+        self.assertIsNone(http_client.breaker(self.provider).opened_at)
+
+    def test_reopens_after_a_failed_half_open_trial(self):
+        self.script((500, 0, {}))
+        self.fail(FAST_HTTP['failure_threshold'])
+        time.sleep(FAST_HTTP['reset_seconds'] + 0.05)
+        self.fail(1)
+        with self.assertRaises(http_client.ProviderUnavailable):
+            http_client.get(self.provider, f'{self.url}/status')
+
+    def test_only_one_trial_while_half_open(self):
+        self.script(*[(500, 0, {})] * FAST_HTTP['failure_threshold'], (200, 0.3, {}))
+        self.fail(FAST_HTTP['failure_threshold'])
+        time.sleep(FAST_HTTP['reset_seconds'] + 0.05)
+        trial = threading.Thread(target=http_client.get, args=(self.provider, f'{self.url}/status'))
+        trial.start()
+        time.sleep(0.1)
+        with self.assertRaises(http_client.ProviderUnavailable):
+            http_client.get(self.provider, f'{self.url}/status')
+        trial.join()
+
+
+class PayPalApiTests(HttpClientTestCase):
+    provider = 'paypal'
+
+    def api(self):
+        return PayPalApi(mode='sandbox', client_id='id', client_secret='secret', endpoint=self.url, token='token')
+
+    def test_calls_go_through_the_pooled_session(self):
+        self.script((200, 0, {'id': 'PAY-1', 'state': 'approved'}))
+        self.assertEqual(self.api().get('v1/payments/payment/PAY-1')['id'], 'PAY-1')
+        self.assertEqual(self.server.hits, [('GET', '/v1/payments/payment/PAY-1')])
+        self.assertIn('paypal', http_client._sessions)
+
+    def test_lookups_are_retried_on_gateway_errors(self):
+        self.script((503, 0, {}), (200, 0, {'id': 'PAY-1'}))
+        self.assertEqual(self.api().get('v1/payments/payment/PAY-1')['id'], 'PAY-1')
+        self.assertEqual(len(self.server.hits), 2)
+
+    def test_payment_creation_is_sent_once(self):
+        self.script((503, 0, {}), (201, 0, {'id': 'PAY-2'}))
+        with self.assertRaises(paypal_exceptions.ServerError) as raised:
+            self.api().post('v1/payments/payment', {'intent': 'sale'})
+        self.assertEqual(raised.exception.response.status_code, 503)
+        self.assertEqual(self.server.hits, [('POST', '/v1/payments/payment')])
+
+    def test_client_errors_are_raised_as_sdk_exceptions(self):
+        self.script((404, 0, {'name': 'INVALID_RESOURCE_ID'}))
+        with self.assertRaises(paypal_exceptions.ResourceNotFound):
+            self.api().get('v1/payments/payment/missing')
+
+
+class BulkJobTests(TestCase):
+    def setUp(self):
+        self.seller = make_user('bulk-seller')
+
+    def test_expire_listings_only_expires_active_cars(self):
+        cars = {status: make_car(self.seller, status=status) for status in ('active', 'sold', 'draft', 'rejected')}
+        job = bulk_jobs.submit('expire_listings', [car.id for car in cars.values()])
+        self.assertEqual((job.processed, job.progress), (1, 100))
+        statuses = dict(Car.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[cars['active'].id], 'expired')
+        for status in ('sold', 'draft', 'rejected'):
+            self.assertEqual(statuses[cars[status].id], status)
+
+    def stale_job(self, cars, **kwargs):
+        # A worker died after the first chunk
+        return BulkJob.objects.create(
+            action='feature_cars', object_ids=[car.id for car in cars], total=len(cars),
+            status='running', processed=1, last_id=cars[0].id, **kwargs,
+        )
+
+    def test_stale_running_job_is_reclaimed_and_resumed(self):
+        cars = [make_car(self.seller) for _ in range(3)]
+        job = self.stale_job(cars, lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        claimed = bulk_jobs.claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertGreater(claimed.lease_expires_at, timezone.now())
+        bulk_jobs.run_job(claimed)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.lease_expires_at), ('done', 3, None))
+        featured = dict(Car.objects.values_list('id', 'is_featured'))
+        # Rows before last_id were done by the dead worker, not redone
+        self.assertEqual([featured[car.id] for car in cars], [False, True, True])
+
+    def test_running_job_with_a_live_lease_is_left_alone(self):
+        cars = [make_car(self.seller) for _ in range(2)]
+        self.stale_job(cars, lease_expires_at=timezone.now() + timedelta(minutes=5))
+        self.assertIsNone(bulk_jobs.claim_next_job())
+
+
+class InquirySpamTests(TestCase):
+    def default_text(self, year, make, model):
+        # As pre-filled by the inquiry form in car_detail.html
+        return f"I'm interested in this {year} {make} {model}. Please contact me with more information."
+
+    def send(self, text, sender_id, object_id):
+        verdict = spam.check('inquiry', text, sender_id)
+        spam.remember('inquiry', object_id, sender_id, verdict)
+        return verdict
+
+    def test_default_text_from_many_buyers_is_not_flagged(self):
+        for sender_id, year in enumerate(range(2010, 2010 + settings.SPAM_FLAG_SENDERS + 2), start=1):
+            verdict = self.send(self.default_text(year, 'Toyota', 'Corolla'), sender_id, sender_id)
+        self.assertFalse(verdict.flagged)
+        self.assertEqual(verdict.other_senders, 0)
+
+    def test_default_text_sent_to_several_sellers_is_not_throttled(self):
+        for object_id, model in enumerate(['Corolla', 'Axio', 'Fielder', 'Premio', 'Allion'], start=1):
+            verdict = self.send(self.default_text(2015, 'Toyota', model), 1, object_id)
+        self.assertFalse(verdict.throttled)
+        self.assertFalse(verdict.flagged)
+
+    def test_repeated_text_after_the_default_is_still_caught(self):
+        pitch = 'Cheap import duty clearance, call 0700 000 000 or visit our yard in Mombasa today'
+        for object_id, make in enumerate(['Toyota', 'Nissan', 'Mazda', 'Honda'], start=1):
+            verdict = self.send(f'{self.default_text(2015, make, "Sedan")} {pitch}', 1, object_id)
+        self.assertTrue(verdict.throttled)
+
+
+class CanonicalContactTests(TestCase):
+    def setUp(self):
+        self.older = make_user('older', email='Shared@example.com', phone_number='0712345678')
+        # Shared the same details before canonical columns existed (see migration 0015)
+        self.newer = make_user('newer')
+        User.objects.filter(pk=self.newer.pk).update(
+            email='shared@example.com', phone_number='+254712345678', email_canonical=None, phone_canonical=None,
+        )
+        self.newer = User.objects.get(pk=self.newer.pk)
+
+    def profile_form(self, user, **changes):
+        data = {'email': user.email, 'phone_number': user.phone_number, 'first_name': 'Jane', **changes}
+        return UserUpdateForm(data, instance=user)
+
+    def test_colliding_account_can_still_save_its_profile(self):
+        form = self.profile_form(self.newer)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.newer.refresh_from_db()
+        self.assertEqual(self.newer.first_name, 'Jane')
+        self.assertIsNone(self.newer.phone_canonical)
+        self.assertIsNone(self.newer.email_canonical)
+
+    def test_changed_details_get_their_canonical_value(self):
+        form = self.profile_form(self.newer, phone_number='0722 000 111', email='Newer@example.com')
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.newer.refresh_from_db()
+        self.assertEqual(self.newer.phone_canonical, '254722000111')
+        self.assertEqual(self.newer.email_canonical, 'newer@example.com')
+
+    def test_taking_another_accounts_details_is_a_field_error(self):
+        other = make_user('other', email='other@example.com', phone_number='0733 000 111')
+        form = self.profile_form(other, phone_number='+254712345678', email='SHARED@example.com')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {'phone_number', 'email'})
+
+
+class DetailFingerprintTests(TestCase):
+    def setUp(self):
+        self.seller = make_user('detail-seller')
+        self.car = make_car(self.seller)
+        self.request = RequestFactory().get(f'/cars/{self.car.slug}/')
+
+    def etag(self):
+        return detail_fingerprint(self.request, self.car.slug)[0]
+
+    def test_new_review_changes_the_etag(self):
+        before = self.etag()
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(
+                review_type='car', car=self.car, reviewer=make_user('reviewer'),
+                rating=5, title='Great', comment='Exactly as described', is_approved=True,
+            )
+        self.assertNotEqual(self.etag(), before)
+
+    def test_recomputed_market_segment_changes_the_etag(self):
+        market.rebuild_segments()
+        before = self.etag()
+        market.rebuild_segments([self.car.model_id])
+        self.assertNotEqual(self.etag(), before)
+
+    def test_unchanged_page_keeps_its_etag(self):
+        self.assertEqual(self.etag(), self.etag())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_MAX_LAG=5, REPLICA_PIN_COOKIE='replica_pin')
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        self.factory = RequestFactory()
+        db_router._lag_cache.clear()
+        self.addCleanup(db_router._lag_cache.clear)
+        self.lags = {'replica1': 0.0, 'replica2': 0.0}
+        patcher = mock.patch.object(db_router, 'replica_lag', side_effect=lambda alias: self.lags[alias])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_alias(self, request):
+        @db_router.read_from_replica
+        def view(request):
+            return self.router.db_for_read(Car)
+
+        return view(request)
+
+    def test_reads_outside_replica_views_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Car), 'default')
+
+    def test_replica_views_read_from_a_replica(self):
+        self.assertIn(self.read_alias(self.factory.get('/')), ('replica1', 'replica2'))
+
+    def test_writes_always_use_the_primary(self):
+        @db_router.read_from_replica
+        def view(request):
+            return self.router.db_for_write(Car)
+
+        self.assertEqual(view(self.factory.get('/')), 'default')
+
+    def test_lagging_replicas_are_skipped(self):
+        self.lags['replica1'] = 30.0
+        for _ in range(10):
+            self.assertEqual(self.read_alias(self.factory.get('/')), 'replica2')
+        self.lags['replica2'] = float('inf')
+        self.assertEqual(self.read_alias(self.factory.get('/')), 'default')
+
+    def test_pinned_client_reads_from_the_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES['replica_pin'] = '1'
+        self.assertEqual(self.read_alias(request), 'default')
+
+    def test_only_migrates_the_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'car_app'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'car_app'))
+
+
+@skipUnless('replica1' in settings.DATABASES, 'needs a replica alias (DATABASE_REPLICA_HOSTS)')
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaQueryTests(TestCase):
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        db_router._lag_cache.clear()
+        self.addCleanup(db_router._lag_cache.clear)
+
+    def queries_on(self, alias, request):
+        @db_router.read_from_replica
+        def view(request):
+            return Car.objects.count()
+
+        with CaptureQueriesContext(connections[alias]) as queries:
+            view(request)
+        return len(queries)
+
+    def test_replica_view_queries_run_on_the_replica(self):
+        self.assertEqual(self.queries_on('replica1', RequestFactory().get('/')), 1)
+
+    def test_pinned_client_queries_run_on_the_primary(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = '1'
+        self.assertEqual(self.queries_on('default', request), 1)
+
+
+@override_settings(REPLICA_PIN_COOKIE='replica_pin', REPLICA_PIN_SECONDS=10)
+class ReplicaPinMiddlewareTests(SimpleTestCase):
+    def respond(self, method, status=200):
+        middleware = db_router.ReplicaPinMiddleware(lambda request: HttpResponse(status=status))
+        return middleware(getattr(RequestFactory(), method)('/'))
+
+    def test_write_pins_the_client(self):
+        cookie = self.respond('post').cookies['replica_pin']
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertTrue(cookie['httponly'])
+
+    def test_reads_and_failed_writes_do_not_pin(self):
+        self.assertNotIn('replica_pin', self.respond('get').cookies)
+        self.assertNotIn('replica_pin', self.respond('post', status=500).cookies)
+
+
+class ReplicaLagTests(SimpleTestCase):
+    def setUp(self):
+        db_router._lag_cache.clear()
+        self.addCleanup(db_router._lag_cache.clear)
+
+    def test_non_postgres_databases_have_no_lag(self):
+        self.assertEqual(db_router.replica_lag('default'), 0.0)
+
+    def test_unreachable_replica_is_infinitely_behind(self):
+        replica = mock.Mock(vendor='postgresql')
+        replica.cursor.side_effect = OperationalError('could not connect to server')
+        with mock.patch.object(db_router, 'connections', {'replica1': replica}):
+            self.assertEqual(db_router.replica_lag('replica1'), float('inf'))
+
+    @override_settings(REPLICA_LAG_CHECK_INTERVAL=60)
+    def test_lag_is_cached_between_checks(self):
+        db_router._lag_cache['replica1'] = (time.monotonic(), 2.5)
+        self.assertEqual(db_router.replica_lag('replica1'), 2.5)
+
+
+@override_settings(SEARCH_TRENDS_MIN_SEARCHERS=3)
+class SearchTrendTests(TestCase):
+    def setUp(self):
+        make_car(make_user('trend-seller'), make='Toyota', model='Corolla')
+        self.users = [make_user(f'searcher{index}') for index in range(3)]
+
+    def search(self, query, user=None, session_key='', results_count=10):
+        SearchHistory.objects.create(user=user, session_key=session_key, query=query, results_count=results_count)
+
+    def trends(self, kind='trending'):
+        search_log.rollup_searches()
+        return list(SearchTrend.objects.filter(kind=kind).order_by('rank').values_list('query', flat=True))
+
+    def test_query_trends_once_enough_people_searched_it(self):
+        for user in self.users:
+            self.search('Toyota Corolla 2015', user=user)
+        self.assertEqual(self.trends(), ['toyota corolla 2015'])
+
+    def test_one_user_repeating_a_query_does_not_make_it_trend(self):
+        for _ in range(20):
+            self.search('toyota corolla', user=self.users[0], session_key='abc')
+        self.assertEqual(self.trends(), [])
+
+    def test_anonymous_searches_count_by_session(self):
+        for session_key in ('s1', 's2', ''):
+            self.search('toyota', session_key=session_key)
+        self.assertEqual(self.trends(), [])
+        self.search('toyota', session_key='s3')
+        self.assertEqual(self.trends(), ['toyota'])
+
+    def test_unknown_words_never_trend(self):
+        for user in self.users:
+            self.search('cheap toyota', user=user)
+            self.search('buy followers', user=user)
+        self.assertEqual(self.trends(), ['cheap toyota'])
+
+    def test_unknown_zero_result_queries_are_still_reported(self):
+        for user in self.users:
+            self.search('tesla cybertruck', user=user, results_count=0)
+        self.assertEqual(self.trends('zero_results'), ['tesla cybertruck'])
+
+
+class InventoryImportTests(TestCase):
+    def setUp(self):
+        self.seller = make_user('import-seller')
+        self.other = make_user('other-seller')
+        make_car(self.other, vin='OTHERSELLERVIN001')
+
+    def row(self, vin, price='1200000', **extra):
+        return {
+            'make': 'Toyota', 'model': 'Corolla', 'year': '2016', 'condition': 'foreign_used',
+            'body_type': 'sedan', 'mileage': '70000', 'engine_size': '1.5', 'fuel_type': 'petrol',
+            'transmission': 'automatic', 'drive_type': 'fwd', 'exterior_color': 'White',
+            'interior_color': 'Black', 'doors': '4', 'seats': '5', 'price': price,
+            'location': 'Westlands', 'city': 'Nairobi', 'vin': vin, **extra,
+        }
+
+    def write(self, *rows):
+        """Run rows through validation and the chunk writer, as import_inventory does"""
+        result = imports.ImportResult()
+        lookups = imports.LookupMaps()
+        built = []
+        for line_number, row in enumerate(rows, start=2):
+            _, cleaned, errors = imports.validate_row((line_number, row))
+            self.assertEqual(errors, [])
+            make, car_model, errors = lookups.resolve(cleaned['make'], cleaned['model'])
+            built.append((line_number, imports._build_car(cleaned, make, car_model, self.seller, None)))
+        with self.captureOnCommitCallbacks(execute=True):
+            imports._write_chunk(built, self.seller, result)
+        return result
+
+    def test_vin_of_another_seller_is_rejected_not_overwritten(self):
+        result = self.write(self.row('OTHERSELLERVIN001', price='1'))
+        self.assertEqual(result.errors, [(2, ['vin: already listed by another seller'])])
+        car = Car.objects.get(vin='OTHERSELLERVIN001')
+        self.assertEqual((car.seller_id, car.price), (self.other.id, Decimal('1500000')))
+
+    def test_own_vin_updates_the_car_but_not_its_status(self):
+        own = make_car(self.seller, status='sold', vin='MYOWNVIN000000001')
+        result = self.write(self.row('MYOWNVIN000000001', price='990000', status='active'))
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+        own.refresh_from_db()
+        self.assertEqual((own.price, own.status), (Decimal('990000'), 'sold'))
+
+    def test_new_cars_are_pending_and_queued_for_moderation(self):
+        result = self.write(self.row('NEWVIN00000000001', status='active'), self.row(''))
+        self.assertEqual(result.created, 2)
+        cars = Car.objects.filter(seller=self.seller)
+        self.assertEqual(set(cars.values_list('status', flat=True)), {'pending'})
+        self.assertEqual(
+            set(ModerationTask.objects.filter(kind='car').values_list('object_id', flat=True)),
+            set(cars.values_list('id', flat=True)),
+        )
+
+    def test_small_upload_is_validated_without_a_process_pool(self):
+        rows = [self.row('SMALLUPLOADVIN001'), self.row('SMALLUPLOADVIN001'), self.row('', year='1800')]
+        source = io.StringIO()
+        writer = csv.DictWriter(source, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        source.seek(0)
+        with mock.patch.object(imports, 'ProcessPoolExecutor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = imports.import_inventory(source, 'csv', self.seller, pool=True)
+        executor.assert_not_called()
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class BenchmarkViewsCommandTests(TransactionTestCase):
+    # The async views query from other threads, which can't see a test transaction
+    def test_runs_the_listing_pages_without_middleware(self):
+        make_car(make_user('bench-seller'))
+        out = io.StringIO()
+        call_command('benchmark_views', requests=1, stdout=out)
+        self.assertIn('car_listing', out.getvalue())
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle-tests'}},
+    RATE_LIMIT_CACHE='default',
+    RATE_LIMIT_PROXY_COUNT=0,
+    RATE_LIMITS={'login': {'rate': (1, 60), 'per': 'ip'}, 'toggle_favorite': {'rate': (1, 60)}},
+)
+class ThrottleTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def request(self, name, method='post', user_id=None, **extra):
+        path = reverse(name, args=[1] if name == 'toggle_favorite' else [])
+        request = getattr(RequestFactory(), method)(path, REMOTE_ADDR='10.0.0.1', **extra)
+        request.resolver_match = resolve(path)
+        request.session = {SESSION_KEY: str(user_id)} if user_id else {}
+        return request
+
+    def check(self, request):
+        return throttle.ThrottleMiddleware(lambda request: HttpResponse()).process_view(request, None, (), {})
+
+    def test_over_the_limit_in_the_current_window_waits_for_the_next(self):
+        for _ in range(3):
+            self.assertEqual(throttle.hit('rule', 'client', 3, 60, now=6000), 0)
+        self.assertEqual(throttle.hit('rule', 'client', 3, 60, now=6010), 50)
+
+    def test_previous_window_counts_by_its_remaining_overlap(self):
+        for _ in range(4):
+            throttle.hit('rule', 'client', 4, 60, now=5950)
+        # Half of the previous window still overlaps: 4 * 0.5 = 2 of the 4 allowed
+        self.assertEqual(throttle.hit('rule', 'client', 4, 60, now=6030), 0)
+        self.assertEqual(throttle.hit('rule', 'client', 4, 60, now=6030), 0)
+        # 3 + 2 = 5: a quarter of the previous window (15s) has to slide out
+        self.assertEqual(throttle.hit('rule', 'client', 4, 60, now=6030), 15)
+
+    def test_signed_in_users_are_counted_by_id_and_anonymous_clients_by_ip(self):
+        self.assertEqual(throttle._client_key(self.request('toggle_favorite', user_id=7), 'user'), 'u7')
+        self.assertEqual(throttle._client_key(self.request('toggle_favorite'), 'user'), 'ip10.0.0.1')
+        self.assertEqual(throttle._client_key(self.request('login', user_id=7), 'ip'), 'ip10.0.0.1')
+
+    def test_forwarded_for_is_trusted_as_far_as_the_proxy_count(self):
+        request = self.request('login', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2, 3.3.3.3')
+        self.assertEqual(throttle.client_ip(request), '10.0.0.1')
+        for proxies, expected in ((1, '3.3.3.3'), (2, '2.2.2.2'), (5, '1.1.1.1')):
+            with self.subTest(proxies=proxies), override_settings(RATE_LIMIT_PROXY_COUNT=proxies):
+                self.assertEqual(throttle.client_ip(request), expected)
+
+    def test_users_on_one_address_have_separate_limits(self):
+        self.assertIsNone(self.check(self.request('toggle_favorite', user_id=1)))
+        self.assertIsNone(self.check(self.request('toggle_favorite', user_id=2)))
+        self.assertIsNotNone(self.check(self.request('toggle_favorite', user_id=1)))
+
+    def test_throttled_request_gets_429_with_retry_after(self):
+        self.assertIsNone(self.check(self.request('login')))
+        response = self.check(self.request('login'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_json_clients_get_a_json_429(self):
+        self.check(self.request('login'))
+        response = self.check(self.request('login', HTTP_ACCEPT='application/json'))
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('error', json.loads(response.content))
+
+    def test_methods_outside_the_rule_are_not_counted(self):
+        for _ in range(3):
+            self.assertIsNone(self.check(self.request('login', method='get')))
+        self.assertIsNone(self.check(self.request('login')))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmailOrUsernameBackendTests(TestCase):
+    def setUp(self):
+        self.backend = auth_backend.EmailOrUsernameBackend()
+        self.carol = make_user('carol', email='Carol@example.com', password='secret-pw')
+
+    def test_exact_username_wins_over_email_and_case_only_matches(self):
+        by_username = make_user('Sam@example.com', email='sam-1@example.com')
+        by_email = make_user('sam-2', email='Sam@example.com')
+        make_user('sam@example.com', email='sam-3@example.com')
+        self.assertEqual(auth_backend.find_user('Sam@example.com'), by_username)
+        by_username.delete()
+        self.assertEqual(auth_backend.find_user('Sam@example.com'), by_email)
+
+    def test_login_by_email_ignores_case(self):
+        user = self.backend.authenticate(None, username='carol@example.com', password='secret-pw')
+        self.assertEqual(user, self.carol)
+
+    def test_unknown_identifier_and_wrong_password_are_rejected(self):
+        self.assertIsNone(self.backend.authenticate(None, username='nobody', password='secret-pw'))
+        self.assertIsNone(self.backend.authenticate(None, username='carol', password='wrong'))
+
+    def test_inactive_user_is_rejected(self):
+        self.carol.is_active = False
+        self.carol.save(update_fields=['is_active'])
+        self.assertIsNone(self.backend.authenticate(None, username='carol', password='secret-pw'))
+
+    def test_one_query_per_attempt(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.authenticate(None, username='CAROL', password='secret-pw'), self.carol)
+        with self.assertNumQueries(1):
+            self.backend.authenticate(None, username='nobody', password='secret-pw')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'session-tests'}},
+    SESSION_REFRESH_INTERVAL=300,
+)
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        session = session_backend.SessionStore()
+        session['cart'] = [1]
+        session.save()
+        self.key = session.session_key
+
+    def reload(self):
+        session = session_backend.SessionStore(self.key)
+        session.load()
+        return session
+
+    def stored(self):
+        return Session.objects.get(session_key=self.key).get_decoded()
+
+    def test_unchanged_session_skips_the_write_until_the_refresh_is_due(self):
+        session = self.reload()
+        with self.assertNumQueries(0):
+            session.save()
+        caches['default'].delete(session.refresh_marker_key)
+        with CaptureQueriesContext(connections['default']) as queries:
+            session.save()
+        self.assertTrue(any(query['sql'].startswith('UPDATE') for query in queries))
+        self.assertIsNotNone(caches['default'].get(session.refresh_marker_key))
+
+    def test_modified_session_is_written(self):
+        session = self.reload()
+        session['seen'] = 3
+        session.save()
+        self.assertEqual(self.stored(), {'cart': [1], 'seen': 3})
+
+    def test_session_mutated_in_place_is_written(self):
+        session = self.reload()
+        session['cart'].append(2)
+        self.assertFalse(session.modified)
+        session.save()
+        self.assertEqual(self.stored(), {'cart': [1, 2]})
+
+    def test_delete_clears_the_refresh_marker(self):
+        marker = self.reload().refresh_marker_key
+        self.assertIsNotNone(caches['default'].get(marker))
+        session_backend.SessionStore().delete(self.key)
+        self.assertIsNone(caches['default'].get(marker))
+
+        session = session_backend.SessionStore()
+        session['cart'] = []
+        session.save()
+        marker = session.refresh_marker_key
+        session.delete()
+        self.assertIsNone(caches['default'].get(marker))
+
+    @override_settings(SESSION_CLEANUP_BATCH_SIZE=2)
+    def test_clear_expired_deletes_in_batches(self):
+        expired = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{n:025d}', session_data='', expire_date=expired) for n in range(5)
+        )
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertEqual(session_backend.SessionStore.clear_expired(), 5)
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 3)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [self.key])
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    def feed(self, *car_ids):
+        return CarChange.objects.bulk_create(
+            [CarChange(car_id=car_id, source='car', action='save') for car_id in car_ids]
+        )
+
+    def test_consume_hands_over_batches_and_advances_the_cursor(self):
+        entries = self.feed(1, 2, 3)
+        batches = []
+        self.assertEqual(changefeed.consume('search', batches.append, limit=2), 3)
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(changefeed.read_cursor('search'), entries[-1].seq)
+        self.assertEqual(changefeed.consume('search', batches.append), 0)
+
+    def test_failing_handler_sees_the_same_batch_again(self):
+        entries = self.feed(1, 2, 3)
+
+        def fail_on_car_3(changes):
+            if 3 in changefeed.changed_car_ids(changes):
+                raise RuntimeError('index unavailable')
+
+        with self.assertRaises(RuntimeError):
+            changefeed.consume('search', fail_on_car_3, limit=2)
+        self.assertEqual(changefeed.read_cursor('search'), entries[1].seq)
+
+        batches = []
+        self.assertEqual(changefeed.consume('search', batches.append), 1)
+        self.assertEqual(changefeed.changed_car_ids(batches[0]), [3])
+
+    def test_compact_keeps_the_newest_entry_per_car(self):
+        self.feed(1, 2, 1, 1)
+        self.assertEqual(changefeed.compact(), (2, 0))
+        self.assertEqual(list(CarChange.objects.order_by('seq').values_list('car_id', flat=True)), [2, 1])
+
+        changefeed.advance_cursor('search', CarChange.objects.get(car_id=2).seq)
+        self.assertEqual(changefeed.compact(), (0, 1))
+        self.assertEqual(list(CarChange.objects.values_list('car_id', flat=True)), [1])
+
+    @override_settings(CHANGE_FEED_SETTLE_SECONDS=60)
+    def test_entries_younger_than_the_settle_window_are_held_back(self):
+        old, fresh = self.feed(1, 2)
+        CarChange.objects.filter(seq=old.seq).update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual([change.seq for change in changefeed.changes_since(0)], [old.seq])
+
+    def test_image_and_review_deletes_are_recorded_as_deletes(self):
+        seller = make_user('feed-seller')
+        car = make_car(seller)
+        with self.captureOnCommitCallbacks(execute=True):
+            image = CarImage.objects.create(car=car, image='cars/front.jpg')
+            review = Review.objects.create(
+                review_type='car', car=car, reviewer=seller, rating=4, title='Solid', comment='Runs well',
+            )
+            image.delete()
+            review.delete()
+        self.assertEqual(
+            list(CarChange.objects.exclude(source='car').order_by('seq').values_list('source', 'action')),
+            [('image', 'save'), ('review', 'save'), ('image', 'delete'), ('review', 'delete')],
+        )
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class AlertTests(TestCase):
+    def setUp(self):
+        self.seller = make_user('alert-seller')
+        self.buyer = make_user('alert-buyer')
+        self.assertEqual(alerts.run_alerts(), (0, 0, 0))
+
+    def notifications(self, kind):
+        notifications = Notification.objects.filter(user=self.buyer, notification_type=kind)
+        return list(notifications.values_list('title', flat=True))
+
+    def test_new_car_notifies_matching_saved_searches_once(self):
+        SavedSearch.objects.create(user=self.buyer, filters={'make': 'toyota', 'price_max': '2,000,000'})
+        SavedSearch.objects.create(user=self.buyer, query='corolla', filters={'city': 'nairobi'})
+        SavedSearch.objects.create(user=self.buyer, filters={'make': 'honda'})
+        SavedSearch.objects.create(user=self.seller, filters={'make': 'toyota'})
+        with self.captureOnCommitCallbacks(execute=True):
+            car = make_car(self.seller)
+        self.assertEqual(alerts.run_alerts()[0], 1)
+        self.assertEqual(self.notifications('saved_search'), ['New match for your saved search'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        self.assertEqual(alerts.run_alerts()[0], 0)
+
+    def test_price_drop_alerts_once_per_drop(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            car = make_car(self.seller, price='1500000')
+        Favorite.objects.create(user=self.buyer, car=car, saved_price=car.price)
+        alerts.run_alerts()
+
+        car.price = Decimal('1400000')
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        self.assertEqual(alerts.run_alerts()[1], 1)
+        self.assertEqual(self.notifications('price_drop'), [f'Price drop on {car.title}'])
+        self.assertEqual(Favorite.objects.get(car=car).saved_price, Decimal('1400000'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        self.assertEqual(alerts.run_alerts()[1], 0)
+
+
+class DealerStatsTests(TestCase):
+    COUNTERS = (
+        'total_listings', 'active_listings', 'sold_listings', 'total_views', 'total_inquiries', 'total_days_to_sell',
+    )
+
+    def make_dealer(self, name):
+        return Dealer.objects.create(
+            user=make_user(name), business_name=name, description='Dealer', business_license='BL-1',
+            tax_id='P000', phone='+254700000000', email=f'{name}@example.com', address='Mombasa Road',
+            city='Nairobi', country='Kenya',
+        )
+
+    def counters(self):
+        return {
+            dealer['id']: dealer for dealer in Dealer.objects.order_by('id').values('id', *self.COUNTERS)
+        }
+
+    def test_signal_deltas_agree_with_recompute(self):
+        first, second = self.make_dealer('first-dealer'), self.make_dealer('second-dealer')
+        sold = make_car(first.user, dealer=first, views=40, inquiries=2)
+        moved = make_car(first.user, dealer=first, views=7)
+        make_car(second.user, dealer=second, status='pending')
+        gone = make_car(second.user, dealer=second, views=3)
+
+        sold.status = 'sold'
+        sold.sold_at = sold.created_at + timedelta(days=12)
+        sold.save()
+        moved.dealer = second
+        moved.status = 'expired'
+        moved.save()
+        Car.objects.get(pk=gone.pk).delete()
+
+        incremental = self.counters()
+        self.assertEqual(incremental[first.id]['sold_listings'], 1)
+        self.assertEqual(incremental[first.id]['total_days_to_sell'], 12)
+        self.assertEqual(incremental[second.id]['total_listings'], 2)
+        dealer_stats.recompute()
+        self.assertEqual(self.counters(), incremental)
+
+
+@override_settings(ACTIVITY_BUFFER_SIZE=1000)
+class ActivityTests(TestCase):
+    def setUp(self):
+        # Flush by hand instead of from the background thread
+        patcher = mock.patch.object(activity, '_flusher', object())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(activity._buffer.clear)
+        seller = make_user('activity-seller')
+        self.car, self.other = make_car(seller), make_car(seller)
+
+    def test_flush_adds_buffered_counts_to_buckets_and_car_totals(self):
+        activity.record(self.car, views=2)
+        activity.record(self.car, views=1, inquiries=1)
+        activity.record(self.other, favorites=1)
+        self.assertEqual(activity.flush(), 2)
+        activity.record(self.car, views=4)
+        self.assertEqual(activity.flush(), 1)
+        self.assertEqual(activity.flush(), 0)
+
+        self.assertEqual(
+            list(CarActivity.objects.order_by('car_id').values_list('car_id', 'views', 'inquiries', 'favorites')),
+            [(self.car.id, 7, 1, 0), (self.other.id, 0, 0, 1)],
+        )
+        self.car.refresh_from_db()
+        self.assertEqual((self.car.views, self.car.inquiries), (7, 1))
+
+    def test_compact_folds_only_finished_hours(self):
+        now = timezone.now()
+        CarActivity.objects.bulk_create([
+            CarActivity(
+                car_id=self.car.id, seller_id=self.car.seller_id,
+                hour=activity._hour(now - timedelta(hours=hours)), views=views, inquiries=1,
+            )
+            for hours, views in ((0, 5), (1, 3), (2, 4))
+        ])
+        # The hour being written to stays until it is over
+        folded = activity.compact_activity(now=now)
+        self.assertEqual(folded, 2)
+        self.assertEqual(CarActivity.objects.get().views, 5)
+        self.assertEqual(activity.compact_activity(now=now + timedelta(hours=1)), 1)
+
+        self.assertFalse(CarActivity.objects.exists())
+        totals = CarDailyStats.objects.filter(car_id=self.car.id)
+        self.assertEqual(sum(totals.values_list('views', flat=True)), 12)
+        self.assertEqual(sum(totals.values_list('inquiries', flat=True)), 3)
+
+
+class ModerationLeaseTests(TestCase):
+    def setUp(self):
+        seller = make_user('pending-seller')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cars = [make_car(seller, status='pending') for _ in range(3)]
+        self.first, self.second = make_user('moderator-1'), make_user('moderator-2')
+
+    def test_a_leased_task_is_not_handed_out_again(self):
+        leased = moderation.lease(self.first, limit=2)
+        self.assertEqual(len(leased), 2)
+        rest = moderation.lease(self.second, limit=5)
+        self.assertEqual(len(rest), 1)
+        self.assertNotIn(rest[0].id, {task.id for task in leased})
+        self.assertEqual(moderation.lease(self.second), [])
+        self.assertEqual(len(moderation.leased_tasks(self.first)), 2)
+
+    def test_expired_leases_return_to_the_queue(self):
+        leased = moderation.lease(self.first, limit=3)
+        ModerationTask.objects.filter(id=leased[0].id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([task.id for task in moderation.lease(self.second)], [leased[0].id])
+        self.assertEqual(len(moderation.leased_tasks(self.first)), 2)
+
+    def test_items_decided_elsewhere_are_closed_as_skipped(self):
+        Car.objects.filter(id=self.cars[0].id).update(status='active')
+        self.assertEqual(len(moderation.lease(self.first, limit=3)), 2)
+        self.assertEqual(ModerationTask.objects.get(object_id=self.cars[0].id).resolution, 'skipped')
+
+
+class DuplicateListingTests(TestCase):
+    def test_shared_vin_pairs_sellers_but_not_own_relists(self):
+        first, second, third = make_user('dup-first'), make_user('dup-second'), make_user('dup-third')
+        original = make_car(first, vin='JTDBR32E540012345')
+        relist = make_car(first, vin='JTDBR32E54OO12345')
+        # Same VIN once case and the letters VINs never use are normalised
+        copy = make_car(second, vin='jtdbr32e54oo12345')
+        # Same features but no VIN: not enough evidence on its own
+        make_car(third)
+
+        self.assertEqual(dedup.find_duplicates(full=True), (4, 2))
+        pairs = DuplicateListing.objects.values_list('car_id', 'duplicate_of_id', 'reasons')
+        self.assertEqual(
+            set(pairs), {(copy.id, original.id, 'features,vin'), (copy.id, relist.id, 'features,vin')}
+        )
+        self.assertEqual(ModerationTask.objects.filter(kind='duplicate').count(), 2)
+
+
+class CompareMatrixTests(TestCase):
+    def test_only_active_cars_are_compared(self):
+        seller = make_user('compare-seller')
+        cars = [make_car(seller, status=status) for status in ('active', 'pending', 'sold', 'active')]
+        matrix = compare.build_matrix([car.id for car in cars])
+        self.assertEqual([column['car'].id for column in matrix['columns']], [cars[0].id, cars[3].id])
+
+
+@override_settings(
+    DATABASE_REPLICAS=[],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'card-tests'}},
+)
+class CardFragmentCacheTests(TestCase):
+    def render_listing(self):
+        request = RequestFactory().get('/cars/')
+        request.user = AnonymousUser()
+        request.session = session_backend.SessionStore()
+        return car_listing(request).content.decode()
+
+    def test_new_first_image_replaces_the_cached_card_image(self):
+        caches['default'].clear()
+        car = make_car(make_user('card-seller'))
+        CarImage.objects.create(car=car, image='cars/side.jpg', order=1)
+        self.assertIn('cars/side.jpg', self.render_listing())
+
+        # Adding a photo doesn't touch the car's updated_at
+        CarImage.objects.create(car=car, image='cars/front.jpg', order=0, is_primary=True)
+        html = self.render_listing()
+        self.assertIn('cars/front.jpg', html)
+        self.assertNotIn('cars/side.jpg', html)
@@ -0,0 +1,140 @@
+# cars/throttle.py
+"""
+Rate limiting for write and auth endpoints.
+
+``RATE_LIMITS`` maps URL names to a rule: ``rate`` is (requests, seconds),
+``per`` is ``'user'`` (signed-in users by id, anonymous clients by IP) or
+``'ip'``, and ``methods`` lists the HTTP methods that count (POST by
+default). ``ThrottleMiddleware`` checks the rule in ``process_view``,
+before the view and its ORM work run, and answers 429 with a
+``Retry-After`` header once a client is over its rate.
+
+Each client has one counter per window. The limit is checked against a
+sliding estimate: the current window's count plus the previous window's
+count, weighted by how much of that window still overlaps the last
+``seconds``. Like a token bucket, this allows short bursts while holding
+the long-run rate, without the double burst a fixed window allows at its
+edges. On Redis the increment, its expiry and the read of the previous
+window go out as one pipeline, so a request costs one cache round trip.
+Other cache backends (local memory in tests and development) use the
+regular cache API.
+
+The user id is read from the session, so the check never loads the user.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics
+
+
+KEY_PREFIX = 'throttle'
+
+
+def client_ip(request):
+    """
+    Client address. Behind ``RATE_LIMIT_PROXY_COUNT`` trusted proxies it is
+    taken from X-Forwarded-For, counting from the right.
+    """
+    proxies = settings.RATE_LIMIT_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _client_key(request, per):
+    if per == 'user':
+        user_id = request.session.get(SESSION_KEY) if hasattr(request, 'session') else None
+        if user_id:
+            return f'u{user_id}'
+    return f'ip{client_ip(request)}'
+
+
+def _count(cache, key, previous_key, timeout):
+    """Increment ``key`` and return ``(current, previous)`` window counts"""
+    if isinstance(cache, RedisCache):
+        key = cache.make_and_validate_key(key)
+        previous_key = cache.make_and_validate_key(previous_key)
+        pipeline = cache._cache.get_client(key, write=True).pipeline(transaction=False)
+        pipeline.incr(key)
+        pipeline.expire(key, timeout)
+        pipeline.get(previous_key)
+        current, _, previous = pipeline.execute()
+        return current, int(previous or 0)
+
+    if cache.add(key, 1, timeout):
+        current = 1
+    else:
+        try:
+            current = cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, timeout)
+            current = 1
+    return current, cache.get(previous_key, 0)
+
+
+def hit(name, client, limit, seconds, now=None):
+    """
+    Count one request by ``client`` against rule ``name``. Returns 0 when it
+    is allowed, otherwise the seconds until the client may try again.
+    """
+    now = time.time() if now is None else now
+    window, offset = divmod(now, seconds)
+    window = int(window)
+    current, previous = _count(
+        caches[settings.RATE_LIMIT_CACHE],
+        f'{KEY_PREFIX}:{name}:{client}:{window}',
+        f'{KEY_PREFIX}:{name}:{client}:{window - 1}',
+        # Still needed as the previous window of the next one
+        seconds * 2,
+    )
+    overlap = 1 - offset / seconds
+    if current + previous * overlap <= limit:
+        return 0
+    if current > limit or not previous:
+        # Over the limit on this window alone: wait for the next one
+        return max(1, math.ceil(seconds - offset))
+    # Wait until enough of the previous window has slid out of view
+    needed = (current + previous * overlap - limit) / previous
+    return max(1, math.ceil(needed * seconds))
+
+
+def _too_many_requests(request, retry_after):
+    message = 'Too many requests. Please wait a moment and try again.'
+    if request.content_type == 'application/json' or 'application/json' in request.headers.get('Accept', ''):
+        response = JsonResponse({'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class ThrottleMiddleware:
+    """Apply ``RATE_LIMITS`` to the views they name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        rule = settings.RATE_LIMITS.get(match.view_name if match else None)
+        if rule is None or request.method not in rule.get('methods', ('POST',)):
+            return None
+
+        limit, seconds = rule['rate']
+        retry_after = hit(match.view_name, _client_key(request, rule.get('per', 'user')), limit, seconds)
+        if not retry_after:
+            return None
+        metrics.incr(f'throttle.{match.view_name}')
+        return _too_many_requests(request, retry_after)
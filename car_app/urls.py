@@ -1,13 +1,17 @@
 # cars/urls.py
 from django.urls import path
+from django.conf import settings
 from django.contrib.auth import views as auth_views
-from . import views
+from . import views, async_views
+
+# Read-heavy pages: async implementations when served over ASGI
+read_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     # Home & Listings
-    path('', views.home, name='home'),
-    path('cars/', views.car_listing, name='car_listings'),
-    path('cars/<slug:slug>/', views.car_detail, name='car_detail'),
+    path('', read_views.home, name='home'),
+    path('cars/', read_views.car_listing, name='car_listings'),
+    path('cars/<slug:slug>/', read_views.car_detail, name='car_detail'),
 
     # Send inquiry
     path('<slug:slug>/inquiry/', views.send_inquiry, name='send_inquiry'),
@@ -16,10 +20,10 @@ urlpatterns = [
     path('<slug:slug>/review/', views.add_review, name='add_review'),
     
     # Search & Filters
-    path('search/', views.car_listing, name='search'),
-    path('brand-new/', views.car_listing, name='brand_new'),
-    path('used-cars/', views.car_listing, name='used_cars'),
-    path('crashed-cars/', views.car_listing, name='crashed_cars'),
+    path('search/', read_views.car_listing, name='search'),
+    path('brand-new/', read_views.car_listing, name='brand_new'),
+    path('used-cars/', read_views.car_listing, name='used_cars'),
+    path('crashed-cars/', read_views.car_listing, name='crashed_cars'),
     
     # Checkout & Orders
     path('checkout/<int:car_id>/', views.checkout, name='checkout'),
@@ -41,13 +45,35 @@ urlpatterns = [
     
     # User Actions
     path('favorite/<int:car_id>/', views.toggle_favorite, name='toggle_favorite'),
-    path('inquiry/<int:car_id>/', views.send_inquiry, name='send_inquiry'),
+    path('searches/save/', views.save_search, name='save_search'),
+
+    # Compare
+    path('compare/', views.compare_cars, name='compare_cars'),
+    path('compare/add/<int:car_id>/', views.add_to_compare, name='add_to_compare'),
+    path('compare/remove/<int:car_id>/', views.remove_from_compare, name='remove_from_compare'),
 
     # Authentication URLs
     path('login/', views.login_view, name='login'),
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
+
+    # Dealers
+    path('dealers/<slug:slug>/', views.dealer_storefront, name='dealer_storefront'),
+    path('dealer/dashboard/', views.dealer_dashboard, name='dealer_dashboard'),
+    path('dashboard/activity/', views.seller_activity_chart, name='seller_activity'),
+
+    # Moderation
+    path('moderation/', views.moderation_queue, name='moderation_queue'),
+    path('moderation/claim/', views.moderation_claim, name='moderation_claim'),
+    path('moderation/<int:task_id>/resolve/', views.moderation_resolve, name='moderation_resolve'),
+
+    # Dealer/seller inventory
+    path('inventory/export/', views.export_inventory, name='export_inventory'),
+    path('inventory/import/', views.import_inventory_upload, name='import_inventory'),
+
+    # Instrumentation (staff only)
+    path('metrics/', views.metrics_view, name='metrics'),
     
 
 ]
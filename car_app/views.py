@@ -1,17 +1,28 @@
 # cars/views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, QueryDict, StreamingHttpResponse
 from django.db.models import Q, Count, Avg, Min, Max
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
+from django.urls import reverse
 from django.core.paginator import Paginator
 from .models import *
+from .db_router import read_from_replica
+from .conditional import conditional_page, detail_fingerprint, listing_fingerprint
+from . import activity, http_client, metrics, moderation, spam
+from .exports import EXPORT_FORMATS, inventory_queryset, iter_export
+from .imports import IMPORT_FORMATS, import_inventory, open_upload
+from .market import market_summary, price_rating
+from .alerts import SEARCH_FILTER_KEYS
+from .search_log import log_listing_search, trending_searches
+from .compare import parse_car_ids, render_matrix
+from .normalize import is_kenyan_mobile, normalize_phone
 from decimal import Decimal
-import requests
 import base64
 import json
 from datetime import datetime
@@ -26,106 +37,97 @@ from django.shortcuts import render
 from django.db.models import Count, Avg, Min, Max, Q
 from .models import Car, CarMake, Review, User
 
-def home(request):
+def home_sections():
     """
-    Home page view with featured cars, statistics, and navigation options
+    Independent querysets behind each home page section.
+
+    They are lazy and share nothing, so the sync view evaluates them one by
+    one while the async view can run them concurrently.
     """
-    
-    # Get total number of active cars
-    total_cars = Car.objects.filter(status='active').count()
-    
-    # Get featured cars (latest 6 cars)
-    featured_cars = Car.objects.filter(
-        status='active'
-    ).select_related(
-        'make', 'model', 'seller'
-    ).prefetch_related(
-        'images'
-    ).order_by('-created_at')[:6]
-    
-    # Get cars for different categories
-    # Shop by budget - cars under different price ranges
-    budget_cars = {
-        'under_20k': Car.objects.filter(
-            status='active',
-            price__lt=20000
-        ).select_related('make', 'model').prefetch_related('images').order_by('price')[:3],
-        'under_30k': Car.objects.filter(
-            status='active',
-            price__lt=30000,
-            price__gte=20000
-        ).select_related('make', 'model').prefetch_related('images').order_by('price')[:3],
-        'luxury': Car.objects.filter(
-            status='active',
-            price__gte=50000
-        ).select_related('make', 'model').prefetch_related('images').order_by('-price')[:3],
+    active_cars = Car.objects.filter(status='active')
+    card_cars = active_cars.select_related('make', 'model').prefetch_related('images')
+    
+    return {
+        # Get featured cars (latest 6 cars)
+        'featured_cars': active_cars.select_related(
+            'make', 'model', 'seller'
+        ).prefetch_related(
+            'images'
+        ).order_by('-created_at')[:6],
+        
+        # Shop by budget - cars under different price ranges
+        'under_20k': card_cars.filter(price__lt=20000).order_by('price')[:3],
+        'under_30k': card_cars.filter(price__lt=30000, price__gte=20000).order_by('price')[:3],
+        'luxury': card_cars.filter(price__gte=50000).order_by('-price')[:3],
+        
+        # Get popular makes with car counts
+        'popular_makes': CarMake.objects.annotate(
+            car_count=Count('car', filter=Q(car__status='active'))
+        ).filter(car_count__gt=0).order_by('-car_count', 'name')[:12],
+        
+        # Get cars by body style with counts
+        'body_styles': active_cars.values('body_type').annotate(
+            car_count=Count('id')
+        ).order_by('-car_count')[:8],
+        
+        # Get expert reviews (latest 3) - filter for car reviews that are approved
+        'expert_reviews': Review.objects.filter(
+            review_type='car',
+            is_approved=True,
+            car__isnull=False
+        ).select_related('car', 'reviewer', 'car__make', 'car__model').order_by('-created_at')[:3],
+        
+        # Get customer testimonials (latest 4) - highly rated reviews
+        'customer_reviews': Review.objects.filter(
+            review_type='car',
+            is_approved=True,
+            rating__gte=4,
+            car__isnull=False
+        ).select_related('car', 'reviewer', 'car__make', 'car__model').order_by('-created_at')[:4],
+        
+        # Get best deals (featured cars sorted by price)
+        'best_deals': card_cars.filter(is_featured=True).order_by('price')[:6],
+        
+        # Get recently added cars
+        'recent_cars': card_cars.order_by('-created_at')[:4],
+        
+        # Get urgent sales
+        'urgent_cars': card_cars.filter(is_urgent=True).order_by('-created_at')[:4],
     }
-    
-    # Get popular makes with car counts
-    popular_makes = CarMake.objects.annotate(
-        car_count=Count('car', filter=Q(car__status='active'))
-    ).filter(car_count__gt=0).order_by('-car_count', 'name')[:12]
-    
-    # Get cars by body style with counts
-    body_styles = Car.objects.filter(
-        status='active'
-    ).values('body_type').annotate(
-        car_count=Count('id')
-    ).order_by('-car_count')[:8]
-    
-    # Get expert reviews (latest 3) - filter for car reviews that are approved
-    expert_reviews = Review.objects.filter(
-        review_type='car',
-        is_approved=True,
-        car__isnull=False
-    ).select_related('car', 'reviewer', 'car__make', 'car__model').order_by('-created_at')[:3]
-    
-    # Get customer testimonials (latest 4) - highly rated reviews
-    customer_reviews = Review.objects.filter(
-        review_type='car',
-        is_approved=True,
-        rating__gte=4,
-        car__isnull=False
-    ).select_related('car', 'reviewer', 'car__make', 'car__model').order_by('-created_at')[:4]
-    
-    # Calculate average savings or price statistics
-    price_stats = Car.objects.filter(status='active').aggregate(
-        avg_price=Avg('price'),
-        min_price=Min('price'),
-        max_price=Max('price')
-    )
-    
-    # Get best deals (featured cars sorted by price)
-    best_deals = Car.objects.filter(
-        status='active',
-        is_featured=True
-    ).select_related('make', 'model').prefetch_related('images').order_by('price')[:6]
-    
-    # Additional useful data
-    # Get recently added cars
-    recent_cars = Car.objects.filter(
-        status='active'
-    ).select_related('make', 'model').prefetch_related('images').order_by('-created_at')[:4]
-    
-    # Get urgent sales
-    urgent_cars = Car.objects.filter(
-        status='active',
-        is_urgent=True
-    ).select_related('make', 'model').prefetch_related('images').order_by('-created_at')[:4]
-    
-    context = {
+
+
+def home_context(sections, total_cars, price_stats, trending):
+    """Build the home template context from evaluated sections"""
+    return {
         'total_cars': total_cars,
-        'featured_cars': featured_cars,
-        'budget_cars': budget_cars,
-        'popular_makes': popular_makes,
-        'body_styles': body_styles,
-        'expert_reviews': expert_reviews,
-        'customer_reviews': customer_reviews,
+        'trending_searches': trending,
+        'featured_cars': sections['featured_cars'],
+        'budget_cars': {
+            'under_20k': sections['under_20k'],
+            'under_30k': sections['under_30k'],
+            'luxury': sections['luxury'],
+        },
+        'popular_makes': sections['popular_makes'],
+        'body_styles': sections['body_styles'],
+        'expert_reviews': sections['expert_reviews'],
+        'customer_reviews': sections['customer_reviews'],
         'price_stats': price_stats,
-        'best_deals': best_deals,
-        'recent_cars': recent_cars,
-        'urgent_cars': urgent_cars,
+        'best_deals': sections['best_deals'],
+        'recent_cars': sections['recent_cars'],
+        'urgent_cars': sections['urgent_cars'],
     }
+
+
+@read_from_replica
+def home(request):
+    """
+    Home page view with featured cars, statistics, and navigation options
+    """
+    
+    # Active car count and price statistics, precomputed by the market refresh
+    price_stats = market_summary()
+    
+    context = home_context(home_sections(), price_stats['total_cars'], price_stats, trending_searches())
     
     return render(request, 'home.html', context)
 
@@ -209,8 +211,12 @@ from .models import Car, CarMake, CarModel, Favorite
 from decimal import Decimal
 
 
-def car_listing(request):
-    """Car listing view with filters and search"""
+def filter_car_listing(request):
+    """
+    Apply the listing search, filters and sorting from the query string.
+
+    Returns the filtered queryset, the search query and the current filters.
+    """
     
     # Get all active cars
     cars = Car.objects.filter(status='active').select_related(
@@ -295,6 +301,33 @@ def car_listing(request):
     if sort_by in valid_sorts:
         cars = cars.order_by(sort_by)
     
+    current_filters = {
+        'make': make_filter,
+        'model': model_filter,
+        'body_type': body_type,
+        'condition': condition,
+        'fuel_type': fuel_type,
+        'transmission': transmission,
+        'year_min': year_min,
+        'year_max': year_max,
+        'price_min': price_min,
+        'price_max': price_max,
+        'mileage_min': mileage_min,
+        'mileage_max': mileage_max,
+        'city': city_filter,
+        'sort': sort_by,
+    }
+    
+    return cars, search_query, current_filters
+
+
+@read_from_replica
+@conditional_page(listing_fingerprint)
+def car_listing(request):
+    """Car listing view with filters and search"""
+    
+    cars, search_query, current_filters = filter_car_listing(request)
+    
     # Get filter options for sidebar
     makes = CarMake.objects.all().annotate(
         car_count=Count('car', filter=Q(car__status='active'))
@@ -332,6 +365,12 @@ def car_listing(request):
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
+    # Buffered, written by a background thread
+    log_listing_search(
+        request.user, request.session.session_key, search_query, current_filters,
+        paginator.count, page_number,
+    )
+    
     context = {
         'cars': page_obj,
         'page_obj': page_obj,
@@ -346,22 +385,7 @@ def car_listing(request):
         'year_range': year_range,
         'favorite_car_ids': favorite_car_ids,
         'search_query': search_query,
-        'current_filters': {
-            'make': make_filter,
-            'model': model_filter,
-            'body_type': body_type,
-            'condition': condition,
-            'fuel_type': fuel_type,
-            'transmission': transmission,
-            'year_min': year_min,
-            'year_max': year_max,
-            'price_min': price_min,
-            'price_max': price_max,
-            'mileage_min': mileage_min,
-            'mileage_max': mileage_max,
-            'city': city_filter,
-            'sort': sort_by,
-        }
+        'current_filters': current_filters,
     }
     
     return render(request, 'listings.html', context)
@@ -378,6 +402,41 @@ from decimal import Decimal
 import random
 
 
+def group_specifications(specifications):
+    """Group specifications by category, keeping their order"""
+    specs_by_category = {}
+    for spec in specifications:
+        category = spec.category or 'General'
+        if category not in specs_by_category:
+            specs_by_category[category] = []
+        specs_by_category[category].append(spec)
+    return specs_by_category
+
+
+def parse_features(car):
+    """Split the comma-separated features field"""
+    if not car.features:
+        return []
+    return [f.strip() for f in car.features.split(',') if f.strip()]
+
+
+def similar_cars_queryset(car):
+    """Active cars of the same make or body type"""
+    return Car.objects.filter(
+        status='active'
+    ).filter(
+        Q(make=car.make) | Q(body_type=car.body_type)
+    ).exclude(
+        id=car.id
+    ).select_related(
+        'make', 'model'
+    ).prefetch_related(
+        'images'
+    )[:4]
+
+
+@read_from_replica
+@conditional_page(detail_fingerprint)
 def car_detail(request, slug):
     """Car detail view with all related information"""
     
@@ -388,8 +447,8 @@ def car_detail(request, slug):
         slug=slug
     )
     
-    # Increment view count
-    Car.objects.filter(id=car.id).update(views=models.F('views') + 1)
+    # Count the view (written in batches, see activity.py)
+    activity.record(car, views=1)
     
     # Get all images
     images = car.images.all().order_by('order', '-is_primary')
@@ -397,12 +456,7 @@ def car_detail(request, slug):
     
     # Get specifications grouped by category
     specifications = car.specifications.all().order_by('category', 'order')
-    specs_by_category = {}
-    for spec in specifications:
-        category = spec.category or 'General'
-        if category not in specs_by_category:
-            specs_by_category[category] = []
-        specs_by_category[category].append(spec)
+    specs_by_category = group_specifications(specifications)
     
     # Get reviews
     reviews = car.reviews.filter(is_approved=True).order_by('-created_at')[:5]
@@ -419,26 +473,13 @@ def car_detail(request, slug):
     latest_inspection = inspections.first()
     
     # Parse features
-    features_list = []
-    if car.features:
-        features_list = [f.strip() for f in car.features.split(',') if f.strip()]
+    features_list = parse_features(car)
     
     # Get recommended/similar cars
-    similar_cars = Car.objects.filter(
-        status='active'
-    ).filter(
-        Q(make=car.make) | Q(body_type=car.body_type)
-    ).exclude(
-        id=car.id
-    ).select_related(
-        'make', 'model'
-    ).prefetch_related(
-        'images'
-    )[:4]
+    similar_cars = similar_cars_queryset(car)
     
-    # Calculate potential savings (mock calculation)
-    msrp = car.price * Decimal('1.15')  # Mock MSRP as 15% higher
-    savings = msrp - car.price
+    # Compare the price with similar cars on the market
+    market_rating = price_rating(car)
     
     # Get seller info
     seller_cars_count = Car.objects.filter(
@@ -460,8 +501,7 @@ def car_detail(request, slug):
         'latest_inspection': latest_inspection,
         'features_list': features_list,
         'similar_cars': similar_cars,
-        'msrp': msrp,
-        'savings': savings,
+        'market_rating': market_rating,
         'seller_cars_count': seller_cars_count,
     }
     
@@ -479,6 +519,12 @@ def send_inquiry(request, slug):
         phone = request.POST.get('phone')
         message = request.POST.get('message')
         
+        # Near-duplicate check against recent inquiries (see spam.py)
+        verdict = spam.check('inquiry', message, request.user.id)
+        if verdict.throttled:
+            messages.error(request, "You've already sent this message to several sellers. Please write to this seller directly.")
+            return redirect('car_detail', slug=slug)
+        
         inquiry = Inquiry.objects.create(
             car=car,
             sender=request.user,
@@ -486,11 +532,13 @@ def send_inquiry(request, slug):
             name=name,
             email=email,
             phone=phone,
-            message=message
+            message=message,
+            is_flagged=verdict.flagged
         )
+        spam.remember('inquiry', inquiry.id, request.user.id, verdict)
         
-        # Increment inquiry count
-        Car.objects.filter(id=car.id).update(inquiries=F('inquiries') + 1)
+        # Count the inquiry (written in batches, see activity.py)
+        activity.record(car, inquiries=1)
         
         messages.success(request, 'Your inquiry has been sent successfully!')
         return redirect('car_detail', slug=slug)
@@ -513,6 +561,11 @@ def add_review(request, slug):
         title = request.POST.get('title')
         comment = request.POST.get('comment')
         
+        verdict = spam.check('review', comment, request.user.id)
+        if verdict.throttled:
+            messages.error(request, "You've already posted this review on other cars.")
+            return redirect('car_detail', slug=slug)
+        
         review = Review.objects.create(
             review_type='car',
             car=car,
@@ -520,8 +573,10 @@ def add_review(request, slug):
             rating=rating,
             title=title,
             comment=comment,
-            is_approved=False  # Requires admin approval
+            is_approved=False,  # Requires admin approval
+            is_flagged=verdict.flagged
         )
+        spam.remember('review', review.id, request.user.id, verdict)
         
         messages.success(request, 'Your review has been submitted and is awaiting approval.')
         return redirect('car_detail', slug=slug)
@@ -643,14 +698,10 @@ def initiate_mpesa_payment(request, payment_id):
             if not phone_number:
                 return JsonResponse({'error': 'Phone number is required'}, status=400)
             
-            # Format phone number
-            phone_number = phone_number.replace('+', '').replace(' ', '')
-            if phone_number.startswith('0'):
-                phone_number = '254' + phone_number[1:]
-            elif not phone_number.startswith('254'):
-                phone_number = '254' + phone_number
+            # Same canonical form as User.phone_canonical
+            phone_number = normalize_phone(phone_number)
             
-            if not phone_number.isdigit() or len(phone_number) != 12:
+            if not is_kenyan_mobile(phone_number):
                 return JsonResponse({
                     'error': 'Invalid phone number. Use 07XXXXXXXX or 2547XXXXXXXX'
                 }, status=400)
@@ -692,7 +743,7 @@ def initiate_mpesa_payment(request, payment_id):
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(stk_push_url, json=payload, headers=headers)
+            response = http_client.post('mpesa', stk_push_url, json=payload, headers=headers)
             response_data = response.json()
             
             if response.status_code == 200 and response_data.get('ResponseCode') == '0':
@@ -716,6 +767,8 @@ def initiate_mpesa_payment(request, payment_id):
                 
                 return JsonResponse({'error': error_message}, status=400)
                 
+        except http_client.ProviderUnavailable:
+            return JsonResponse({'error': 'M-Pesa is temporarily unavailable. Please try again shortly.'}, status=503)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -734,7 +787,7 @@ def get_mpesa_access_token():
         ).decode('utf-8')
         
         headers = {"Authorization": f"Basic {credentials}"}
-        response = requests.get(auth_url, headers=headers)
+        response = http_client.get('mpesa', auth_url, headers=headers)
         
         if response.status_code == 200:
             return response.json().get('access_token')
@@ -813,12 +866,27 @@ def mpesa_callback(request):
 
 # ============= PAYPAL PAYMENT =============
 
-# Configure PayPal
-paypalrestsdk.configure({
-    "mode": settings.PAYPAL_MODE,
-    "client_id": settings.PAYPAL_CLIENT_ID,
-    "client_secret": settings.PAYPAL_CLIENT_SECRET
-})
+class PayPalApi(paypalrestsdk.Api):
+    """PayPal SDK client whose calls go through the pooled, guarded http_client"""
+    
+    def http_call(self, url, method, **kwargs):
+        response = http_client.request('paypal', method, url, proxies=self.proxies, **kwargs)
+        return self.handle_response(response, response.content.decode('utf-8'))
+
+
+_paypal_api = None
+
+
+def paypal_api():
+    """PayPal client, configured on first use rather than at import"""
+    global _paypal_api
+    if _paypal_api is None:
+        _paypal_api = PayPalApi({
+            "mode": settings.PAYPAL_MODE,
+            "client_id": settings.PAYPAL_CLIENT_ID,
+            "client_secret": settings.PAYPAL_CLIENT_SECRET
+        })
+    return _paypal_api
 
 
 @login_required
@@ -861,7 +929,7 @@ def create_paypal_payment(request, payment_id):
                     },
                     "description": f"Payment for {payment_obj.order.car.title}"
                 }]
-            })
+            }, api=paypal_api())
             
             if payment.create():
                 payment_obj.payment_method = 'paypal'
@@ -881,6 +949,8 @@ def create_paypal_payment(request, payment_id):
                     'error': payment.error
                 }, status=400)
                 
+        except http_client.ProviderUnavailable:
+            return JsonResponse({'error': 'PayPal is temporarily unavailable. Please try again shortly.'}, status=503)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     
@@ -904,7 +974,7 @@ def execute_paypal_payment(request, payment_id):
         return redirect('payment_page', order_id=payment_obj.order.id)
     
     try:
-        payment = paypalrestsdk.Payment.find(payment_id_paypal)
+        payment = paypalrestsdk.Payment.find(payment_id_paypal, api=paypal_api())
         
         if payment.execute({"payer_id": payer_id}):
             # Payment successful
@@ -979,35 +1049,35 @@ def cancel_paypal_payment(request, payment_id):
 def toggle_favorite(request, car_id):
     """Add/remove car from favorites"""
     car = get_object_or_404(Car, id=car_id)
-    favorite, created = Favorite.objects.get_or_create(user=request.user, car=car)
+    favorite, created = Favorite.objects.get_or_create(
+        user=request.user, car=car, defaults={'saved_price': car.price}
+    )
     
     if not created:
         favorite.delete()
         return JsonResponse({'favorited': False})
     
+    activity.record(car, favorites=1)
     return JsonResponse({'favorited': True})
 
 
 @login_required
-def send_inquiry(request, car_id):
-    """Send inquiry about a car"""
-    if request.method == 'POST':
-        car = get_object_or_404(Car, id=car_id)
-        
-        Inquiry.objects.create(
-            car=car,
-            sender=request.user,
-            recipient=car.seller,
-            name=request.POST.get('name'),
-            email=request.POST.get('email'),
-            phone=request.POST.get('phone'),
-            message=request.POST.get('message')
-        )
-        
-        messages.success(request, 'Inquiry sent successfully!')
-        return redirect('car_detail', slug=car.slug)
+def save_search(request):
+    """Save the current listing search to get alerts about new matches"""
+    if request.method != 'POST':
+        return redirect('car_listings')
     
-    return redirect('home')
+    params = QueryDict(request.POST.get('query_string', ''))
+    query = params.get('q', '').strip()[:200]
+    filters = {key: params[key] for key in SEARCH_FILTER_KEYS if params.get(key)}
+    
+    if not query and not filters:
+        messages.error(request, 'Add a search term or filter before saving a search.')
+    else:
+        SavedSearch.objects.get_or_create(user=request.user, query=query, filters=filters)
+        messages.success(request, "Search saved. We'll notify you about new matches.")
+    
+    return redirect(f"{reverse('car_listings')}?{params.urlencode()}")
 
 
 @login_required
@@ -1043,7 +1113,7 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from .models import User, Dealer
 from .forms import LoginForm, RegisterForm, UserUpdateForm
 
@@ -1059,17 +1129,9 @@ def login_view(request):
             username = form.cleaned_data['username']
             password = form.cleaned_data['password']
             
-            # Try to authenticate with username first
+            # The backend accepts a username or an email address
             user = authenticate(request, username=username, password=password)
             
-            # If failed, try with email
-            if user is None:
-                try:
-                    user_obj = User.objects.get(email=username)
-                    user = authenticate(request, username=user_obj.username, password=password)
-                except User.DoesNotExist:
-                    pass
-            
             if user is not None:
                 login(request, user)
                 messages.success(request, f'Welcome back, {user.username}!')
@@ -1138,6 +1200,10 @@ def register_view(request):
                     else:
                         return redirect('home')
                         
+            except IntegrityError:
+                # Someone registered the same details since the form was checked
+                form.check_unique()
+                messages.error(request, 'Please correct the errors below.')
             except Exception as e:
                 messages.error(request, f'An error occurred during registration: {str(e)}')
         else:
@@ -1170,4 +1236,205 @@ def profile_view(request):
     else:
         form = UserUpdateForm(instance=request.user)
     
-    return render(request, 'auth/profile.html', {'form': form})
\ No newline at end of file
+    return render(request, 'auth/profile.html', {'form': form})
+
+
+# ============= DEALERS =============
+
+@read_from_replica
+def dealer_storefront(request, slug):
+    """Public dealer page: profile, inventory stats and active listings"""
+    dealer = get_object_or_404(Dealer, slug=slug)
+    
+    cars = dealer.cars.filter(status='active').select_related(
+        'make', 'model'
+    ).prefetch_related('images').order_by('-created_at')
+    
+    # Stats come from the dealer row, so only the current page is counted
+    paginator = Paginator(cars, 12)
+    paginator.count = dealer.active_listings
+    page_obj = paginator.get_page(request.GET.get('page', 1))
+    
+    context = {
+        'dealer': dealer,
+        'cars': page_obj,
+        'page_obj': page_obj,
+    }
+    return render(request, 'dealer_storefront.html', context)
+
+
+@login_required
+def dealer_dashboard(request):
+    """Dealer's own inventory stats and latest listings"""
+    if request.user.user_type != 'dealer' or not hasattr(request.user, 'dealer'):
+        messages.error(request, 'The dealer dashboard is only available to dealer accounts.')
+        return redirect('home')
+    
+    dealer = request.user.dealer
+    recent_cars = dealer.cars.select_related('make', 'model').order_by('-updated_at')[:20]
+    
+    context = {
+        'dealer': dealer,
+        'recent_cars': recent_cars,
+    }
+    return render(request, 'dealer_dashboard.html', context)
+
+
+@login_required
+def seller_activity_chart(request):
+    """Daily views/inquiries/favorites of the user's cars as JSON chart series"""
+    try:
+        days = int(request.GET.get('days', settings.ACTIVITY_CHART_DAYS))
+    except ValueError:
+        return JsonResponse({'error': 'days must be a number'}, status=400)
+    if days < 1:
+        return JsonResponse({'error': 'days must be at least 1'}, status=400)
+    
+    car_ids = [int(value) for value in request.GET.getlist('car') if value.isdigit()] or None
+    return JsonResponse(activity.seller_activity(request.user.id, days=days, car_ids=car_ids))
+
+
+# ============= MODERATION =============
+
+@staff_member_required
+def moderation_queue(request):
+    """Moderator's leased tasks and the size of each queue"""
+    counts = moderation.queue_counts()
+    context = {
+        'tasks': moderation.leased_tasks(request.user),
+        'queues': [(kind, label, counts.get(kind, 0)) for kind, label in ModerationTask.KIND_CHOICES],
+        'lease_minutes': settings.MODERATION_LEASE_SECONDS // 60,
+    }
+    return render(request, 'moderation.html', context)
+
+
+@staff_member_required
+def moderation_claim(request):
+    """Lease the next batch of tasks, optionally from a single queue"""
+    if request.method == 'POST':
+        kind = request.POST.get('kind') or None
+        tasks = moderation.lease(request.user, kind=kind)
+        if not tasks:
+            messages.info(request, 'Nothing left to moderate in this queue.')
+    return redirect('moderation_queue')
+
+
+@staff_member_required
+def moderation_resolve(request, task_id):
+    """Approve or reject a leased task"""
+    if request.method == 'POST':
+        approve = request.POST.get('decision') == 'approve'
+        if not moderation.resolve(task_id, request.user, approve):
+            messages.error(request, 'Your lease on that item expired; it is back in the queue.')
+    return redirect('moderation_queue')
+
+
+# ============= COMPARE =============
+
+def user_compare_list(user):
+    """The user's current compare list (created on first use)"""
+    compare_list = CompareList.objects.filter(user=user).order_by('-created_at').first()
+    return compare_list or CompareList.objects.create(user=user)
+
+
+def compare_cars(request):
+    """
+    Side-by-side comparison of ``?cars=1,2,3`` (shareable), or of the
+    signed-in user's compare list.
+    """
+    editable = False
+    if request.GET.get('cars'):
+        car_ids = parse_car_ids(request.GET['cars'])
+    elif request.user.is_authenticated:
+        car_ids = list(
+            user_compare_list(request.user).cars.order_by('id').values_list('id', flat=True)
+        )
+        editable = True
+    else:
+        return redirect(f"{reverse('login')}?next={request.path}")
+    
+    context = {
+        'car_ids': car_ids,
+        'share_ids': ','.join(str(car_id) for car_id in sorted(car_ids)),
+        'matrix': render_matrix(car_ids, editable) if car_ids else '',
+    }
+    return render(request, 'compare.html', context)
+
+
+@login_required
+def add_to_compare(request, car_id):
+    """Add a car to the user's compare list"""
+    if request.method != 'POST':
+        return redirect('compare_cars')
+    
+    car = get_object_or_404(Car, id=car_id)
+    compare_list = user_compare_list(request.user)
+    if compare_list.cars.filter(id=car.id).exists():
+        messages.info(request, f'{car.title} is already in your comparison.')
+    elif compare_list.cars.count() >= settings.COMPARE_MAX_CARS:
+        messages.error(request, f'You can compare up to {settings.COMPARE_MAX_CARS} cars. Remove one first.')
+    else:
+        compare_list.cars.add(car)
+        messages.success(request, f'{car.title} added to your comparison.')
+    return redirect('compare_cars')
+
+
+@login_required
+def remove_from_compare(request, car_id):
+    """Remove a car from the user's compare list"""
+    if request.method == 'POST':
+        user_compare_list(request.user).cars.remove(car_id)
+    return redirect('compare_cars')
+
+
+# ============= INVENTORY EXPORT =============
+
+@login_required
+def export_inventory(request):
+    """Stream the user's inventory (all cars for staff) as CSV or JSONL"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Unsupported format. Use csv or jsonl'}, status=400)
+    
+    dealer = None
+    if request.user.is_staff and request.GET.get('dealer'):
+        dealer = get_object_or_404(Dealer, slug=request.GET['dealer'])
+    
+    cars = inventory_queryset(user=request.user, dealer=dealer)
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    
+    response = StreamingHttpResponse(iter_export(cars, export_format), content_type=content_type)
+    filename = f"inventory-{timezone.now():%Y%m%d}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def import_inventory_upload(request):
+    """Bulk import cars from an uploaded CSV or JSONL file"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a file in the "file" field'}, status=405)
+    
+    if request.user.user_type != 'dealer' or not hasattr(request.user, 'dealer'):
+        return JsonResponse({'error': 'Only dealers can import inventory'}, status=403)
+    
+    uploaded = request.FILES.get('file')
+    if uploaded is None:
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    
+    import_format = request.POST.get('format') or ('jsonl' if uploaded.name.endswith('.jsonl') else 'csv')
+    if import_format not in IMPORT_FORMATS:
+        return JsonResponse({'error': 'Unsupported format. Use csv or jsonl'}, status=400)
+    
+    result = import_inventory(open_upload(uploaded), import_format, request.user, request.user.dealer)
+    return JsonResponse(result.as_dict(max_errors=500))
+
+
+# ============= INSTRUMENTATION =============
+
+@staff_member_required
+def metrics_view(request):
+    """Per-process counters, timings and database connection/pool stats"""
+    data = metrics.snapshot()
+    data['databases'] = metrics.database_stats()
+    return JsonResponse(data)
@@ -1,6 +1,10 @@
+import importlib.util
 import os
 from pathlib import Path
 
+import django
+from decouple import config, Csv
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -27,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',
  
     'car_app',
     
@@ -35,12 +40,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'car_app.throttle.ThrottleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'car_app.db_router.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'true_car.urls'
@@ -48,9 +56,16 @@ ROOT_URLCONF = 'true_car.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': ['templates'],
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'templates'],
         'OPTIONS': {
+            # Compile each template once per process. The autoreloader
+            # still resets this cache when a template changes in DEBUG.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -61,10 +76,18 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'true_car.wsgi.application'
+ASGI_APPLICATION = 'true_car.asgi.application'
+
+# Serve home/listings/detail with the async views (car_app/async_views.py).
+# Only worth it under an ASGI server such as uvicorn.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
 
 # Custom user model
 AUTH_USER_MODEL = 'car_app.User'
 
+# Log in with a username or an email address (see car_app/auth_backend.py)
+AUTHENTICATION_BACKENDS = ['car_app.auth_backend.EmailOrUsernameBackend']
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -76,10 +99,59 @@ DATABASES = {
         'PASSWORD': 'cp7kvt',
         'HOST': 'localhost',
         'PORT': '5432',
-        
+        # Keep connections open between requests instead of reconnecting
+        # every time; health checks drop connections the server closed.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        # Transaction-pooling PgBouncer can't keep named server-side cursors
+        # open across transactions, so .iterator() falls back to client side.
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+        },
     }
 }
 
+# Optional in-process pool. Only Django >= 5.1 running on psycopg 3 (with
+# psycopg_pool) understands the "pool" option; psycopg2 would pass it to
+# libpq as a connection parameter and every connect would fail, so on other
+# stacks DB_POOL is ignored and persistent connections are used instead.
+# For pooling across processes or on Django 4.2, run PgBouncer in
+# transaction mode in front of PostgreSQL, point HOST/PORT at it and set
+# DB_PGBOUNCER=True. Pooled connections are returned on close, so
+# persistent connections are disabled while the pool is on.
+if (
+    config('DB_POOL', default=False, cast=bool)
+    and django.VERSION >= (5, 1)
+    and importlib.util.find_spec('psycopg') is not None
+    and importlib.util.find_spec('psycopg_pool') is not None
+):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+# ============= READ REPLICAS =============
+# Comma-separated replica hosts, e.g. DATABASE_REPLICA_HOSTS=10.0.0.11,10.0.0.12
+# Each replica reuses the primary's credentials.
+for index, replica_host in enumerate(config('DATABASE_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'HOST': replica_host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['car_app.db_router.ReplicaRouter']
+
+REPLICA_PIN_COOKIE = 'replica_pin'  # set after any POST for read-your-writes
+REPLICA_PIN_SECONDS = 10
+REPLICA_MAX_LAG = 5  # seconds; lagging replicas fall back to the primary
+REPLICA_LAG_CHECK_INTERVAL = 5  # seconds between lag probes per replica
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -123,6 +195,22 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# `collectstatic` minifies CSS, writes content-hashed copies and gzip/brotli
+# variants; WhiteNoise then serves the hashed files with a one-year
+# immutable Cache-Control. Development keeps plain, unhashed files.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'car_app.storage.MinifiedManifestStaticFilesStorage'
+        ),
+    },
+}
+WHITENOISE_MAX_AGE = 3600  # unhashed files (e.g. robots.txt); hashed ones are cached forever
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -180,9 +268,163 @@ from decouple import config  # pip install python-decouple
 # PAYPAL_CLIENT_ID = config('PAYPAL_CLIENT_ID')
 # PAYPAL_CLIENT_SECRET = config('PAYPAL_CLIENT_SECRET')
 
+# ============= CACHE =============
+# Sessions and throttles must be shared by all gunicorn workers, so use
+# Redis in production (REDIS_URL=redis://localhost:6379/1).
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Conditional GET / shared caching of public catalogue pages
+PAGE_CACHE_VERSION = '1'  # bump to invalidate every ETag after a template change
+PAGE_CACHE_MAX_AGE = 60  # browsers
+PAGE_CACHE_S_MAXAGE = 300  # CDN / reverse proxy
+
+# Inventory export: rows fetched per server-side cursor round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Inventory import: rows per validation/bulk write chunk, validation processes
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_WORKERS = config('IMPORT_WORKERS', default=0, cast=int) or None
+
+# Car change feed: entries returned per changes_since() call, and how long
+# fresh entries are held back so concurrent commits can't be skipped
+CHANGE_FEED_BATCH_SIZE = 1000
+CHANGE_FEED_SETTLE_SECONDS = 2
+
+# Market values: segment bands, minimum cars per segment for a price
+# rating, and how long the home page price summary stays cached
+MARKET_YEAR_BAND = 3
+MARKET_MILEAGE_BAND = 25000  # km
+MARKET_MILEAGE_BANDS = 8  # everything above 175,000 km shares the last band
+MARKET_MIN_SAMPLE = 5
+MARKET_SUMMARY_TIMEOUT = 60 * 60
+
+# Saved-search alerts: width of the price buckets searches are indexed by,
+# and how many buckets a price range may span before it's left unindexed
+ALERT_PRICE_BUCKET = 500000  # KES
+ALERT_MAX_PRICE_BUCKETS = 40
+
+# Search logging: rows buffered per process before a bulk insert, and the
+# longest a row waits; trending rollup window and sizes. A query only
+# trends once this many different users or sessions searched it, and only
+# when every word is a make, model, listing keyword, year or one of
+# SEARCH_TRENDS_KEYWORDS.
+SEARCH_LOG_BUFFER_SIZE = 200
+SEARCH_LOG_FLUSH_INTERVAL = 5  # seconds
+SEARCH_TRENDS_WINDOW_HOURS = 24 * 7
+SEARCH_TRENDS_LIMIT = 50
+SEARCH_TRENDS_MIN_SEARCHERS = 3
+SEARCH_TRENDS_KEYWORDS = ['new', 'used', 'cheap', 'car', 'cars', 'for', 'sale', 'in', 'kenya']
+SEARCH_TRENDS_HOME_COUNT = 8
+SEARCH_TRENDS_CACHE_TIMEOUT = 60 * 15
+
+# Car comparison: cars per comparison, rendered matrix cache lifetime
+COMPARE_MAX_CARS = 4
+COMPARE_CACHE_TIMEOUT = 60 * 10
+
+# Admin change lists: result sets the planner estimates above this size
+# show the estimate instead of running COUNT(*)
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Admin bulk actions: ids per UPDATE, largest selection run inside the
+# admin request (bigger ones go to run_bulk_jobs), how long a running job
+# may go without committing a chunk before a worker takes it over, listing
+# expiry age
+BULK_JOB_CHUNK_SIZE = 5000
+BULK_JOB_INLINE_LIMIT = 1000
+BULK_JOB_LEASE_SECONDS = 10 * 60
+LISTING_EXPIRY_DAYS = 90
+
+# Moderation queue: how long leased tasks stay with a moderator, tasks per claim
+MODERATION_LEASE_SECONDS = 60 * 10
+MODERATION_CLAIM_SIZE = 10
+
+# Spam detection: MinHash shingle size and signature length, LSH bands
+# (must divide the signature), similarity that counts as a duplicate, how far
+# back submissions are compared, repeats before a sender is throttled, other
+# senders of the same text before it is flagged
+SPAM_SHINGLE_SIZE = 5
+SPAM_MINHASH_PERMUTATIONS = 64
+SPAM_LSH_BANDS = 16
+SPAM_SIMILARITY_THRESHOLD = 0.8
+SPAM_WINDOW_DAYS = 30
+SPAM_MAX_REPEATS = 3
+SPAM_FLAG_SENDERS = 5
+SPAM_MIN_CHARS = 10
+SPAM_MAX_CANDIDATES = 200
+
+# Outbound HTTP to payment providers (see http_client.py): timeouts in
+# seconds, retries with backoff (seconds, plus as much random jitter),
+# pooled connections per process, and the circuit breaker's consecutive
+# failures before it opens and seconds before it lets a trial call through
+OUTBOUND_HTTP_DEFAULTS = {
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    'retries': 2,
+    'backoff': 0.3,
+    'pool_size': 10,
+    'failure_threshold': 5,
+    'reset_seconds': 30,
+}
+OUTBOUND_HTTP = {
+    'mpesa': {'read_timeout': 15},
+    'paypal': {'read_timeout': 20},
+}
+
+# Rate limits per URL name (see throttle.py): (requests, seconds) per
+# signed-in user or anonymous IP, or always per IP with 'per': 'ip'. Only
+# POSTs count unless 'methods' says otherwise. Counters live in
+# RATE_LIMIT_CACHE; set RATE_LIMIT_PROXY_COUNT to the number of reverse
+# proxies in front of the app so X-Forwarded-For is trusted that far.
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMIT_PROXY_COUNT = config('RATE_LIMIT_PROXY_COUNT', default=0, cast=int)
+RATE_LIMITS = {
+    'login': {'rate': (10, 60), 'per': 'ip'},
+    'register': {'rate': (5, 60 * 60), 'per': 'ip'},
+    'send_inquiry': {'rate': (20, 60 * 60)},
+    'toggle_favorite': {'rate': (60, 60)},
+    'initiate_mpesa': {'rate': (5, 60 * 5)},
+}
+
+# Duplicate listings: mileage band (km) and relative price band of the
+# feature key, largest photo hash distance still counted as the same photo,
+# keys shared by more listings than this are too generic to compare, score
+# (vin 1.0, photo 0.6, features 0.4, summed) that reaches the moderators,
+# processes hashing photos, cars per indexing chunk
+DEDUP_MILEAGE_BAND = 10000
+DEDUP_PRICE_BAND = 0.1
+DEDUP_PHOTO_DISTANCE = 5
+DEDUP_MAX_BLOCK_SIZE = 50
+DEDUP_MIN_SCORE = 0.6
+DEDUP_IMAGE_WORKERS = 4
+DEDUP_CHUNK_SIZE = 2000
+
+# Car activity time series: cars buffered per process before a batched
+# upsert, and the longest a count waits; daily rows kept, default chart range
+ACTIVITY_BUFFER_SIZE = 500
+ACTIVITY_FLUSH_INTERVAL = 5  # seconds
+ACTIVITY_RETENTION_DAYS = 400
+ACTIVITY_CHART_DAYS = 90
+
 # Session settings
+SESSION_ENGINE = 'car_app.session_backend'
 SESSION_COOKIE_AGE = 86400  # 1 day
 SESSION_SAVE_EVERY_REQUEST = True
+SESSION_REFRESH_INTERVAL = 300  # rewrite an unchanged session's DB row at most every 5 minutes
+SESSION_CLEANUP_BATCH_SIZE = 1000  # rows per DELETE in `manage.py clearsessions`
 
 # Security settings for production
 # SECURE_SSL_REDIRECT = True